@@ -0,0 +1,26 @@
+"""add reconciliation is_complete
+
+Revision ID: a2d6f8b3c5e7
+Revises: f4b8d2a6c9e1
+Create Date: 2026-10-17 15:42:08.113904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d6f8b3c5e7'
+down_revision: Union[str, None] = 'f4b8d2a6c9e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reconciliations', sa.Column('is_complete', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('reconciliations', 'is_complete')
@@ -0,0 +1,46 @@
+"""add reconciliation transactions table
+
+Revision ID: c3f1a9d2e4b7
+Revises: b75e1bdc2cd5
+Create Date: 2026-10-16 10:12:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a9d2e4b7'
+down_revision: Union[str, None] = 'b75e1bdc2cd5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reconciliation_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reconciliation_id', sa.Integer(), nullable=False),
+    sa.Column('side', sa.String(length=10), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.String(length=10), nullable=True),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('original', sa.JSON(), nullable=True),
+    sa.Column('match_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['match_id'], ['reconciliation_matches.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['reconciliation_id'], ['reconciliations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reconciliation_transactions_id'), 'reconciliation_transactions', ['id'], unique=False)
+    op.create_index(op.f('ix_reconciliation_transactions_reconciliation_id'), 'reconciliation_transactions', ['reconciliation_id'], unique=False)
+    op.create_index('ix_reconciliation_transactions_pending', 'reconciliation_transactions', ['reconciliation_id', 'side', 'match_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reconciliation_transactions_pending', table_name='reconciliation_transactions')
+    op.drop_index(op.f('ix_reconciliation_transactions_reconciliation_id'), table_name='reconciliation_transactions')
+    op.drop_index(op.f('ix_reconciliation_transactions_id'), table_name='reconciliation_transactions')
+    op.drop_table('reconciliation_transactions')
@@ -0,0 +1,46 @@
+"""add uploads table
+
+Revision ID: d5e2b8c4f1a3
+Revises: c3f1a9d2e4b7
+Create Date: 2026-10-16 15:40:12.503217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e2b8c4f1a3'
+down_revision: Union[str, None] = 'c3f1a9d2e4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('original_name', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('columns', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('filename')
+    )
+    op.create_index(op.f('ix_uploads_id'), 'uploads', ['id'], unique=False)
+    op.create_index(op.f('ix_uploads_content_hash'), 'uploads', ['content_hash'], unique=False)
+    op.create_index('ix_uploads_user_created', 'uploads', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_uploads_user_created', table_name='uploads')
+    op.drop_index(op.f('ix_uploads_content_hash'), table_name='uploads')
+    op.drop_index(op.f('ix_uploads_id'), table_name='uploads')
+    op.drop_table('uploads')
@@ -0,0 +1,25 @@
+"""add pending value index
+
+Revision ID: e7a3c9d5b2f4
+Revises: d5e2b8c4f1a3
+Create Date: 2026-10-16 18:05:37.114902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d5b2f4'
+down_revision: Union[str, None] = 'd5e2b8c4f1a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reconciliation_transactions_pending_value', 'reconciliation_transactions', ['reconciliation_id', 'side', 'match_id', 'value', 'transaction_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reconciliation_transactions_pending_value', table_name='reconciliation_transactions')
@@ -0,0 +1,32 @@
+"""widen transaction date
+
+Revision ID: f4b8d2a6c9e1
+Revises: e7a3c9d5b2f4
+Create Date: 2026-10-17 09:14:26.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d2a6c9e1'
+down_revision: Union[str, None] = 'e7a3c9d5b2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('reconciliation_transactions', 'date',
+               existing_type=sa.String(length=10),
+               type_=sa.String(),
+               existing_nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('reconciliation_transactions', 'date',
+               existing_type=sa.String(),
+               type_=sa.String(length=10),
+               existing_nullable=True)
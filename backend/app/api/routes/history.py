@@ -16,6 +16,8 @@ from datetime import datetime
 
 router = APIRouter()
 
+UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
+
 
 # Schemas
 class ReconciliationListItem(BaseModel):
@@ -27,6 +29,7 @@ class ReconciliationListItem(BaseModel):
     total_bank_transactions: int
     total_internal_transactions: int
     created_at: datetime
+    is_complete: bool = True  # False: orçamento de tempo esgotado, resultado parcial
     
     class Config:
         from_attributes = True
@@ -96,42 +99,14 @@ def get_reconciliation_details(
             'is_manual': match.is_manual
         })
     
-    # Reprocessar arquivos para pegar pendências
-    import os
-    from app.core.csv_processor import CSVProcessor
-    
-    UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
-    bank_path = os.path.join(UPLOAD_DIR, reconciliation.bank_file_name)
-    internal_path = os.path.join(UPLOAD_DIR, reconciliation.internal_file_name)
-    
-    bank_only = []
-    internal_only = []
+    # Pendências salvas na conciliação (sem reler os arquivos); conciliações
+    # anteriores à tabela de transações são salvas a partir dos uploads
+    if ReconciliationService.backfill_transactions(db, reconciliation, UPLOAD_DIR):
+        db.commit()
     
-    if os.path.exists(bank_path) and os.path.exists(internal_path):
-        try:
-            # IDs já conciliados
-            matched_bank_ids = set()
-            matched_internal_ids = set()
-            
-            for match in matches:
-                if match.bank_transaction_data and 'id' in match.bank_transaction_data:
-                    matched_bank_ids.add(match.bank_transaction_data['id'])
-                if match.internal_transaction_data and 'id' in match.internal_transaction_data:
-                    matched_internal_ids.add(match.internal_transaction_data['id'])
-            
-            # Ler e processar arquivos
-            bank_df = CSVProcessor.read_csv(bank_path)
-            internal_df = CSVProcessor.read_csv(internal_path)
-            
-            bank_data = CSVProcessor.process_dataframe(bank_df, 'Data', 'Valor', 'Descricao')
-            internal_data = CSVProcessor.process_dataframe(internal_df, 'Data', 'Valor', 'Descricao')
-            
-            # Filtrar pendentes
-            bank_only = [t for t in bank_data if t['id'] not in matched_bank_ids]
-            internal_only = [t for t in internal_data if t['id'] not in matched_internal_ids]
-            
-        except Exception as e:
-            print(f"Erro ao processar arquivos: {e}")
+    pending = ReconciliationService.get_pending_transactions(db, reconciliation.id)
+    bank_only = pending['bank']
+    internal_only = pending['internal']
     
     return {
         'id': reconciliation.id,
@@ -147,7 +122,8 @@ def get_reconciliation_details(
             'matched_count': reconciliation.matched_count,
             'bank_only_count': reconciliation.bank_only_count,
             'internal_only_count': reconciliation.internal_only_count,
-            'match_rate': reconciliation.match_rate
+            'match_rate': reconciliation.match_rate,
+            'complete': reconciliation.is_complete is not False
         }
     }
 
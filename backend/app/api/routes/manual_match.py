@@ -1,17 +1,22 @@
 """
 Rotas de conciliação manual
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from datetime import date
+from typing import Optional
 
 from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
-from app.models.reconciliation import Reconciliation, ManualMatch, ReconciliationMatch
+from app.models.reconciliation import Reconciliation, ManualMatch
+from app.services.reconciliation_service import SIDE_BANK, SIDE_INTERNAL, ReconciliationService
 
 router = APIRouter()
 
+UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
+
 
 class ManualMatchCreate(BaseModel):
     reconciliation_id: int
@@ -26,11 +31,27 @@ class PendingTransactionsResponse(BaseModel):
 @router.get("/reconciliation/{reconciliation_id}/pending")
 def get_pending_transactions(
     reconciliation_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    sort: str = Query("date", pattern="^(date|value)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    side: Optional[str] = Query(None, pattern="^(bank|internal)$"),
+    bank_cursor: Optional[str] = None,
+    internal_cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Retorna transações pendentes de uma conciliação
+    Retorna transações pendentes de uma conciliação, página por página
+    
+    Cada lado tem sua página de até `limit` itens, ordenada por data ou
+    valor, e o cursor da próxima (passar em bank_cursor/internal_cursor).
+    Os filtros de data e valor valem para os dois lados; com `side`, só
+    esse lado é consultado. Conciliações anteriores à tabela de transações
+    têm as transações salvas a partir dos uploads no primeiro acesso.
     """
     reconciliation = db.query(Reconciliation).filter(
         Reconciliation.id == reconciliation_id,
@@ -43,53 +64,38 @@ def get_pending_transactions(
             detail="Conciliação não encontrada"
         )
     
-    # Buscar todos os matches desta conciliação
-    existing_matches = db.query(ReconciliationMatch).filter(
-        ReconciliationMatch.reconciliation_id == reconciliation_id
-    ).all()
-    
-    # IDs já conciliados
-    matched_bank_ids = set()
-    matched_internal_ids = set()
-    
-    for match in existing_matches:
-        if match.bank_transaction_data and 'id' in match.bank_transaction_data:
-            matched_bank_ids.add(match.bank_transaction_data['id'])
-        if match.internal_transaction_data and 'id' in match.internal_transaction_data:
-            matched_internal_ids.add(match.internal_transaction_data['id'])
-    
-    # Reprocessar os arquivos para pegar todas as transações
-    import os
-    from app.core.csv_processor import CSVProcessor
-    
-    UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
-    bank_path = os.path.join(UPLOAD_DIR, reconciliation.bank_file_name)
-    internal_path = os.path.join(UPLOAD_DIR, reconciliation.internal_file_name)
-    
-    bank_pending = []
-    internal_pending = []
-    
-    if os.path.exists(bank_path) and os.path.exists(internal_path):
-        try:
-            # Ler arquivos
-            bank_df = CSVProcessor.read_csv(bank_path)
-            internal_df = CSVProcessor.read_csv(internal_path)
+    if ReconciliationService.backfill_transactions(db, reconciliation, UPLOAD_DIR):
+        db.commit()
+    
+    response = {}
+    for name, cursor in ((SIDE_BANK, bank_cursor), (SIDE_INTERNAL, internal_cursor)):
+        page = {'items': [], 'next_cursor': None, 'total': 0}
+        
+        if side in (None, name):
+            try:
+                decoded = ReconciliationService.decode_cursor(cursor, sort) if cursor else None
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
             
-            # Processar (assumindo que as colunas são Data, Valor, Descricao)
-            bank_data = CSVProcessor.process_dataframe(bank_df, 'Data', 'Valor', 'Descricao')
-            internal_data = CSVProcessor.process_dataframe(internal_df, 'Data', 'Valor', 'Descricao')
-            
-            # Filtrar apenas os não conciliados
-            bank_pending = [t for t in bank_data if t['id'] not in matched_bank_ids]
-            internal_pending = [t for t in internal_data if t['id'] not in matched_internal_ids]
-            
-        except Exception as e:
-            print(f"Erro ao processar arquivos: {e}")
+            page = ReconciliationService.get_pending_page(
+                db, reconciliation.id, name, limit,
+                sort=sort,
+                descending=order == "desc",
+                cursor=decoded,
+                date_from=date_from.isoformat() if date_from else None,
+                date_to=date_to.isoformat() if date_to else None,
+                min_value=min_value,
+                max_value=max_value
+            )
+        
+        response[f"{name}_pending"] = page['items']
+        response[f"{name}_next_cursor"] = (
+            ReconciliationService.encode_cursor(page['next_cursor'])
+            if page['next_cursor'] is not None else None
+        )
+        response[f"{name}_total"] = page['total']
     
-    return {
-        "bank_pending": bank_pending,
-        "internal_pending": internal_pending
-    }
+    return response
 
 @router.post("/manual-match")
 def create_manual_match(
@@ -111,6 +117,19 @@ def create_manual_match(
             detail="Conciliação não encontrada"
         )
     
+    # Tira as duas transações das pendências salvas
+    if ReconciliationService.backfill_transactions(db, reconciliation, UPLOAD_DIR):
+        db.commit()
+    record = ReconciliationService.link_manual_match(
+        db, reconciliation.id, match_data.bank_transaction_id, match_data.internal_transaction_id
+    )
+    if record is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Transações não estão pendentes nesta conciliação"
+        )
+    
     # Criar match manual
     manual_match = ManualMatch(
         reconciliation_id=match_data.reconciliation_id,
@@ -124,11 +143,7 @@ def create_manual_match(
     reconciliation.matched_count += 1
     reconciliation.bank_only_count -= 1
     reconciliation.internal_only_count -= 1
-    
-    # Recalcular match_rate
-    total = reconciliation.total_bank_transactions + reconciliation.total_internal_transactions
-    if total > 0:
-        reconciliation.match_rate = (reconciliation.matched_count * 2 / total) * 100
+    ReconciliationService.refresh_match_rate(reconciliation)
     
     db.commit()
     
@@ -11,6 +11,8 @@ from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
 from app.core.csv_processor import CSVProcessor
+from app.services.parsed_cache import is_pdf, parsed_cache
+from app.services.upload_index import UploadIndex
 
 router = APIRouter()
 
@@ -35,11 +37,13 @@ class ProcessRequest(BaseModel):
 @router.post("/process/preview")
 async def preview_file(
     filename: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
-    Preview das primeiras linhas do arquivo CSV
-    Retorna colunas disponíveis e 5 primeiras linhas
+    Preview das primeiras linhas do arquivo (CSV ou extrato em PDF)
+    Retorna colunas disponíveis, 5 primeiras linhas, total de linhas e
+    tipo detectado de cada coluna
     """
     file_path = os.path.join(UPLOAD_DIR, filename)
     
@@ -58,14 +62,18 @@ async def preview_file(
         )
     
     try:
-        df = CSVProcessor.read_csv(file_path)
+        if is_pdf(file_path):
+            # Extração do PDF (feita uma vez e guardada no cache)
+            preview = CSVProcessor.frame_preview(parsed_cache.load_frame(file_path))
+        else:
+            # Só a amostra é lida; o total vem do índice de uploads (contado
+            # no upload) ou, para uploads antigos, da contagem de linhas
+            upload = UploadIndex.get(db, current_user.id, filename)
+            preview = CSVProcessor.preview(
+                file_path, total_rows=upload.row_count if upload is not None else None
+            )
         
-        return {
-            "filename": filename,
-            "columns": df.columns.tolist(),
-            "rows": df.head(5).to_dict('records'),
-            "total_rows": len(df)
-        }
+        return {"filename": filename, **preview}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -93,20 +101,16 @@ async def process_files(
         )
     
     try:
-        # Ler CSVs
-        bank_df = CSVProcessor.read_csv(bank_path)
-        internal_df = CSVProcessor.read_csv(internal_path)
-        
-        # Processar dados
-        bank_data = CSVProcessor.process_dataframe(
-            bank_df,
+        # Ler e processar CSVs (ou reaproveitar do cache)
+        bank_data = parsed_cache.load_transactions(
+            bank_path,
             request.bank_mapping.date_col,
             request.bank_mapping.value_col,
             request.bank_mapping.desc_col
         )
         
-        internal_data = CSVProcessor.process_dataframe(
-            internal_df,
+        internal_data = parsed_cache.load_transactions(
+            internal_path,
             request.internal_mapping.date_col,
             request.internal_mapping.value_col,
             request.internal_mapping.desc_col
@@ -119,7 +123,7 @@ async def process_files(
             "bank_data": bank_data[:10],  # Primeiros 10 para preview
             "internal_data": internal_data[:10]
         }
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
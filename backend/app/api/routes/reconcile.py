@@ -1,23 +1,44 @@
 """
 Rotas de conciliação
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from datetime import timedelta
+import asyncio
+import json
 import os
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
 from app.core.deps import get_current_user
+from app.core.security import create_access_token, decode_access_token
 from app.models.user import User
 from app.models.reconciliation import Reconciliation, ReconciliationMatch
-from app.core.csv_processor import CSVProcessor
+from app.core.progress import CancellationToken, OperationCancelled
 from app.core.reconciliation_processor import ReconciliationProcessor
+from app.services.reconciliation_service import ReconciliationService, json_safe
+from app.services.job_queue import FINISHED_STATES, Job, JobQueue
+from app.services.parsed_cache import parsed_cache
+from app.services.upload_retention import upload_retention
 
 router = APIRouter()
 
 UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
 
+JOB_KIND_RECONCILE = 'reconcile'
+
+# Tipo do token que abre o stream de progresso de um job
+EVENTS_TOKEN_TYPE = 'job_events'
+
+# Conciliações rodam fora do event loop, no máximo N ao mesmo tempo
+job_queue = JobQueue(max_workers=settings.RECONCILIATION_MAX_CONCURRENT_JOBS)
+
+# Uploads de jobs na fila ou em execução não são removidos pela limpeza
+upload_retention.add_reference_source(job_queue.active_inputs)
+
 
 class ColumnMapping(BaseModel):
     date_col: str
@@ -33,16 +54,20 @@ class ReconcileRequest(BaseModel):
     date_tolerance: int = 1
     value_tolerance: float = 0.02
     similarity_threshold: float = 0.7
+    time_budget: Optional[float] = None  # Segundos (padrão: settings.RECONCILIATION_TIME_BUDGET)
 
 
-@router.post("/reconcile")
+@router.post("/reconcile", status_code=status.HTTP_202_ACCEPTED)
 async def reconcile_transactions(
     request: ReconcileRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Executa conciliação entre arquivos bancário e interno
+    Enfileira a conciliação entre arquivos bancário e interno
+    
+    A leitura dos arquivos, o motor e a gravação rodam num job em segundo
+    plano; o resultado sai em GET /reconcile/jobs/{job_id}. Se o orçamento
+    de tempo acabar, o resultado é parcial, com summary.complete = false.
     """
     bank_path = os.path.join(UPLOAD_DIR, request.bank_file)
     internal_path = os.path.join(UPLOAD_DIR, request.internal_file)
@@ -53,23 +78,210 @@ async def reconcile_transactions(
             detail="Arquivos não encontrados"
         )
     
-    try:
-        # Processar arquivos
-        bank_df = CSVProcessor.read_csv(bank_path)
-        internal_df = CSVProcessor.read_csv(internal_path)
+    job = job_queue.submit(
+        current_user.id, JOB_KIND_RECONCILE, _run_reconciliation_job, request, current_user.id,
+        with_progress=True, cancellable=True,
+        inputs=(request.bank_file, request.internal_file)
+    )
+    
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/reconcile/jobs/{job_id}")
+def get_reconciliation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Estado de um job de conciliação
+    
+    Quando 'completed', `result` traz o mesmo formato que o frontend recebia
+    de POST /reconcile; quando 'failed', `error` traz a mensagem.
+    """
+    return _get_user_job(job_id, current_user).to_dict()
+
+
+@router.delete("/reconcile/jobs/{job_id}", status_code=status.HTTP_202_ACCEPTED)
+def cancel_reconciliation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Cancela um job de conciliação
+    
+    Um job na fila sai como 'cancelled' na hora; um job em execução para no
+    próximo ponto de verificação do motor, sem salvar nada, e libera a vaga.
+    """
+    job = _get_user_job(job_id, current_user)
+    
+    if job.status in FINISHED_STATES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job já terminado"
+        )
+    
+    job_queue.cancel(job.id)
+    return job.to_dict()
+
+
+@router.post("/reconcile/jobs/{job_id}/events-token")
+def create_job_events_token(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Token de curta duração para abrir o stream de progresso do job
+    
+    O EventSource do navegador não envia o header Authorization, então o
+    stream é aberto com ?token=. O token só vale para o stream deste job e
+    expira em settings.RECONCILIATION_EVENTS_TOKEN_SECONDS.
+    """
+    job = _get_user_job(job_id, current_user)
+    
+    token = create_access_token(
+        data={
+            "sub": current_user.email,
+            "type": EVENTS_TOKEN_TYPE,
+            "job_id": job.id,
+            "user_id": current_user.id
+        },
+        expires_delta=timedelta(seconds=settings.RECONCILIATION_EVENTS_TOKEN_SECONDS)
+    )
+    
+    return {"token": token, "expires_in": settings.RECONCILIATION_EVENTS_TOKEN_SECONDS}
+
+
+@router.get("/reconcile/jobs/{job_id}/events")
+def stream_reconciliation_job(
+    job_id: str,
+    token: str = Query(...)
+):
+    """
+    Progresso de um job de conciliação via server-sent events
+    
+    Autenticado pelo token de POST /reconcile/jobs/{job_id}/events-token.
+    Emite um evento 'progress' a cada atualização do motor (etapa, linhas
+    processadas, matches até agora) e termina com um evento 'completed',
+    'failed' ou 'cancelled' contendo o estado final do job, no formato de
+    GET /jobs/{job_id}.
+    """
+    payload = decode_access_token(token)
+    
+    if (
+        payload is None
+        or payload.get("type") != EVENTS_TOKEN_TYPE
+        or payload.get("job_id") != job_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado"
+        )
+    
+    job = job_queue.get(job_id, user_id=payload.get("user_id"))
+    
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado"
+        )
+    
+    return StreamingResponse(
+        _job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _get_user_job(job_id: str, current_user: User) -> Job:
+    """Job do usuário ou 404"""
+    job = job_queue.get(job_id, user_id=current_user.id)
+    
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado"
+        )
+    
+    return job
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _job_events(job: Job) -> AsyncIterator[str]:
+    """Eventos SSE do job até ele terminar"""
+    version = 0
+    
+    while True:
+        finished = job.status in FINISHED_STATES
+        
+        if job.progress_version != version:
+            version = job.progress_version
+            yield _sse("progress", job.progress)
+        
+        if finished:
+            yield _sse(job.status, job.to_dict())
+            return
         
-        bank_data = CSVProcessor.process_dataframe(
-            bank_df,
+        await asyncio.sleep(settings.RECONCILIATION_PROGRESS_INTERVAL)
+
+
+def _run_reconciliation_job(
+    request: ReconcileRequest,
+    user_id: int,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> Dict:
+    """Executa a conciliação com uma sessão de banco própria do job"""
+    db = SessionLocal()
+    try:
+        return _execute_reconciliation(request, user_id, db, progress_callback, cancel_token)
+    finally:
+        db.close()
+
+
+def _execute_reconciliation(
+    request: ReconcileRequest,
+    user_id: int,
+    db: Session,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> Dict:
+    """
+    Lê os arquivos, executa o motor e salva a conciliação
+    
+    Raises:
+        OperationCancelled: Job cancelado (nada é salvo)
+        HTTPException: 500 com a mensagem do erro original
+    """
+    time_budget = request.time_budget
+    if time_budget is None:
+        time_budget = settings.RECONCILIATION_TIME_BUDGET
+    
+    bank_path = os.path.join(UPLOAD_DIR, request.bank_file)
+    internal_path = os.path.join(UPLOAD_DIR, request.internal_file)
+    
+    try:
+        # Processar arquivos (ou reaproveitar do cache); o cancelamento é
+        # verificado entre os arquivos e entre os blocos de cada leitura
+        bank_data = parsed_cache.load_transactions(
+            bank_path,
             request.bank_mapping.date_col,
             request.bank_mapping.value_col,
-            request.bank_mapping.desc_col
+            request.bank_mapping.desc_col,
+            cancel_token=cancel_token
         )
         
-        internal_data = CSVProcessor.process_dataframe(
-            internal_df,
+        if cancel_token is not None:
+            cancel_token.check()
+        
+        internal_data = parsed_cache.load_transactions(
+            internal_path,
             request.internal_mapping.date_col,
             request.internal_mapping.value_col,
-            request.internal_mapping.desc_col
+            request.internal_mapping.desc_col,
+            cancel_token=cancel_token
         )
         
         # Executar conciliação
@@ -79,11 +291,17 @@ async def reconcile_transactions(
             similarity_threshold=request.similarity_threshold
         )
         
-        results = processor.reconcile(bank_data, internal_data)
+        results = processor.reconcile(
+            bank_data,
+            internal_data,
+            progress_callback=progress_callback,
+            cancel_token=cancel_token,
+            time_budget=time_budget
+        )
         
         # Salvar no banco
         reconciliation = Reconciliation(
-            user_id=current_user.id,
+            user_id=user_id,
             bank_file_name=request.bank_file,
             internal_file_name=request.internal_file,
             total_bank_transactions=results['summary']['total_bank_transactions'],
@@ -91,7 +309,8 @@ async def reconcile_transactions(
             matched_count=results['summary']['matched_count'],
             bank_only_count=results['summary']['bank_only_count'],
             internal_only_count=results['summary']['internal_only_count'],
-            match_rate=results['summary']['match_rate']
+            match_rate=results['summary']['match_rate'],
+            is_complete=results['summary'].get('complete', True)
         )
         
         db.add(reconciliation)
@@ -99,15 +318,23 @@ async def reconcile_transactions(
         db.refresh(reconciliation)
         
         # Salvar matches
+        match_records = []
         for match in results['matched']:
             match_record = ReconciliationMatch(
                 reconciliation_id=reconciliation.id,
-                bank_transaction_data=match['bank_transaction'],
-                internal_transaction_data=match['internal_transaction'],
+                bank_transaction_data=json_safe(match['bank_transaction']),
+                internal_transaction_data=json_safe(match['internal_transaction']),
                 confidence=match['confidence'],
                 is_manual=False
             )
             db.add(match_record)
+            match_records.append((match_record, match))
+        db.flush()
+        
+        # Salvar transações normalizadas (base para /append)
+        ReconciliationService.save_transactions(
+            db, reconciliation.id, bank_data, internal_data, match_records
+        )
         
         db.commit()
         
@@ -119,7 +346,111 @@ async def reconcile_transactions(
             "bank_only": results['bank_only'],
             "internal_only": results['internal_only']
         }
+    
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na conciliação: {str(e)}"
+        )
+
+
+class AppendRequest(BaseModel):
+    bank_file: Optional[str] = None
+    internal_file: Optional[str] = None
+    bank_mapping: Optional[ColumnMapping] = None
+    internal_mapping: Optional[ColumnMapping] = None
+    date_tolerance: int = 1
+    value_tolerance: float = 0.02
+    similarity_threshold: float = 0.7
+
+
+def _load_transactions(filename: Optional[str], mapping: Optional[ColumnMapping]) -> List[Dict]:
+    """Lê e normaliza um arquivo enviado (lista vazia se não informado)"""
+    if not filename:
+        return []
+    
+    return parsed_cache.load_transactions(
+        os.path.join(UPLOAD_DIR, filename), mapping.date_col, mapping.value_col, mapping.desc_col
+    )
+
+
+@router.post("/reconcile/{reconciliation_id}/append")
+def append_transactions(
+    reconciliation_id: int,
+    request: AppendRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Adiciona transações novas a uma conciliação existente
+    
+    Só as transações novas são processadas: elas são conciliadas entre si
+    e contra as pendentes salvas da conciliação, e os contadores e matches
+    são atualizados no lugar. Conciliações anteriores à tabela de transações
+    têm as transações salvas a partir dos uploads antes (ver
+    ReconciliationService.backfill_transactions).
+    """
+    reconciliation = db.query(Reconciliation).filter(
+        Reconciliation.id == reconciliation_id,
+        Reconciliation.user_id == current_user.id
+    ).first()
+    
+    if not reconciliation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conciliação não encontrada"
+        )
+    
+    files = [
+        (request.bank_file, request.bank_mapping),
+        (request.internal_file, request.internal_mapping)
+    ]
+    if not any(filename for filename, _ in files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ao menos um arquivo"
+        )
+    for filename, mapping in files:
+        if filename and mapping is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Mapeamento de colunas ausente para {filename}"
+            )
+        if filename and not os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Arquivos não encontrados"
+            )
+    
+    # Conciliação anterior à tabela de transações: salva as pendentes antigas
+    # antes das novas, senão elas nunca mais seriam conciliadas
+    if ReconciliationService.backfill_transactions(db, reconciliation, UPLOAD_DIR):
+        db.commit()
+    
+    try:
+        bank_data = _load_transactions(request.bank_file, request.bank_mapping)
+        internal_data = _load_transactions(request.internal_file, request.internal_mapping)
         
+        processor = ReconciliationProcessor(
+            date_tolerance=request.date_tolerance,
+            value_tolerance=request.value_tolerance,
+            similarity_threshold=request.similarity_threshold
+        )
+        
+        results = ReconciliationService.append_to_reconciliation(
+            db, reconciliation, bank_data, internal_data, processor
+        )
+        
+        return {
+            "reconciliation_id": reconciliation.id,
+            "summary": results['summary'],
+            "matched": results['matched'],
+            "bank_only": results['bank_only'],
+            "internal_only": results['internal_only']
+        }
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,22 +1,55 @@
 """
 Rotas de upload de arquivos
 """
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
 import os
-import shutil
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.services.upload_index import UploadIndex
+from app.services.upload_retention import upload_retention
+from app.services.upload_store import UploadStore, UploadTooLarge
 
 router = APIRouter()
 
 UPLOAD_DIR = "/tmp/lm-conciliation-uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Folga para cabeçalhos e delimitadores do multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_request_size() -> int:
+    """
+    Maior corpo aceito em POST /upload (dois arquivos no limite), checado
+    pelo BodySizeLimitMiddleware antes de o multipart ser lido
+    """
+    return 2 * settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
+
+def _store_upload(file: UploadFile, filename: str) -> Tuple[dict, Optional[List[str]]]:
+    """
+    Grava o upload fora do event loop (413 se passar do limite)
+    
+    Returns:
+        (retorno de UploadStore.store, colunas detectadas)
+    """
+    try:
+        info = UploadStore(UPLOAD_DIR).store(file.file, filename, settings.MAX_UPLOAD_SIZE)
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    
+    return info, UploadIndex.detect_columns(os.path.join(UPLOAD_DIR, filename))
+
 
 @router.post("/upload")
 async def upload_files(
@@ -28,7 +61,12 @@ async def upload_files(
     """
     Upload de arquivos bancário e interno para conciliação
     
-    Aceita: CSV e PDF
+    Aceita: CSV e PDF, até settings.MAX_UPLOAD_SIZE cada. Os arquivos são
+    gravados em blocos fora do event loop e a resposta traz hash SHA-256,
+    tamanho e linhas de cada um. Um conteúdo já enviado não é gravado de
+    novo (ver UploadStore). Os metadados ficam registrados em `uploads`.
+    Requisições acima de max_request_size() são recusadas antes de o corpo
+    ser lido (BodySizeLimitMiddleware).
     """
     # Validar extensões
     allowed_extensions = [".csv", ".pdf"]
@@ -53,33 +91,119 @@ async def upload_files(
     bank_path = os.path.join(UPLOAD_DIR, bank_filename)
     internal_path = os.path.join(UPLOAD_DIR, internal_filename)
     
-    # Salvar arquivos
-    with open(bank_path, "wb") as buffer:
-        shutil.copyfileobj(bank_file.file, buffer)
+    # Salvar arquivos (se o segundo falhar, o primeiro também é removido)
+    bank_info, bank_columns = await run_in_threadpool(_store_upload, bank_file, bank_filename)
+    try:
+        internal_info, internal_columns = await run_in_threadpool(
+            _store_upload, internal_file, internal_filename
+        )
+    except BaseException:
+        await run_in_threadpool(UploadStore(UPLOAD_DIR).remove, bank_filename)
+        raise
     
-    with open(internal_path, "wb") as buffer:
-        shutil.copyfileobj(internal_file.file, buffer)
+    UploadIndex.record(
+        db, current_user.id, "bank", bank_path, bank_file.filename, bank_info, bank_columns
+    )
+    UploadIndex.record(
+        db, current_user.id, "internal", internal_path, internal_file.filename,
+        internal_info, internal_columns
+    )
+    db.commit()
     
     return {
         "message": "Arquivos enviados com sucesso",
         "bank_file": bank_filename,
         "internal_file": internal_filename,
         "bank_path": bank_path,
-        "internal_path": internal_path
+        "internal_path": internal_path,
+        "bank_info": bank_info,
+        "internal_info": internal_info
     }
 
 
 @router.get("/uploads")
-async def list_uploads(
-    current_user: User = Depends(get_current_user)
+def list_uploads(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    """Lista uploads do usuário"""
-    user_files = [
-        f for f in os.listdir(UPLOAD_DIR)
-        if f.startswith(f"bank_{current_user.id}_") or f.startswith(f"internal_{current_user.id}_")
-    ]
+    """
+    Lista uploads do usuário, mais recentes primeiro
+    
+    Consulta paginada no índice de uploads. `files` traz os nomes, como
+    antes, e `uploads` os metadados registrados no envio (hash, tamanho,
+    linhas, colunas); os arquivos não são abertos. Uploads anteriores ao
+    índice são registrados na primeira listagem (ver UploadIndex.backfill).
+    """
+    if UploadIndex.backfill(db, current_user.id, UPLOAD_DIR):
+        db.commit()
+    
+    uploads, total = UploadIndex.list_for_user(db, current_user.id, limit=limit, offset=offset)
+    
+    return {
+        "files": [upload.filename for upload in uploads],
+        "uploads": [UploadIndex.to_dict(upload) for upload in uploads],
+        "count": len(uploads),
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    }
+
+
+@router.get("/uploads/retention")
+def get_retention(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Regras e métricas da limpeza de uploads, com o espaço usado pelo usuário
+    """
+    return {
+        "ttl_days": settings.UPLOAD_TTL_DAYS,
+        "quota_bytes": settings.UPLOAD_USER_QUOTA_BYTES,
+        "used_bytes": UploadIndex.used_bytes(db, current_user.id),
+        "metrics": upload_retention.metrics.to_dict()
+    }
+
+
+@router.delete("/uploads/{filename}")
+async def delete_upload(
+    filename: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Remove um upload do usuário
+    
+    O conteúdo e as leituras dele em cache só saem quando nenhum outro
+    upload aponta para ele.
+    """
+    if not filename.startswith(f"bank_{current_user.id}_") and \
+       not filename.startswith(f"internal_{current_user.id}_"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sem permissão para acessar este arquivo"
+        )
+    
+    file_path = os.path.join(UPLOAD_DIR, os.path.basename(filename))
+    if not os.path.isfile(file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Arquivo não encontrado"
+        )
+    
+    # O hash gravado no índice evita reler o arquivo para achar o objeto
+    upload = UploadIndex.get(db, current_user.id, os.path.basename(filename))
+    content_removed = await run_in_threadpool(
+        UploadStore(UPLOAD_DIR).remove, os.path.basename(filename),
+        upload.content_hash if upload is not None else None
+    )
+    UploadIndex.remove(db, current_user.id, os.path.basename(filename))
+    db.commit()
     
     return {
-        "files": user_files,
-        "count": len(user_files)
+        "message": "Arquivo removido com sucesso",
+        "filename": filename,
+        "content_removed": content_removed
     }
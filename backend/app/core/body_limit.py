@@ -0,0 +1,73 @@
+"""
+Limite de tamanho do corpo da requisição
+
+O Starlette grava o multipart inteiro em arquivos temporários antes de a
+rota rodar, então o limite checado na rota (UploadStore) só vale depois de
+o corpo todo ter chegado. Este middleware ASGI recusa com 413 antes disso:
+pelo Content-Length, sem ler nada, ou contando os bytes recebidos (envio
+chunked) e interrompendo a leitura assim que o limite é ultrapassado.
+"""
+from typing import Callable, Iterable
+
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """Recusa com 413 corpos maiores que o limite nos caminhos informados"""
+
+    def __init__(self, app, paths: Iterable[str], max_body_size: Callable[[], int]):
+        """
+        Args:
+            paths: Caminhos (POST) com limite
+            max_body_size: Limite em bytes, consultado a cada requisição
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_body_size()
+        length = dict(scope['headers']).get(b'content-length', b'')
+        if length.isdigit() and int(length) > limit:
+            await self._reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {'type': 'http.disconnect'}
+
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    # Responde já; para a rota, o cliente desconectou
+                    rejected = True
+                    await self._reject(scope, receive, send, limit)
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(scope, receive, send, limit: int) -> None:
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Requisição excede o tamanho máximo de {limit // (1024 * 1024)}MB"}
+        )
+        await response(scope, receive, send)
@@ -53,11 +53,33 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     UPLOAD_DIR: str = "/tmp/lm-conciliation-uploads"
     ALLOWED_EXTENSIONS: Set[str] = {".csv", ".pdf", ".xlsx", ".xls"}
+    PARSED_CACHE_DIR: str = os.path.join(  # Arquivos lidos e normalizados (só do usuário da aplicação)
+        os.path.expanduser("~"), ".cache", "lm-conciliation", "parsed"
+    )
+    PARSED_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # Limite do cache (LRU)
+    
+    # Retenção de uploads
+    UPLOAD_TTL_DAYS: int = 30  # Remove uploads sem uso há mais tempo (0 = sem TTL)
+    UPLOAD_USER_QUOTA_BYTES: int = 1024 * 1024 * 1024  # Espaço por usuário (0 = sem cota)
+    RETENTION_INTERVAL_SECONDS: int = 3600  # Entre rodadas da limpeza (0 = desativada)
+    RETENTION_BATCH_SIZE: int = 100  # Arquivos removidos por lote
+    RETENTION_BATCH_PAUSE: float = 0.5  # Segundos de pausa entre lotes
     
     # Conciliação
     DEFAULT_DATE_TOLERANCE: int = 1
     DEFAULT_VALUE_TOLERANCE: float = 0.02
     DEFAULT_SIMILARITY_THRESHOLD: float = 0.7
+    RECONCILIATION_WORKERS: int = 1  # Processos do motor (<= 0 = todos os núcleos)
+    RECONCILIATION_PARALLEL_MIN_ROWS: int = 20000  # Linhas mínimas para usar processos
+    RECONCILIATION_AGGREGATE_MAX_GROUP: int = 0  # Internas somadas por banco (< 2 desativa)
+    RECONCILIATION_MAX_CONCURRENT_JOBS: int = 2  # Jobs de conciliação rodando ao mesmo tempo
+    RECONCILIATION_PROGRESS_INTERVAL: float = 0.5  # Segundos entre avisos de progresso
+    RECONCILIATION_EVENTS_TOKEN_SECONDS: int = 60  # Validade do token para abrir o stream de progresso
+    RECONCILIATION_TIME_BUDGET: float = 0  # Segundos por conciliação (0 = sem limite)
+    
+    # Extração de PDF
+    PDF_WORKERS: int = 0  # Processos na extração de páginas (<= 0 = todos os núcleos)
+    PDF_PARALLEL_MIN_PAGES: int = 16  # Páginas mínimas para usar processos
     
     # Email Configuration (SendGrid)
     SENDGRID_API_KEY: str = Field(
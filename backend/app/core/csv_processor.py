@@ -1,38 +1,397 @@
 """
 Processador de arquivos CSV
 """
+import codecs
+import csv
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import chardet
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+from app.core.progress import CancellationToken, OperationCancelled
+
+
+# Bytes iniciais usados na detecção de encoding, separador e decimal
+_SAMPLE_SIZE = 64 * 1024
+
+# Linhas da amostra analisadas na detecção de separador e decimal
+_SAMPLE_LINES = 200
+
+# Linhas por bloco quando a leitura pode ser cancelada
+_READ_CHUNK_ROWS = 100000
+
+# Separadores candidatos, em ordem de preferência no empate
+_DELIMITERS = (',', ';', '\t', '|')
+
+# Números com vírgula decimal (1.500,00 / -12,5) e com ponto decimal (1500.00)
+_COMMA_DECIMAL = re.compile(r'^[-+]?(R\$ ?)?\d{1,3}(\.\d{3})*,\d+$|^[-+]?(R\$ ?)?\d+,\d+$')
+_DOT_DECIMAL = re.compile(r'^[-+]?(R\$ ?)?\d+\.\d+$')
+
+# Formatos detectados por hash do conteúdo ou por (caminho, tamanho, mtime) (LRU)
+_FORMAT_CACHE_SIZE = 512
+_format_cache: 'OrderedDict[Tuple, Dict[str, str]]' = OrderedDict()
+_format_cache_lock = threading.Lock()
+
+
+# Formatos aceitos por normalize_date, na ordem em que são tentados
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+    '%d-%m-%Y',
+    '%m/%d/%Y',
+    '%Y/%m/%d'
+]
+
+# Datas só com dígitos ASCII e separadores dos DATE_FORMATS. Só essas vão para
+# o pd.to_datetime; o resto (ex.: 'today', que o pandas aceita e o strptime
+# não) passa por normalize_date
+_NUMERIC_DATE = r'[0-9]{1,4}[-/][0-9]{1,2}[-/][0-9]{1,4}'
+
+# 1.500,00 -> 1500.00
+_BRAZILIAN_DECIMAL = str.maketrans({'.': None, ',': '.'})
+
+# Linhas lidas pelo preview para a amostra e os tipos das colunas
+PREVIEW_SAMPLE_ROWS = 200
+
+# Valores monetários em texto (R$ 1.500,00 / -1,500.00 / 12)
+_MONEY = re.compile(r'^[-+]?(R\$|\$)?\s*[-+]?\d[\d.,]*$')
+
 
 class CSVProcessor:
     """Processa arquivos CSV para conciliação"""
     
     @staticmethod
-    def detect_encoding(file_path: str) -> str:
-        """Detecta encoding do arquivo"""
+    def detect_encoding(file_path: str, sample_size: Optional[int] = _SAMPLE_SIZE) -> str:
+        """
+        Detecta encoding do arquivo
+        
+        Args:
+            file_path: Caminho do arquivo
+            sample_size: Bytes iniciais analisados (None = arquivo inteiro)
+        """
         with open(file_path, 'rb') as f:
-            result = chardet.detect(f.read())
-        return result['encoding']
+            sample = f.read(-1 if sample_size is None else sample_size)
+        return CSVProcessor._sample_encoding(sample)
     
     @staticmethod
-    def read_csv(file_path: str) -> pd.DataFrame:
-        """Lê arquivo CSV com detecção automática de encoding"""
-        encoding = CSVProcessor.detect_encoding(file_path)
+    def _sample_encoding(sample: bytes) -> str:
+        """
+        Encoding de uma amostra do início do arquivo
+        
+        UTF-8 é conferido direto (um caractere cortado no fim da amostra não
+        conta como erro); amostras só ASCII também ficam como UTF-8, já que
+        o resto do arquivo pode ter acentos. O chardet só roda no que não é
+        UTF-8.
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
         
         try:
-            df = pd.read_csv(file_path, encoding=encoding)
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return chardet.detect(sample)['encoding'] or 'latin-1'
+    
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """SHA-256 do conteúdo do arquivo, lido em blocos"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def detect_format(file_path: str, content_hash: Optional[str] = None) -> Dict[str, str]:
+        """
+        Detecta encoding, separador e separador decimal do CSV
+        
+        A detecção usa só os primeiros _SAMPLE_SIZE bytes e o resultado fica
+        em cache: ler de novo o mesmo arquivo não repete a detecção. A chave
+        é o hash do conteúdo quando quem chama já o tem (uma cópia do
+        arquivo também acerta); senão, caminho, tamanho e mtime, sem ler o
+        arquivo inteiro.
+        
+        Args:
+            content_hash: SHA-256 já calculado do arquivo (opcional)
+        
+        Returns:
+            Dict com 'encoding', 'delimiter' e 'decimal'
+        """
+        if content_hash is not None:
+            key = ('sha256', content_hash)
+        else:
+            stat = os.stat(file_path)
+            key = ('file', os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        
+        with _format_cache_lock:
+            if key in _format_cache:
+                _format_cache.move_to_end(key)
+                return dict(_format_cache[key])
+        
+        csv_format = CSVProcessor._sniff_format(file_path)
+        
+        with _format_cache_lock:
+            _format_cache[key] = csv_format
+            while len(_format_cache) > _FORMAT_CACHE_SIZE:
+                _format_cache.popitem(last=False)
+        
+        return dict(csv_format)
+    
+    @staticmethod
+    def _sniff_format(file_path: str) -> Dict[str, str]:
+        """Formato detectado na amostra inicial, sem cache"""
+        with open(file_path, 'rb') as f:
+            sample = f.read(_SAMPLE_SIZE)
+            truncated = bool(f.read(1))
+        
+        encoding = CSVProcessor._sample_encoding(sample)
+        lines = sample.decode(encoding, errors='replace').splitlines()
+        if truncated:
+            # Última linha pode estar cortada
+            lines = lines[:-1]
+        
+        delimiter, rows = CSVProcessor._detect_delimiter(lines[:_SAMPLE_LINES])
+        return {
+            'encoding': encoding,
+            'delimiter': delimiter,
+            'decimal': CSVProcessor._detect_decimal(rows[1:], delimiter)
+        }
+    
+    @staticmethod
+    def _detect_delimiter(lines: List[str]):
+        """
+        Separador com mais colunas entre os que dão o mesmo número de campos
+        no cabeçalho e em todas as linhas da amostra (',' se nenhum der)
+        
+        Returns:
+            (separador, linhas da amostra separadas em campos)
+        """
+        lines = [line for line in lines if line.strip()]
+        best = (',', 1, None)
+        
+        for delimiter in _DELIMITERS:
+            try:
+                rows = list(csv.reader(lines, delimiter=delimiter))
+            except csv.Error:
+                continue
+            if not rows:
+                continue
+            
+            width = len(rows[0])
+            if width > best[1] and all(len(row) == width for row in rows):
+                best = (delimiter, width, rows)
+        
+        delimiter, _, rows = best
+        if rows is None:
+            rows = list(csv.reader(lines, delimiter=delimiter)) if lines else []
+        return delimiter, rows
+    
+    @staticmethod
+    def _detect_decimal(rows: List[List[str]], delimiter: str) -> str:
+        """
+        ',' quando a amostra tem mais números com vírgula decimal que com
+        ponto (exportações brasileiras separadas por ';'). Com separador
+        ',' o decimal é sempre '.'.
+        
+        O separador de milhar não é passado ao pandas: '1.500,00' continua
+        texto e é convertido por normalize_value.
+        """
+        if delimiter == ',':
+            return '.'
+        
+        fields = [field.strip() for row in rows for field in row]
+        comma = sum(1 for field in fields if _COMMA_DECIMAL.match(field))
+        dot = sum(1 for field in fields if _DOT_DECIMAL.match(field))
+        return ',' if comma > dot else '.'
+    
+    @staticmethod
+    def _read_options(csv_format: Dict[str, str]) -> Dict[str, str]:
+        """Parâmetros do pd.read_csv para o formato detectado"""
+        return {'sep': csv_format['delimiter'], 'decimal': csv_format['decimal']}
+    
+    @staticmethod
+    def read_csv(
+        file_path: str,
+        nrows: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Lê arquivo CSV com detecção automática de encoding, separador e decimal
+        
+        Args:
+            file_path: Caminho do arquivo
+            nrows: Lê só as primeiras linhas (None = arquivo inteiro)
+            content_hash: SHA-256 já calculado do arquivo (ver detect_format)
+            cancel_token: Lê em blocos de _READ_CHUNK_ROWS linhas e levanta
+                OperationCancelled entre eles quando cancelado
+        """
+        csv_format = CSVProcessor.detect_format(file_path, content_hash=content_hash)
+        options = CSVProcessor._read_options(csv_format)
+        options['nrows'] = nrows
+        
+        try:
+            df = CSVProcessor._read_frame(file_path, csv_format['encoding'], options, cancel_token)
+        except OperationCancelled:
+            raise
         except:
             # Tentar encoding alternativo
-            df = pd.read_csv(file_path, encoding='latin-1')
+            df = CSVProcessor._read_frame(file_path, 'latin-1', options, cancel_token)
         
         # Limpar nomes das colunas (remover espaços)
         df.columns = df.columns.str.strip()
         
         return df
     
+    @staticmethod
+    def _read_frame(
+        file_path: str,
+        encoding: str,
+        options: Dict,
+        cancel_token: Optional[CancellationToken]
+    ) -> pd.DataFrame:
+        """pd.read_csv inteiro ou, com token, em blocos verificando o cancelamento"""
+        if cancel_token is None:
+            return pd.read_csv(file_path, encoding=encoding, **options)
+        
+        cancel_token.check()
+        frames = []
+        with pd.read_csv(file_path, encoding=encoding, chunksize=_READ_CHUNK_ROWS, **options) as reader:
+            for chunk in reader:
+                frames.append(chunk)
+                cancel_token.check()
+        
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+    
+    @staticmethod
+    def count_rows(file_path: str) -> int:
+        """
+        Linhas de dados do CSV (sem o cabeçalho) contando quebras de linha
+        
+        Lê o arquivo em blocos binários sem interpretar o CSV. Linhas em
+        branco no fim são descontadas; linhas em branco no meio e quebras de
+        linha dentro de campos entre aspas contam como linhas.
+        """
+        with open(file_path, 'rb') as f:
+            return CSVProcessor.count_rows_in_blocks(iter(lambda: f.read(1024 * 1024), b''))
+    
+    @staticmethod
+    def count_rows_in_blocks(blocks: Iterable[bytes]) -> int:
+        """
+        count_rows sobre o conteúdo em blocos (ex.: durante um upload)
+        
+        As linhas em branco do fim podem atravessar vários blocos.
+        """
+        newlines = 0
+        trailing = 0
+        has_content = False
+        
+        for block in blocks:
+            newlines += block.count(b'\n')
+            content = block.rstrip(b'\r\n \t')
+            if content:
+                has_content = True
+                trailing = block[len(content):].count(b'\n')
+            else:
+                trailing += block.count(b'\n')
+        
+        if not has_content:
+            # Arquivo vazio ou só com linhas em branco
+            return 0
+        return max(newlines - trailing, 0)
+    
+    @staticmethod
+    def column_types(df: pd.DataFrame) -> Dict[str, str]:
+        """
+        Tipo de cada coluna: 'date', 'number', 'boolean', 'text' ou 'empty'
+        
+        Colunas de texto são 'date' ou 'number' quando todos os valores
+        preenchidos estão num dos DATE_FORMATS ou parecem valores monetários.
+        """
+        types = {}
+        
+        for name in df.columns:
+            column = df[name]
+            present = column.dropna()
+            
+            if present.empty:
+                types[name] = 'empty'
+            elif pd.api.types.is_bool_dtype(column):
+                types[name] = 'boolean'
+            elif pd.api.types.is_numeric_dtype(column):
+                types[name] = 'number'
+            else:
+                texts = [str(value).strip() for value in present.tolist()]
+                if all(CSVProcessor._is_date(text) for text in texts):
+                    types[name] = 'date'
+                elif all(_MONEY.match(text) for text in texts):
+                    types[name] = 'number'
+                else:
+                    types[name] = 'text'
+        
+        return types
+    
+    @staticmethod
+    def _is_date(text: str) -> bool:
+        for fmt in DATE_FORMATS:
+            try:
+                datetime.strptime(text, fmt)
+                return True
+            except ValueError:
+                continue
+        return False
+    
+    @staticmethod
+    def preview(file_path: str, rows: int = 5, total_rows: Optional[int] = None) -> Dict:
+        """
+        Colunas, primeiras linhas, total de linhas e tipos das colunas
+        
+        Só as primeiras PREVIEW_SAMPLE_ROWS linhas são lidas como CSV. O total
+        de um arquivo maior é `total_rows` quando já conhecido (ex.: contado no
+        upload); senão vem de count_rows, que percorre o arquivo.
+        
+        Returns:
+            Dict com 'columns', 'rows', 'total_rows' e 'column_types'
+        """
+        sample = CSVProcessor.read_csv(file_path, nrows=PREVIEW_SAMPLE_ROWS)
+        
+        if len(sample) < PREVIEW_SAMPLE_ROWS:
+            total_rows = len(sample)
+        else:
+            if total_rows is None:
+                total_rows = CSVProcessor.count_rows(file_path)
+            total_rows = max(total_rows, len(sample))
+        
+        return CSVProcessor.frame_preview(sample, total_rows, rows)
+    
+    @staticmethod
+    def frame_preview(df: pd.DataFrame, total_rows: Optional[int] = None, rows: int = 5) -> Dict:
+        """
+        Preview de uma tabela já lida (mesmo formato de preview)
+        
+        Os tipos usam só as primeiras PREVIEW_SAMPLE_ROWS linhas; sem
+        total_rows, o total é o tamanho da tabela.
+        """
+        sample = df.head(PREVIEW_SAMPLE_ROWS)
+        head = sample.head(rows)
+        head = head.astype(object).where(head.notna(), None)
+        
+        return {
+            'columns': df.columns.tolist(),
+            'rows': head.to_dict('records'),
+            'total_rows': len(df) if total_rows is None else total_rows,
+            'column_types': CSVProcessor.column_types(sample)
+        }
+    
     @staticmethod
     def normalize_date(date_str) -> str:
         """Normaliza datas para formato padrão YYYY-MM-DD"""
@@ -40,15 +399,7 @@ class CSVProcessor:
             return None
         
         # Tentar vários formatos
-        formats = [
-            '%Y-%m-%d',
-            '%d/%m/%Y',
-            '%d-%m-%Y',
-            '%m/%d/%Y',
-            '%Y/%m/%d'
-        ]
-        
-        for fmt in formats:
+        for fmt in DATE_FORMATS:
             try:
                 dt = datetime.strptime(str(date_str).strip(), fmt)
                 return dt.strftime('%Y-%m-%d')
@@ -91,6 +442,90 @@ class CSVProcessor:
         except:
             return 0.0
     
+    @staticmethod
+    def normalize_dates(dates: pd.Series) -> pd.Series:
+        """
+        normalize_date aplicado à coluna inteira
+        
+        Cada texto distinto é convertido uma vez. Os formatos são tentados
+        em lote, na mesma ordem de normalize_date, só nas datas que ainda
+        não casaram; o que o pandas não converte (ex.: anos fora da faixa
+        do datetime64) passa por normalize_date.
+        """
+        result = np.full(len(dates), None, dtype=object)
+        present = dates.notna().to_numpy()
+        if not present.any():
+            return pd.Series(result, index=dates.index)
+        
+        codes, uniques = pd.factorize(dates[present].astype(str))
+        texts = pd.Series(uniques, dtype=object)
+        stripped = texts.str.strip()
+        
+        normalized = pd.Series(None, index=texts.index, dtype=object)
+        pending = stripped.str.fullmatch(_NUMERIC_DATE)
+        
+        for fmt in DATE_FORMATS:
+            if not pending.any():
+                break
+            parsed = pd.to_datetime(stripped[pending], format=fmt, errors='coerce')
+            parsed = parsed[parsed.notna()]
+            normalized[parsed.index] = parsed.dt.strftime('%Y-%m-%d')
+            pending[parsed.index] = False
+        
+        rest = normalized.isna()
+        normalized[rest] = texts[rest].map(CSVProcessor.normalize_date)
+        
+        result[present] = normalized.to_numpy()[codes]
+        return pd.Series(result, index=dates.index)
+    
+    @staticmethod
+    def normalize_values(values: pd.Series) -> pd.Series:
+        """
+        normalize_value aplicado à coluna inteira
+        
+        Colunas já numéricas só viram float. Nas de texto, as células são
+        limpas numa passada só e o formato (brasileiro ou americano) é
+        decidido célula a célula, como em normalize_value, pelas posições da
+        última vírgula e do último ponto de cada uma; só a conversão para
+        float é feita em lote. Uma coluna com os dois formatos misturados
+        converte cada valor pelo seu próprio formato.
+        """
+        result = pd.Series(0.0, index=values.index)
+        present = values.notna()
+        if not present.any():
+            return result
+        
+        if pd.api.types.infer_dtype(values[present]) in ('integer', 'floating', 'mixed-integer-float'):
+            result[present] = values[present].astype(float)
+            return result
+        
+        text = [
+            item.replace('R$', '').replace('$', '').strip().replace(' ', '')
+            for item in values[present].astype(str).tolist()
+        ]
+        last_comma = np.array([item.rfind(',') for item in text], dtype=np.int64)
+        last_dot = np.array([item.rfind('.') for item in text], dtype=np.int64)
+        
+        # Formato brasileiro (1.500,00) ou só vírgula (1500,00)
+        for pos in np.flatnonzero(last_comma > last_dot).tolist():
+            text[pos] = text[pos].translate(_BRAZILIAN_DECIMAL)
+        # Formato americano (1,500.00)
+        for pos in np.flatnonzero((last_comma >= 0) & (last_dot > last_comma)).tolist():
+            text[pos] = text[pos].replace(',', '')
+        
+        try:
+            result[present] = np.array(text, dtype=object).astype(np.float64)
+        except (ValueError, TypeError):
+            result[present] = [CSVProcessor._to_float(item) for item in text]
+        return result
+    
+    @staticmethod
+    def _to_float(value_str: str) -> float:
+        try:
+            return float(value_str)
+        except:
+            return 0.0
+    
     @staticmethod
     def process_dataframe(
         df: pd.DataFrame,
@@ -100,6 +535,69 @@ class CSVProcessor:
     ) -> List[Dict]:
         """
         Processa DataFrame e retorna lista de dicts
+        
+        Converte cada coluna de uma vez (normalize_dates/normalize_values) e
+        gera os mesmos registros de _process_dataframe_rows. Os valores de
+        cada célula são lidos de `df.values`, como faz o iterrows, para que
+        'original' e as conversões vejam os mesmos tipos. Colunas ausentes
+        ou repetidas e tipos fora do comum usam o caminho linha a linha.
+        """
+        values = df.values
+        columns = (date_col, value_col, desc_col)
+        
+        if (
+            len(df) == 0
+            or not df.columns.is_unique
+            or any(col not in df.columns for col in columns)
+            or not (values.dtype == object or values.dtype.kind in 'biuf')
+        ):
+            return CSVProcessor._process_dataframe_rows(df, date_col, value_col, desc_col)
+        
+        def column(col):
+            # Cópia: df.values pode ser uma view dos dados do DataFrame
+            return pd.Series(values[:, df.columns.get_loc(col)].copy(), dtype=object)
+        
+        dates = CSVProcessor.normalize_dates(column(date_col))
+        amounts = CSVProcessor.normalize_values(column(value_col))
+        
+        descriptions = column(desc_col)
+        described = descriptions.notna()
+        descriptions[described] = descriptions[described].astype(str).str.strip()
+        descriptions[~described] = ''
+        
+        # O iterrows converte escalares numpy em tipos nativos; df.values já
+        # traz tipos nativos, a não ser em colunas de objetos numpy
+        cell_types = set(map(type, values.ravel())) if values.dtype == object else set()
+        if any(issubclass(cell_type, np.generic) for cell_type in cell_types):
+            originals = df.to_dict('records')
+        else:
+            names = df.columns.tolist()
+            originals = [dict(zip(names, row)) for row in values.tolist()]
+        
+        return [
+            {
+                'id': idx,
+                'date': date,
+                'value': amount,
+                'description': description,
+                'original': original
+            }
+            for idx, date, amount, description, original in zip(
+                df.index.tolist(), dates.tolist(), amounts.tolist(),
+                descriptions.tolist(), originals
+            )
+        ]
+    
+    @staticmethod
+    def _process_dataframe_rows(
+        df: pd.DataFrame,
+        date_col: str,
+        value_col: str,
+        desc_col: str
+    ) -> List[Dict]:
+        """
+        Processamento linha a linha (iterrows). Mantido como referência para
+        process_dataframe e para os casos que ele não cobre.
         """
         results = []
         
@@ -117,4 +615,37 @@ class CSVProcessor:
                 print(f"Erro processando linha {idx}: {e}")
                 continue
         
-        return results
\ No newline at end of file
+        return results
+    
+    @staticmethod
+    def iter_transactions(
+        file_path: str,
+        date_col: str,
+        value_col: str,
+        desc_col: str,
+        chunksize: int = 50000,
+        include_original: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Lê o CSV em blocos e devolve as transações uma a uma
+        
+        Para arquivos grandes (ReconciliationProcessor.reconcile_stream): só
+        um bloco de `chunksize` linhas fica em memória. Os ids continuam a
+        numeração das linhas entre os blocos.
+        
+        Args:
+            include_original: Mantém a cópia da linha em 'original' (padrão:
+                descartada para economizar memória)
+        """
+        csv_format = CSVProcessor.detect_format(file_path)
+        options = CSVProcessor._read_options(csv_format)
+        
+        with pd.read_csv(
+            file_path, encoding=csv_format['encoding'], chunksize=chunksize, **options
+        ) as reader:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                for item in CSVProcessor.process_dataframe(chunk, date_col, value_col, desc_col):
+                    if not include_original:
+                        del item['original']
+                    yield item
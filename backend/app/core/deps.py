@@ -31,8 +31,9 @@ def get_current_user(
     if payload is None:
         raise credentials_exception
     
+    # Tokens com "type" (reset de senha, stream de progresso) não autenticam
     email: str = payload.get("sub")
-    if email is None:
+    if email is None or payload.get("type") is not None:
         raise credentials_exception
     
     # Buscar usuário no banco
@@ -0,0 +1,141 @@
+"""
+Backends de similaridade de descrições
+
+O score segue o fuzz.token_sort_ratio do fuzzywuzzy (0-100, inteiro):
+as descrições são normalizadas e têm os tokens ordenados antes da
+comparação. O backend RapidFuzz normaliza cada descrição uma única vez e
+calcula os pares em lote (código C, usando todos os núcleos).
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+from fuzzywuzzy import fuzz
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+
+SCORER_RAPIDFUZZ = 'rapidfuzz'
+SCORER_FUZZYWUZZY = 'fuzzywuzzy'
+
+# Mesmo pré-processamento do fuzzywuzzy (utils.full_process com force_ascii):
+# remove caracteres 128-255 e troca tudo que não é letra/número por espaço
+_LATIN1_TABLE = {code: None for code in range(128, 256)}
+_NON_WORD = re.compile(r'(?ui)\W')
+
+
+class FuzzyWuzzyScorer:
+    """Backend de compatibilidade: fuzzywuzzy, um par por vez"""
+    
+    name = SCORER_FUZZYWUZZY
+    
+    def normalize(self, description: str) -> Optional[str]:
+        """Normaliza a descrição (None para descrição vazia)"""
+        if not description:
+            return None
+        return description.lower().strip()
+    
+    def score(self, left: Optional[str], right: Optional[str]) -> int:
+        """Score 0-100 entre duas descrições já normalizadas"""
+        if left is None or right is None:
+            return 0
+        return fuzz.token_sort_ratio(left, right)
+    
+    def score_pairs(
+        self,
+        lefts: List[Optional[str]],
+        rights: List[Optional[str]],
+        min_score: int = 0
+    ) -> np.ndarray:
+        """Score de cada par (lefts[i], rights[i])"""
+        return np.array(
+            [self.score(left, right) for left, right in zip(lefts, rights)],
+            dtype=np.int64
+        )
+
+
+class RapidFuzzScorer:
+    """Backend padrão: RapidFuzz com cálculo em lote"""
+    
+    name = SCORER_RAPIDFUZZ
+    
+    def __init__(self, workers: int = -1):
+        """
+        Args:
+            workers: Threads usadas no cálculo em lote (-1 = todos os núcleos)
+        """
+        self.workers = workers
+    
+    def normalize(self, description: str) -> Optional[str]:
+        """Normaliza a descrição e ordena os tokens (None para descrição vazia)"""
+        if not description:
+            return None
+        
+        text = description.lower().strip().translate(_LATIN1_TABLE)
+        text = _NON_WORD.sub(' ', text).lower().strip()
+        return ' '.join(sorted(text.split()))
+    
+    def score(self, left: Optional[str], right: Optional[str]) -> int:
+        """Score 0-100 entre duas descrições já normalizadas"""
+        if left is None or right is None:
+            return 0
+        if left == right:
+            return 100
+        if not left or not right:
+            return 0
+        return int(round(100 * Indel.normalized_similarity(left, right)))
+    
+    def score_pairs(
+        self,
+        lefts: List[Optional[str]],
+        rights: List[Optional[str]],
+        min_score: int = 0
+    ) -> np.ndarray:
+        """
+        Score de cada par (lefts[i], rights[i]) calculado em lote
+        
+        Pares que não alcançam `min_score` podem ser retornados como 0.
+        """
+        lefts = np.array(lefts, dtype=object)
+        rights = np.array(rights, dtype=object)
+        if not len(lefts):
+            return np.zeros(0, dtype=np.int64)
+        
+        # Descrição vazia (None) sempre tem score 0
+        missing = (lefts == None) | (rights == None)  # noqa: E711
+        lefts[missing] = ''
+        rights[missing] = ''
+        
+        # Corte conservador: o arredondamento para inteiro pode subir até 0.5
+        score_cutoff = (min_score - 1) / 100 if min_score > 1 else None
+        
+        similarities = process.cpdist(
+            lefts,
+            rights,
+            scorer=Indel.normalized_similarity,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=self.workers
+        )
+        
+        # np.rint arredonda como round(): metade para o par mais próximo
+        scores = np.rint(100 * similarities).astype(np.int64)
+        scores[missing] = 0
+        return scores
+
+
+SCORERS = {
+    SCORER_RAPIDFUZZ: RapidFuzzScorer,
+    SCORER_FUZZYWUZZY: FuzzyWuzzyScorer,
+}
+
+
+def get_scorer(name: str, workers: int = -1):
+    """Instancia o backend de similaridade pelo nome"""
+    if name not in SCORERS:
+        raise ValueError(
+            f"Backend de similaridade inválido: {name}. Use um de {tuple(SCORERS)}"
+        )
+    if name == SCORER_RAPIDFUZZ:
+        return RapidFuzzScorer(workers=workers)
+    return FuzzyWuzzyScorer()
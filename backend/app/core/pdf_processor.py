@@ -3,17 +3,99 @@ PDFProcessor - Processador de arquivos PDF
 Responsável por extrair texto de PDFs e identificar transações bancárias
 """
 
+import multiprocessing
+import os
+import numpy as np
 import PyPDF2
 import pandas as pd
 import re
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Dict, Optional, Union
 from datetime import datetime
 
+from app.core.config import settings
+from app.core.progress import CancellationToken
+
+
+# Extensão dos extratos em PDF e colunas da tabela extraída
+PDF_EXTENSION = '.pdf'
+STATEMENT_COLUMNS = ['Data', 'Descricao', 'Valor', 'Tipo']
+
+# Páginas extraídas por tarefa do pool de processos
+_PAGES_PER_TASK = 4
+
+# Padrões de PDFProcessor.patterns, compilados
+_DATE_PATTERN = r'\b(?:\d{2}[/-]\d{2}[/-]\d{4}|\d{4}[/-]\d{2}[/-]\d{2})\b'
+_VALUE_PATTERN = r'R?\$?\s*[-+]?\s*\d{1,3}(?:[.,]\d{3})*[.,]\d{2}'
+_DATE_RE = re.compile(_DATE_PATTERN)
+_VALUE_RE = re.compile(_VALUE_PATTERN)
+_SPACES_RE = re.compile(r'\s+')
+
+# Datas e valores de uma linha numa passada só (data tem preferência na
+# mesma posição, como na remoção das datas antes dos valores). O lookahead
+# descarta de cara as posições que não podem começar nenhum dos dois.
+_TOKEN_RE = re.compile(
+    f'(?=[\\dR$\\s+-])(?:(?P<date>{_DATE_PATTERN})|(?P<value>{_VALUE_PATTERN}))'
+)
+
+# Caracteres de data: um valor seguido de um deles pode terminar dentro de
+# uma data (ex.: '12.2024/02/29')
+_DATE_CHARS = frozenset('0123456789/-')
+
+# Mensagem de PDF sem texto (vazio ou só imagens)
+_NO_TEXT = (
+    "Nenhum texto foi extraído do PDF. O arquivo pode estar vazio ou ser uma "
+    "imagem digitalizada."
+)
+
+# Tarefas em andamento por processo (limita as páginas prontas em memória)
+_TASKS_PER_WORKER = 2
+
+# Processos do pool sem fork do servidor multithread (ver reconciliation_processor)
+_SPAWN = multiprocessing.get_context('spawn')
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Texto das páginas [start, stop) (executado nos processos)
+    
+    Cada processo abre o próprio PdfReader; página que falha vira texto vazio.
+    """
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [_page_text(reader.pages[page_num]) for page_num in range(start, stop)]
+
+
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ''
+    except Exception:
+        return ''
+
 
 class PDFProcessor:
     """Processador de arquivos PDF de extratos bancários"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        parallel_min_pages: Optional[int] = None
+    ):
+        """
+        Args:
+            workers: Processos na extração de páginas (<= 0 = todos os
+                núcleos; padrão: settings.PDF_WORKERS)
+            parallel_min_pages: Páginas a partir das quais usa processos
+                (padrão: settings.PDF_PARALLEL_MIN_PAGES)
+        """
+        if workers is None:
+            workers = settings.PDF_WORKERS
+        if parallel_min_pages is None:
+            parallel_min_pages = settings.PDF_PARALLEL_MIN_PAGES
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        
         # Padrões regex para identificar elementos comuns
         self.patterns = {
             # Formatos de data: DD/MM/YYYY, DD-MM-YYYY, YYYY-MM-DD
@@ -26,47 +108,148 @@ class PDFProcessor:
             'transaction_types': r'(PIX|TED|DOC|TEF|BOLETO|DEPÓSITO|DEPOSITO|SAQUE|TRANSF|PAGAMENTO|COMPRA|TARIFA)',
         }
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
+    def iter_pages(self, file_path: str) -> Iterator[str]:
         """
-        Extrai todo o texto de um PDF
+        Gera o texto de cada página, em ordem
+        
+        PDFs com parallel_min_pages páginas ou mais são extraídos em lotes
+        num pool de processos; só alguns lotes ficam prontos à frente do
+        consumidor. Página que não pode ser extraída gera texto vazio.
         
-        Args:
-            file_path: Caminho do arquivo PDF
-            
-        Returns:
-            String com o texto extraído
-            
         Raises:
             FileNotFoundError: Se arquivo não existe
             ValueError: Se não conseguir ler o PDF
         """
-        text = ""
-        
         try:
             with open(file_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
                 num_pages = len(reader.pages)
                 
-                print(f"📄 PDF possui {num_pages} página(s)")
-                
-                for page_num, page in enumerate(reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        text += page_text + "\n"
-                        print(f"✅ Página {page_num + 1} extraída: {len(page_text)} caracteres")
-                    except Exception as e:
-                        print(f"⚠️ Erro ao extrair página {page_num + 1}: {e}")
-                        continue
-                
-                if not text.strip():
-                    raise ValueError("Nenhum texto foi extraído do PDF. O arquivo pode estar vazio ou ser uma imagem digitalizada.")
-                
-                return text
-                
+                if self.workers <= 1 or num_pages < self.parallel_min_pages:
+                    for page in reader.pages:
+                        yield _page_text(page)
+                    return
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
         except Exception as e:
             raise ValueError(f"Erro ao ler PDF: {str(e)}")
+        
+        yield from self._iter_pages_parallel(file_path, num_pages)
+    
+    def _iter_pages_parallel(self, file_path: str, num_pages: int) -> Iterator[str]:
+        """Páginas extraídas em lotes de _PAGES_PER_TASK por processo"""
+        ranges = iter([
+            (start, min(start + _PAGES_PER_TASK, num_pages))
+            for start in range(0, num_pages, _PAGES_PER_TASK)
+        ])
+        workers = min(self.workers, -(-num_pages // _PAGES_PER_TASK))
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_SPAWN) as executor:
+            pending = deque()
+            
+            def submit_next() -> None:
+                page_range = next(ranges, None)
+                if page_range is not None:
+                    pending.append(executor.submit(_extract_page_range, file_path, *page_range))
+            
+            try:
+                for _ in range(workers * _TASKS_PER_WORKER):
+                    submit_next()
+                
+                while pending:
+                    pages = pending.popleft().result()
+                    submit_next()
+                    yield from pages
+            except Exception as e:
+                raise ValueError(f"Erro ao ler PDF: {str(e)}")
+            finally:
+                # Consumidor parou antes do fim: descarta os lotes na fila
+                for future in pending:
+                    future.cancel()
+    
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """
+        Extrai todo o texto de um PDF
+        
+        Args:
+            file_path: Caminho do arquivo PDF
+        
+        Returns:
+            String com o texto extraído
+        
+        Raises:
+            FileNotFoundError: Se arquivo não existe
+            ValueError: Se não conseguir ler o PDF
+        """
+        text = "".join(page_text + "\n" for page_text in self.iter_pages(file_path))
+        
+        if not text.strip():
+            raise ValueError(f"Erro ao ler PDF: {_NO_TEXT}")
+        
+        return text
+    
+    def parse_pdf(
+        self,
+        file_path: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Extrai e interpreta o extrato consumindo as páginas à medida que saem
+        
+        O texto do PDF inteiro nunca é montado em memória.
+        
+        Args:
+            cancel_token: Verificado entre as páginas
+        
+        Raises:
+            FileNotFoundError: Se arquivo não existe
+            ValueError: Se não conseguir ler o PDF ou não houver texto
+            OperationCancelled: Se o token foi cancelado
+        """
+        has_text = False
+        
+        def pages():
+            nonlocal has_text
+            for page_text in self.iter_pages(file_path):
+                if cancel_token is not None:
+                    cancel_token.check()
+                has_text = has_text or bool(page_text.strip())
+                yield page_text
+        
+        df = self.parse_bank_statement(pages())
+        
+        if not has_text:
+            raise ValueError(f"Erro ao ler PDF: {_NO_TEXT}")
+        
+        return df
+    
+    def read_pdf(
+        self,
+        file_path: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Extrato do PDF no formato de tabela dos CSVs
+        
+        Mesmas colunas de parse_bank_statement (Data, Descricao, Valor, Tipo),
+        mas com Valor com sinal (débitos negativos), como nos extratos em CSV.
+        
+        Args:
+            cancel_token: Verificado entre as páginas
+        
+        Raises:
+            FileNotFoundError: Se arquivo não existe
+            ValueError: Se não conseguir ler o PDF ou não houver texto
+            OperationCancelled: Se o token foi cancelado
+        """
+        df = self.parse_pdf(file_path, cancel_token)
+        
+        if df.empty:
+            return pd.DataFrame(columns=STATEMENT_COLUMNS)
+        
+        df = df.reset_index(drop=True)
+        df['Valor'] = df['Valor'].where(df['Tipo'] == 'Crédito', -df['Valor'])
+        return df
     
     def _parse_date(self, date_str: str) -> Optional[str]:
         """
@@ -74,7 +257,7 @@ class PDFProcessor:
         
         Args:
             date_str: String com a data
-            
+        
         Returns:
             Data no formato YYYY-MM-DD ou None
         """
@@ -100,7 +283,7 @@ class PDFProcessor:
         
         Args:
             value_str: String com o valor (ex: "R$ 1.500,00" ou "-150.00")
-            
+        
         Returns:
             Valor como float ou None
         """
@@ -123,28 +306,148 @@ class PDFProcessor:
             
             value = float(clean_value)
             return -value if is_negative else value
-            
+        
         except (ValueError, AttributeError):
             return None
     
-    def parse_bank_statement(self, text: str) -> pd.DataFrame:
+    def parse_bank_statement(self, text: Union[str, Iterable[str]]) -> pd.DataFrame:
         """
         Converte texto extraído em DataFrame de transações
         
         Args:
-            text: Texto do extrato bancário
-            
+            text: Texto do extrato bancário, ou as páginas em sequência (ex.:
+                iter_pages), consumidas uma a uma
+        
         Returns:
             DataFrame com colunas: Data, Descricao, Valor, Tipo
         """
+        if isinstance(text, str):
+            if not text.strip():
+                return pd.DataFrame(columns=STATEMENT_COLUMNS)
+            text = [text]
+        
+        dates: List[str] = []
+        descriptions: List[str] = []
+        values: List[float] = []
+        current_date = None
+        
+        # Extratos repetem poucas datas; cada texto é convertido uma vez
+        parsed_dates: Dict[str, Optional[str]] = {}
+        
+        for line in (line for page_text in text for line in page_text.split('\n')):
+            line = line.strip()
+            if not line:
+                continue
+            
+            date_str, value_str, description = self._tokenize_line(line)
+            
+            if date_str is not None:
+                if date_str not in parsed_dates:
+                    parsed_dates[date_str] = self._parse_date(date_str)
+                current_date = parsed_dates[date_str]
+            
+            if value_str is not None and current_date:
+                value = self._parse_value(value_str)
+                
+                if value is not None and description:
+                    dates.append(current_date)
+                    descriptions.append(description)
+                    values.append(value)
+        
+        return self._transactions_frame(dates, descriptions, values)
+    
+    @staticmethod
+    def _tokenize_line(line: str):
+        """
+        Primeira data, último valor e descrição (sem datas, valores e espaços
+        repetidos) de uma linha, numa passada de _TOKEN_RE
+        
+        Dá o mesmo resultado da busca em etapas (_match_line_regex): quando
+        uma data encosta num valor (data seguida de ',' ou '.', valor
+        começando logo depois de uma data ou seguido de dígito, '/' ou '-'),
+        as buscas separadas podem achar trechos sobrepostos ou juntar texto
+        ao remover a data, e a linha vai para a busca em etapas.
+        
+        Returns:
+            (data ou None, valor ou None, descrição)
+        """
+        date_str = None
+        value_str = None
+        pieces = []
+        pos = 0
+        date_end = -1
+        
+        for match in _TOKEN_RE.finditer(line):
+            start, end = match.span()
+            
+            if match.lastgroup == 'date':
+                if line[end:end + 1] in ('.', ','):
+                    return PDFProcessor._match_line_regex(line)
+                if date_str is None:
+                    date_str = match.group()
+                date_end = end
+            else:
+                if start == date_end or line[end:end + 1] in _DATE_CHARS:
+                    return PDFProcessor._match_line_regex(line)
+                value_str = match.group()
+            
+            pieces.append(line[pos:start])
+            pos = end
+        
+        if pos == 0:
+            return None, None, ' '.join(line.split())
+        
+        pieces.append(line[pos:])
+        return date_str, value_str, ' '.join(''.join(pieces).split())
+    
+    @staticmethod
+    def _match_line_regex(line: str):
+        """Mesmo retorno de _tokenize_line, com uma busca por padrão"""
+        date_match = _DATE_RE.search(line)
+        value_matches = _VALUE_RE.findall(line)
+        
+        description = _VALUE_RE.sub('', _DATE_RE.sub('', line))
+        description = _SPACES_RE.sub(' ', description).strip()
+        
+        return (
+            date_match.group(0) if date_match else None,
+            value_matches[-1] if value_matches else None,  # Último valor encontrado
+            description
+        )
+    
+    @staticmethod
+    def _transactions_frame(
+        dates: List[str],
+        descriptions: List[str],
+        values: List[float]
+    ) -> pd.DataFrame:
+        """DataFrame de transações a partir das colunas, sem duplicatas"""
+        if not dates:
+            return pd.DataFrame()
+        
+        amounts = np.array(values, dtype=np.float64)
+        df = pd.DataFrame({
+            'Data': dates,
+            'Descricao': descriptions,
+            'Valor': np.abs(amounts),  # Valor sempre positivo
+            'Tipo': np.where(amounts >= 0, 'Crédito', 'Débito').astype(object)
+        })
+        
+        # Remover duplicatas
+        return df.drop_duplicates()
+    
+    def _parse_bank_statement_regex(self, text: str) -> pd.DataFrame:
+        """
+        Implementação anterior de parse_bank_statement, com as buscas feitas
+        padrão a padrão em cada linha (referência de resultado e benchmark)
+        """
         if not text or not text.strip():
-            return pd.DataFrame(columns=['Data', 'Descricao', 'Valor', 'Tipo'])
+            return pd.DataFrame(columns=STATEMENT_COLUMNS)
         
         transactions = []
-        lines = text.split('\n')
         current_date = None
         
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             if not line:
                 continue
@@ -182,11 +485,8 @@ class PDFProcessor:
         df = pd.DataFrame(transactions)
         
         if not df.empty:
-            print(f"✅ Encontradas {len(df)} transações no PDF")
             # Remover duplicatas
             df = df.drop_duplicates()
-        else:
-            print("⚠️ Nenhuma transação identificada no PDF")
         
         return df
     
@@ -196,7 +496,7 @@ class PDFProcessor:
         
         Args:
             df: DataFrame com transações
-            
+        
         Returns:
             Dicionário com estatísticas
         """
@@ -0,0 +1,177 @@
+"""
+Progresso e interrupção de processamentos longos
+
+O motor de conciliação avisa o andamento por um ProgressReporter, que também
+verifica o cancelamento e o orçamento de tempo. O custo por linha é uma
+comparação de inteiros: o relógio e o token só são consultados a cada `step`
+linhas e o callback só é chamado depois de `min_interval` segundos desde o
+último aviso (trocas de etapa são sempre avisadas).
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+# Etapas da conciliação, na ordem em que acontecem
+STAGE_EXACT = 'exact'
+STAGE_CANDIDATES = 'candidates'
+STAGE_SCORING = 'scoring'
+STAGE_ASSIGNMENT = 'assignment'
+STAGE_AGGREGATE = 'aggregate'
+STAGE_DONE = 'done'
+
+# Quantas vezes por etapa, no máximo, o relógio é consultado
+_CHECKS_PER_STAGE = 200
+
+
+class OperationCancelled(Exception):
+    """Processamento interrompido por um CancellationToken"""
+
+
+class CancellationToken:
+    """Sinal de cancelamento compartilhado entre threads"""
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self) -> None:
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def check(self) -> None:
+        """Levanta OperationCancelled se o token foi cancelado"""
+        if self._event.is_set():
+            raise OperationCancelled("Processamento cancelado")
+
+
+class ProgressReporter:
+    """
+    Repassa o progresso a um callback com no máximo um aviso por intervalo
+    
+    O callback recebe um dict com `stage`, `processed` e `total` (linhas
+    bancárias da etapa) e `matched` (matches encontrados até agora).
+    
+    Nos mesmos pontos de verificação, um token cancelado levanta
+    OperationCancelled e o fim do orçamento de tempo marca `expired`: a
+    partir daí start() e advance() retornam True e cada etapa deve parar e
+    devolver o que já tem. Etapas iniciadas com `finishing=True` só
+    concluem o que as anteriores já coletaram (pontuar e atribuir os
+    candidatos encontrados), então rodam até o fim mesmo com o orçamento
+    esgotado; o cancelamento continua valendo nelas. Sem callback, token nem
+    orçamento, todos os métodos são no-op.
+    """
+    
+    def __init__(
+        self,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        min_interval: float = 0.5,
+        cancel_token: Optional[CancellationToken] = None,
+        time_budget: Optional[float] = None
+    ):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.cancel_token = cancel_token
+        self.deadline = time.monotonic() + time_budget if time_budget else None
+        self.expired = False
+        self.finishing = False
+        self.stage = None
+        self.total = 0
+        self.matched = 0
+        self._active = (
+            callback is not None or cancel_token is not None or self.deadline is not None
+        )
+        self._step = 1
+        self._next_check = 0 if self._active else math.inf
+        self._last_emit = 0.0
+    
+    def start(
+        self,
+        stage: str,
+        total: int = 0,
+        matched: Optional[int] = None,
+        finishing: bool = False
+    ) -> bool:
+        """
+        Inicia uma etapa (sempre avisada)
+        
+        Args:
+            finishing: A etapa só conclui o trabalho já coletado e não para
+                pelo orçamento de tempo
+        
+        Returns:
+            True se o orçamento de tempo acabou e a etapa deve ser pulada
+        """
+        if not self._active:
+            return False
+        
+        self.stage = stage
+        self.finishing = finishing
+        self.total = total
+        if matched is not None:
+            self.matched = matched
+        self._step = max(1, total // _CHECKS_PER_STAGE)
+        
+        if self._should_stop():
+            return True
+        
+        self._next_check = self._step
+        if self.callback is not None:
+            self._emit(0)
+        return False
+    
+    def advance(self, processed: int, matched: int = 0) -> bool:
+        """
+        Avisa o andamento da etapa atual, se já passou o intervalo
+        
+        Args:
+            processed: Linhas bancárias processadas na etapa
+            matched: Matches encontrados na etapa (somados aos anteriores)
+        
+        Returns:
+            True se o orçamento de tempo acabou e a etapa deve parar
+        """
+        if processed < self._next_check:
+            return False
+        
+        if self._should_stop():
+            return True
+        
+        self._next_check = processed + self._step
+        if self.callback is not None and time.monotonic() - self._last_emit >= self.min_interval:
+            self._emit(processed, matched)
+        return False
+    
+    def finish(self, total: int, matched: int) -> None:
+        """Avisa o fim do processamento (sempre avisado)"""
+        if self.callback is None:
+            return
+        
+        self.stage = STAGE_DONE
+        self.total = total
+        self.matched = matched
+        self._emit(total)
+    
+    def _should_stop(self) -> bool:
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        
+        if not self.expired and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.expired = True
+        
+        if self.expired and not self.finishing:
+            self._next_check = 0
+            return True
+        return False
+    
+    def _emit(self, processed: int, matched: int = 0) -> None:
+        self._last_emit = time.monotonic()
+        self.callback({
+            'stage': self.stage,
+            'processed': processed,
+            'total': self.total,
+            'matched': self.matched + matched
+        })
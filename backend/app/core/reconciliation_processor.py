@@ -1,9 +1,107 @@
 """
 Motor de Conciliação - CORE DO SISTEMA
 """
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
-from fuzzywuzzy import fuzz
+import math
+import multiprocessing
+import os
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, wait as wait_futures
+from itertools import groupby
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, min_weight_full_bipartite_matching
+
+from app.core.config import settings
+from app.core.fuzzy_scorer import SCORER_RAPIDFUZZ, get_scorer
+from app.core.progress import (
+    STAGE_AGGREGATE, STAGE_ASSIGNMENT, STAGE_CANDIDATES, STAGE_EXACT, STAGE_SCORING,
+    CancellationToken, ProgressReporter
+)
+
+
+# Estratégias de busca de candidatos
+STRATEGY_LOOP = 'loop'          # Laço aninhado original (O(n×m)), referência
+STRATEGY_INDEXED = 'indexed'    # Índice por dia e faixa de valor
+STRATEGIES = (STRATEGY_LOOP, STRATEGY_INDEXED)
+
+# Escolha entre candidatos
+ASSIGNMENT_GREEDY = 'greedy'    # Cada banco, na ordem do arquivo, pega o melhor livre
+ASSIGNMENT_OPTIMAL = 'optimal'  # Máxima soma de confiança (um para um)
+ASSIGNMENTS = (ASSIGNMENT_GREEDY, ASSIGNMENT_OPTIMAL)
+
+# Folga relativa aplicada à janela de valores do índice. A janela é só um
+# pré-filtro: o critério final continua sendo _values_match.
+_VALUE_WINDOW_SLACK = 1e-9
+
+# Peso de data + valor por código (2 * data exata + valor exato), somados na
+# mesma ordem de _prepared_match_confidence para gerar os mesmos floats
+_BASE_WEIGHTS = tuple(
+    0.0 + (0.3 if date_exact else 0.15) + (0.4 if value_exact else 0.2)
+    for date_exact in (False, True)
+    for value_exact in (False, True)
+)
+
+_EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+# Nós visitados, por transação bancária, na busca de somas da passada agregada
+_AGGREGATE_MAX_NODES = 20000
+
+# Fatias de data por processo: mais fatias equilibram melhor a carga, ao custo
+# de repetir as internas da sobreposição em cada uma
+_SHARDS_PER_WORKER = 2
+
+# Segundos entre consultas ao token enquanto espera uma fatia
+_SHARD_POLL_SECONDS = 0.2
+
+# Os processos do pool partem do zero (spawn): um fork do servidor, que tem
+# threads (jobs, retenção), copiaria locks que outra thread segurava
+_SPAWN = multiprocessing.get_context('spawn')
+
+
+def internal_members(match: Dict[str, Any]) -> List[Dict]:
+    """
+    Transações internas de um match: a própria interna ou, em matches
+    agregados, todas as que compõem a soma
+    """
+    internal = match['internal_transaction']
+    if isinstance(internal, dict) and 'members' in internal:
+        return internal['members']
+    return [internal]
+
+
+def match_rate(matched_rows: int, total_rows: int) -> float:
+    """
+    Taxa de conciliação (%): transações conciliadas, dos dois lados, sobre
+    o total. Um match agregado conta o banco e todas as suas internas.
+    """
+    if not total_rows:
+        return 0.0
+    return round(matched_rows / total_rows * 100, 2)
+
+
+def _score_shard(
+    options: Dict[str, Any],
+    bank_data: List[Dict],
+    internal_data: List[Dict],
+    bank_ordinals: List[Optional[int]],
+    internal_ordinals: List[Optional[int]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Candidatos e confianças de uma fatia de datas (executado no processo filho)
+    
+    Returns:
+        Arrays paralelos (posição bancária, posição interna, confiança) com
+        posições locais à fatia
+    """
+    processor = ReconciliationProcessor(**options)
+    candidates = processor._collect_candidates(
+        bank_data, internal_data, bank_ordinals, internal_ordinals
+    )
+    return processor._score_candidates(bank_data, internal_data, *candidates)
 
 
 class ReconciliationProcessor:
@@ -15,31 +113,113 @@ class ReconciliationProcessor:
         self,
         date_tolerance: int = 1,
         value_tolerance: float = 0.02,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        strategy: str = STRATEGY_INDEXED,
+        scorer: str = SCORER_RAPIDFUZZ,
+        scorer_workers: int = -1,
+        exact_first: bool = True,
+        assignment: str = ASSIGNMENT_GREEDY,
+        workers: Optional[int] = None,
+        parallel_min_rows: Optional[int] = None,
+        aggregate_max_group: Optional[int] = None
     ):
         """
         Args:
             date_tolerance: Dias de diferença aceitos (padrão: 1 dia)
             value_tolerance: % de diferença aceita no valor (padrão: 2%)
             similarity_threshold: Score mínimo de similaridade (0-1)
+            strategy: Busca de candidatos - 'indexed' (padrão) ou 'loop'
+            scorer: Backend de similaridade - 'rapidfuzz' (padrão) ou 'fuzzywuzzy'
+            scorer_workers: Threads do cálculo em lote (-1 = todos os núcleos)
+            exact_first: Conciliar antes os pares únicos com mesma data e valor
+            assignment: Escolha entre candidatos - 'greedy' (padrão) ou 'optimal'
+            workers: Processos para o modo indexado (<= 0 = todos os núcleos;
+                padrão: settings.RECONCILIATION_WORKERS)
+            parallel_min_rows: Total de linhas a partir do qual usa processos
+                (padrão: settings.RECONCILIATION_PARALLEL_MIN_ROWS)
+            aggregate_max_group: Máximo de internas somadas para um banco na
+                passada agregada (< 2 desativa; padrão:
+                settings.RECONCILIATION_AGGREGATE_MAX_GROUP, desativada)
         """
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Estratégia inválida: {strategy}. Use uma de {STRATEGIES}"
+            )
+        if assignment not in ASSIGNMENTS:
+            raise ValueError(
+                f"Atribuição inválida: {assignment}. Use uma de {ASSIGNMENTS}"
+            )
+        if assignment == ASSIGNMENT_OPTIMAL and strategy == STRATEGY_LOOP:
+            raise ValueError("Atribuição 'optimal' requer a estratégia 'indexed'")
+        
         self.date_tolerance = date_tolerance
         self.value_tolerance = value_tolerance
         self.similarity_threshold = similarity_threshold
+        self.strategy = strategy
+        self.scorer = get_scorer(scorer, workers=scorer_workers)
+        self.exact_first = exact_first
+        self.assignment = assignment
+        
+        if workers is None:
+            workers = settings.RECONCILIATION_WORKERS
+        if parallel_min_rows is None:
+            parallel_min_rows = settings.RECONCILIATION_PARALLEL_MIN_ROWS
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.parallel_min_rows = parallel_min_rows
+        
+        if aggregate_max_group is None:
+            aggregate_max_group = settings.RECONCILIATION_AGGREGATE_MAX_GROUP
+        self.aggregate_max_group = aggregate_max_group
+        
+        # Trocado por reconcile() quando recebe progress_callback
+        self._progress = ProgressReporter()
     
     def _parse_date(self, date_str: str) -> datetime:
         """Converte string para datetime"""
         return datetime.strptime(date_str, '%Y-%m-%d')
     
-    def _dates_match(self, date1: str, date2: str) -> bool:
-        """Verifica se datas estão dentro da tolerância"""
+    def _date_ordinal(self, date_str: str) -> Optional[int]:
+        """Converte string para número do dia (ordinal), ou None se inválida"""
         try:
-            d1 = self._parse_date(date1)
-            d2 = self._parse_date(date2)
-            diff = abs((d1 - d2).days)
-            return diff <= self.date_tolerance
+            return self._parse_date(date_str).toordinal()
         except:
+            return None
+    
+    def _prepare_ordinals(self, data: List[Dict]) -> List[Optional[int]]:
+        """
+        Etapa de preparação: converte a data de cada transação em ordinal
+        
+        Cada string de data distinta é convertida uma única vez. Datas
+        inválidas viram None e nunca casam com nenhuma outra.
+        
+        Returns:
+            Lista de ordinais alinhada com `data`
+        """
+        cache = {}
+        ordinals = []
+        
+        for trans in data:
+            date_str = trans['date']
+            try:
+                ordinal = cache[date_str]
+            except KeyError:
+                ordinal = cache[date_str] = self._date_ordinal(date_str)
+            except TypeError:
+                # Valor não hasheável: converter sem cache
+                ordinal = self._date_ordinal(date_str)
+            ordinals.append(ordinal)
+        
+        return ordinals
+    
+    def _ordinals_match(self, ordinal1: Optional[int], ordinal2: Optional[int]) -> bool:
+        """Equivalente a _dates_match para datas já convertidas em ordinais"""
+        if ordinal1 is None or ordinal2 is None:
             return False
+        return abs(ordinal1 - ordinal2) <= self.date_tolerance
+    
+    def _dates_match(self, date1: str, date2: str) -> bool:
+        """Verifica se datas estão dentro da tolerância"""
+        return self._ordinals_match(self._date_ordinal(date1), self._date_ordinal(date2))
     
     def _values_match(self, value1: float, value2: float) -> bool:
         """Verifica se valores estão dentro da tolerância"""
@@ -57,12 +237,11 @@ class ReconciliationProcessor:
         if not desc1 or not desc2:
             return 0.0
         
-        # Normalizar strings
-        desc1 = desc1.lower().strip()
-        desc2 = desc2.lower().strip()
-        
-        # Usar ratio do fuzzywuzzy (0-100, converter para 0-1)
-        score = fuzz.token_sort_ratio(desc1, desc2) / 100.0
+        # Score do backend (0-100, converter para 0-1)
+        score = self.scorer.score(
+            self.scorer.normalize(desc1),
+            self.scorer.normalize(desc2)
+        ) / 100.0
         
         return score
     
@@ -79,12 +258,27 @@ class ReconciliationProcessor:
         - Valor exato: 0.4
         - Descrição similar: 0.3
         """
+        return self._prepared_match_confidence(
+            bank_transaction,
+            internal_transaction,
+            self._date_ordinal(bank_transaction['date']),
+            self._date_ordinal(internal_transaction['date'])
+        )
+    
+    def _prepared_match_confidence(
+        self,
+        bank_transaction: Dict,
+        internal_transaction: Dict,
+        bank_ordinal: Optional[int],
+        internal_ordinal: Optional[int]
+    ) -> float:
+        """_calculate_match_confidence usando os ordinais já calculados"""
         confidence = 0.0
         
         # Data
         if bank_transaction['date'] == internal_transaction['date']:
             confidence += 0.3
-        elif self._dates_match(bank_transaction['date'], internal_transaction['date']):
+        elif self._ordinals_match(bank_ordinal, internal_ordinal):
             confidence += 0.15
         
         # Valor
@@ -102,49 +296,52 @@ class ReconciliationProcessor:
         
         return round(confidence, 2)
     
-    def reconcile(
+    def _match_loop(
         self,
         bank_data: List[Dict],
         internal_data: List[Dict],
-        **kwargs
-    ) -> Dict[str, Any]:
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> Tuple[List[Dict], List[Dict], set]:
         """
-        Executa conciliação
-        
-        Returns:
-            Dict com:
-            - matched: lista de matches encontrados
-            - bank_only: transações apenas no banco
-            - internal_only: transações apenas no sistema interno
-            - summary: resumo estatístico
+        Busca de matches comparando cada transação bancária com todas as
+        internas (O(n×m)). Mantida como referência para o modo indexado.
         """
         matched = []
         bank_only = []
-        internal_only = []
         
         # Set para rastrear IDs já conciliados
-        matched_bank_ids = set()
         matched_internal_ids = set()
         
+        if self._progress.start(STAGE_ASSIGNMENT, len(bank_data)):
+            return matched, list(bank_data), matched_internal_ids
+        
         # Procurar matches
-        for bank_trans in bank_data:
+        for bank_pos, (bank_trans, bank_ordinal) in enumerate(zip(bank_data, bank_ordinals)):
+            if self._progress.advance(bank_pos, len(matched)):
+                # Orçamento esgotado: o restante fica sem match
+                bank_only.extend(bank_data[bank_pos:])
+                break
+            
             best_match = None
             best_confidence = 0.0
             
-            for internal_trans in internal_data:
+            for internal_trans, internal_ordinal in zip(internal_data, internal_ordinals):
                 # Pular se já foi conciliado
                 if internal_trans['id'] in matched_internal_ids:
                     continue
                 
                 # Verificar critérios básicos
-                if not self._dates_match(bank_trans['date'], internal_trans['date']):
+                if not self._ordinals_match(bank_ordinal, internal_ordinal):
                     continue
                 
                 if not self._values_match(bank_trans['value'], internal_trans['value']):
                     continue
                 
                 # Calcular confiança
-                confidence = self._calculate_match_confidence(bank_trans, internal_trans)
+                confidence = self._prepared_match_confidence(
+                    bank_trans, internal_trans, bank_ordinal, internal_ordinal
+                )
                 
                 # Manter melhor match acima do threshold
                 if confidence >= self.similarity_threshold and confidence > best_confidence:
@@ -158,25 +355,1003 @@ class ReconciliationProcessor:
                     'internal_transaction': best_match,
                     'confidence': best_confidence
                 })
-                matched_bank_ids.add(bank_trans['id'])
                 matched_internal_ids.add(best_match['id'])
             else:
                 bank_only.append(bank_trans)
         
+        return matched, bank_only, matched_internal_ids
+    
+    def _build_internal_index(
+        self,
+        internal_data: List[Dict],
+        internal_ordinals: List[Optional[int]]
+    ) -> Dict[int, Tuple]:
+        """
+        Indexa transações internas por dia (ordinal da data)
+        
+        Cada dia guarda as posições ordenadas por valor, permitindo buscar
+        por faixa com bisect. Valores não finitos ficam numa lista à
+        parte, sempre verificada. Transações com data inválida não entram no
+        índice, pois _dates_match nunca as aceitaria.
+        
+        Returns:
+            Dict ordinal -> (valores ordenados, posições, posições sem valor finito)
+        """
+        buckets = defaultdict(list)
+        odd_buckets = defaultdict(list)
+        
+        for pos, (trans, ordinal) in enumerate(zip(internal_data, internal_ordinals)):
+            if ordinal is None:
+                continue
+            
+            value = trans['value']
+            if isinstance(value, (int, float)) and math.isfinite(value):
+                buckets[ordinal].append((value, pos))
+            else:
+                odd_buckets[ordinal].append(pos)
+        
+        index = {}
+        for ordinal in set(buckets) | set(odd_buckets):
+            entries = sorted(buckets.get(ordinal, []))
+            index[ordinal] = (
+                [value for value, _ in entries],
+                np.array([pos for _, pos in entries], dtype=np.int64),
+                odd_buckets.get(ordinal, [])
+            )
+        
+        return index
+    
+    def _value_window(self, value) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Faixas de valores internos em relação a _values_match
+        
+        Returns:
+            (mínimo, máximo, mínimo garantido, máximo garantido): valores fora
+            de [mínimo, máximo] nunca casam e valores dentro da faixa garantida
+            sempre casam; o resto precisa ser verificado. None quando nenhum
+            valor pode casar.
+        """
+        tolerance = self.value_tolerance
+        
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            return (-math.inf, math.inf, math.inf, -math.inf)
+        if value == 0:
+            return None
+        if tolerance < 0 or tolerance >= 1:
+            return (-math.inf, math.inf, math.inf, -math.inf)
+        if value < 0:
+            # Entre dois negativos a diferença relativa nunca é positiva,
+            # então qualquer valor negativo passa em _values_match
+            return (-math.inf, 0.0, -math.inf, -math.ulp(0.0))
+        
+        low = value * (1 - tolerance)
+        high = value / (1 - tolerance)
+        return (
+            low * (1 - _VALUE_WINDOW_SLACK),
+            high * (1 + _VALUE_WINDOW_SLACK),
+            low * (1 + _VALUE_WINDOW_SLACK),
+            high * (1 - _VALUE_WINDOW_SLACK)
+        )
+    
+    def _indexed_candidates(
+        self,
+        ordinal: Optional[int],
+        value: float,
+        index: Dict[int, Tuple],
+        ordinals: List[int],
+        internal_data: List[Dict]
+    ) -> np.ndarray:
+        """
+        Posições (em ordem crescente) das transações internas dentro da
+        janela de data que passam em _values_match com `value`
+        """
+        if ordinal is None:
+            return _EMPTY_POSITIONS
+        
+        window = self._value_window(value)
+        if window is None:
+            return _EMPTY_POSITIONS
+        low, high, sure_low, sure_high = window
+        
+        first = bisect_left(ordinals, ordinal - self.date_tolerance)
+        last = bisect_right(ordinals, ordinal + self.date_tolerance)
+        
+        chunks = []
+        to_check = []
+        for day in ordinals[first:last]:
+            values, positions, odd_positions = index[day]
+            start = bisect_left(values, low)
+            end = bisect_right(values, high)
+            sure_start = min(max(bisect_left(values, sure_low), start), end)
+            sure_end = max(min(bisect_right(values, sure_high), end), sure_start)
+            
+            if sure_end > sure_start:
+                chunks.append(positions[sure_start:sure_end])
+            if sure_start > start:
+                to_check.extend(positions[start:sure_start].tolist())
+            if end > sure_end:
+                to_check.extend(positions[sure_end:end].tolist())
+            to_check.extend(odd_positions)
+        
+        checked = [
+            pos for pos in to_check
+            if self._values_match(value, internal_data[pos]['value'])
+        ]
+        if checked:
+            chunks.append(np.array(checked, dtype=np.int64))
+        
+        if not chunks:
+            return _EMPTY_POSITIONS
+        return np.sort(np.concatenate(chunks))
+    
+    def _match_indexed(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> Tuple[List[Dict], List[Dict], set]:
+        """
+        Busca de matches usando índice de dia/valor
+        
+        Cada transação bancária só avalia as internas dentro da janela de
+        tolerância de data e valor. As descrições de todos os candidatos são
+        pontuadas em lote e depois a escolha gulosa segue a ordem do arquivo,
+        então o resultado é idêntico ao de _match_loop.
+        """
+        if self._use_processes(bank_data, internal_data):
+            edges = self._sharded_edges(
+                bank_data, internal_data, bank_ordinals, internal_ordinals
+            )
+        else:
+            candidates = self._collect_candidates(
+                bank_data, internal_data, bank_ordinals, internal_ordinals
+            )
+            edges = self._score_candidates(bank_data, internal_data, *candidates)
+        
+        if self.assignment == ASSIGNMENT_OPTIMAL:
+            return self._assign_optimal(bank_data, internal_data, *edges)
+        return self._assign_greedy(bank_data, internal_data, *edges)
+    
+    def _use_processes(self, bank_data: List[Dict], internal_data: List[Dict]) -> bool:
+        """Indica se a busca de candidatos deve ser dividida entre processos"""
+        return (
+            self.workers > 1 and
+            len(bank_data) + len(internal_data) >= self.parallel_min_rows
+        )
+    
+    def _date_shards(
+        self,
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Divide as transações em faixas contíguas de datas
+        
+        Cada banco com data válida cai em exatamente uma faixa (os cortes são
+        feitos entre dias, com quantidades parecidas de linhas). As internas
+        de cada faixa cobrem a faixa mais date_tolerance para cada lado, então
+        todo candidato de um banco está na mesma fatia que ele.
+        
+        Returns:
+            Lista de (posições bancárias, posições internas), em ordem crescente
+        """
+        bank_ords = np.array(
+            [-1 if ordinal is None else ordinal for ordinal in bank_ordinals],
+            dtype=np.int64
+        )
+        internal_ords = np.array(
+            [-1 if ordinal is None else ordinal for ordinal in internal_ordinals],
+            dtype=np.int64
+        )
+        bank_valid = np.array([ordinal is not None for ordinal in bank_ordinals], dtype=bool)
+        internal_valid = np.array([ordinal is not None for ordinal in internal_ordinals], dtype=bool)
+        
+        days, day_counts = np.unique(bank_ords[bank_valid], return_counts=True)
+        if not len(days):
+            return []
+        
+        shard_count = min(len(days), self.workers * _SHARDS_PER_WORKER)
+        targets = np.arange(1, shard_count) * (day_counts.sum() / shard_count)
+        cuts = np.searchsorted(np.cumsum(day_counts), targets, side='left') + 1
+        bounds = np.unique(np.concatenate(([0], cuts, [len(days)])))
+        
+        shards = []
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            first_day = days[start]
+            last_day = days[stop - 1]
+            bank_positions = np.flatnonzero(
+                bank_valid & (bank_ords >= first_day) & (bank_ords <= last_day)
+            )
+            internal_positions = np.flatnonzero(
+                internal_valid &
+                (internal_ords >= first_day - self.date_tolerance) &
+                (internal_ords <= last_day + self.date_tolerance)
+            )
+            shards.append((bank_positions, internal_positions))
+        return shards
+    
+    def _sharded_edges(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mesmo resultado de _collect_candidates + _score_candidates, com as
+        faixas de datas processadas em paralelo
+        
+        Os processos só calculam candidatos e confianças. Uma interna da
+        sobreposição pode ser candidata em duas faixas; esse conflito é
+        resolvido pela atribuição, que roda uma única vez sobre todos os pares
+        reunidos na mesma ordem da execução serial.
+        
+        Returns:
+            Arrays paralelos (posição bancária, posição interna, confiança)
+        """
+        shards = self._date_shards(bank_ordinals, internal_ordinals)
+        if not shards:
+            return _EMPTY_POSITIONS, _EMPTY_POSITIONS, np.empty(0, dtype=np.float64)
+        
+        options = {
+            'date_tolerance': self.date_tolerance,
+            'value_tolerance': self.value_tolerance,
+            'similarity_threshold': self.similarity_threshold,
+            'scorer': self.scorer.name,
+            'scorer_workers': 1,
+            'workers': 1
+        }
+        
+        def rows(data, positions):
+            # Só os campos usados na busca; 'original' não precisa ir ao processo
+            return [
+                {
+                    'date': data[pos]['date'],
+                    'value': data[pos]['value'],
+                    'description': data[pos]['description']
+                }
+                for pos in positions.tolist()
+            ]
+        
+        def ordinals(values, positions):
+            return [values[pos] for pos in positions.tolist()]
+        
+        empty = _EMPTY_POSITIONS, _EMPTY_POSITIONS, np.empty(0, dtype=np.float64)
+        if self._progress.start(STAGE_CANDIDATES, len(bank_data)):
+            return empty
+        
+        executor = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(shards)), mp_context=_SPAWN
+        )
+        finished = False
+        try:
+            futures = [
+                executor.submit(
+                    _score_shard,
+                    options,
+                    rows(bank_data, bank_positions),
+                    rows(internal_data, internal_positions),
+                    ordinals(bank_ordinals, bank_positions),
+                    ordinals(internal_ordinals, internal_positions)
+                )
+                for bank_positions, internal_positions in shards
+            ]
+            results = []
+            processed = 0
+            for (bank_positions, _), future in zip(shards, futures):
+                self._wait_shard(future)
+                results.append(future.result())
+                processed += len(bank_positions)
+                if self._progress.advance(processed):
+                    # Orçamento esgotado: ficam as fatias já prontas
+                    break
+            finished = len(results) == len(shards)
+        finally:
+            # Cancelado ou sem orçamento: não espera as fatias em andamento
+            executor.shutdown(wait=finished, cancel_futures=True)
+        
+        if not results:
+            return empty
+        
+        edge_bank = np.concatenate([
+            bank_positions[local_bank]
+            for (bank_positions, _), (local_bank, _, _) in zip(shards, results)
+        ])
+        edge_pos = np.concatenate([
+            internal_positions[local_pos]
+            for (_, internal_positions), (_, local_pos, _) in zip(shards, results)
+        ])
+        edge_conf = np.concatenate([conf for _, _, conf in results])
+        
+        order = np.lexsort((edge_pos, edge_bank))
+        return edge_bank[order], edge_pos[order], edge_conf[order]
+    
+    def _wait_shard(self, future) -> None:
+        """Espera uma fatia consultando o cancelamento a cada _SHARD_POLL_SECONDS"""
+        token = self._progress.cancel_token
+        if token is None:
+            return
+        
+        while not wait_futures([future], timeout=_SHARD_POLL_SECONDS).done:
+            token.check()
+    
+    def _collect_candidates(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pares que passam nos critérios de data e valor
+        
+        Returns:
+            Arrays paralelos (posição bancária, posição interna, código de
+            peso), ordenados por banco e depois por posição interna. O código
+            indexa _BASE_WEIGHTS: 2 * data exata + valor exato.
+        """
+        index = self._build_internal_index(internal_data, internal_ordinals)
+        ordinals = sorted(index)
+        
+        counts = []
+        pos_chunks = []
+        
+        if self._progress.start(STAGE_CANDIDATES, len(bank_data)):
+            return _EMPTY_POSITIONS, _EMPTY_POSITIONS, np.empty(0, dtype=np.int8)
+        
+        for bank_pos, (bank_trans, bank_ordinal) in enumerate(zip(bank_data, bank_ordinals)):
+            if self._progress.advance(bank_pos):
+                break
+            positions = self._indexed_candidates(
+                bank_ordinal, bank_trans['value'], index, ordinals, internal_data
+            )
+            counts.append(len(positions))
+            if len(positions):
+                pos_chunks.append(positions)
+        
+        if not pos_chunks:
+            return _EMPTY_POSITIONS, _EMPTY_POSITIONS, np.empty(0, dtype=np.int8)
+        
+        edge_bank = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        edge_pos = np.concatenate(pos_chunks)
+        
+        # Mesmos pesos de _prepared_match_confidence, sem a descrição
+        date_codes = {}
+        bank_dates = self._date_codes(bank_data, date_codes)
+        internal_dates = self._date_codes(internal_data, date_codes)
+        date_exact = internal_dates[edge_pos] == bank_dates[edge_bank]
+        
+        value_exact = (
+            self._numeric_values(internal_data)[edge_pos] ==
+            self._numeric_values(bank_data)[edge_bank]
+        )
+        
+        edge_code = 2 * date_exact.astype(np.int8) + value_exact.astype(np.int8)
+        return edge_bank, edge_pos, edge_code
+    
+    def _date_codes(self, data: List[Dict], codes: Dict) -> np.ndarray:
+        """
+        Código inteiro de cada string de data (strings iguais, códigos
+        iguais). Datas não hasheáveis recebem -1.
+        """
+        result = np.empty(len(data), dtype=np.int64)
+        for pos, trans in enumerate(data):
+            try:
+                result[pos] = codes.setdefault(trans['date'], len(codes))
+            except TypeError:
+                result[pos] = -1
+        return result
+    
+    def _numeric_values(self, data: List[Dict]) -> np.ndarray:
+        """Valores como float64 (NaN para valores não numéricos)"""
+        return np.array([
+            trans['value'] if isinstance(trans['value'], (int, float)) else math.nan
+            for trans in data
+        ], dtype=np.float64)
+    
+    def _confidence_table(self, base: float) -> List[float]:
+        """Confiança para cada score de descrição (0-100) dado o peso base"""
+        return [round(base + (score / 100.0) * 0.3, 2) for score in range(101)]
+    
+    def _score_candidates(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        edge_bank: np.ndarray,
+        edge_pos: np.ndarray,
+        edge_code: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calcula a confiança de todos os pares candidatos em lote
+        
+        Cada descrição é normalizada uma vez. Pares que não alcançam o
+        threshold nem com descrição idêntica são descartados antes do
+        cálculo, e o backend recebe o score mínimo útil de cada grupo.
+        
+        Returns:
+            Arrays paralelos (posição bancária, posição interna, confiança)
+            apenas com pares acima do threshold, na mesma ordem da entrada
+        """
+        # Pontua o que foi coletado, mesmo que o orçamento acabe no meio
+        self._progress.start(STAGE_SCORING, len(bank_data), finishing=True)
+        
+        bank_norms = np.empty(len(bank_data), dtype=object)
+        for bank_pos in np.unique(edge_bank).tolist():
+            bank_norms[bank_pos] = self.scorer.normalize(bank_data[bank_pos]['description'])
+        
+        internal_norms = np.empty(len(internal_data), dtype=object)
+        for pos in np.unique(edge_pos).tolist():
+            internal_norms[pos] = self.scorer.normalize(internal_data[pos]['description'])
+        
+        confidences = np.zeros(len(edge_bank), dtype=np.float64)
+        keep = np.zeros(len(edge_bank), dtype=bool)
+        
+        for code, base in enumerate(_BASE_WEIGHTS):
+            table = self._confidence_table(base)
+            reachable = [
+                score for score in range(101)
+                if table[score] >= self.similarity_threshold
+            ]
+            if not reachable:
+                continue
+            
+            group = np.flatnonzero(edge_code == code)
+            if not len(group):
+                continue
+            
+            min_score = reachable[0]
+            scores = self.scorer.score_pairs(
+                bank_norms[edge_bank[group]],
+                internal_norms[edge_pos[group]],
+                min_score=min_score
+            )
+            
+            confidences[group] = np.array(table)[scores]
+            keep[group] = scores >= min_score
+        
+        return edge_bank[keep], edge_pos[keep], confidences[keep]
+    
+    def _assign_greedy(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        edge_bank: np.ndarray,
+        edge_pos: np.ndarray,
+        edge_confidence: np.ndarray
+    ) -> Tuple[List[Dict], List[Dict], set]:
+        """
+        Escolha gulosa: cada transação bancária, na ordem do arquivo, fica
+        com o candidato livre de maior confiança (o primeiro, em empate)
+        """
+        matched = []
+        bank_only = []
+        matched_internal_ids = set()
+        
+        bounds = np.searchsorted(edge_bank, np.arange(len(bank_data) + 1)).tolist()
+        positions = edge_pos.tolist()
+        confidences = edge_confidence.tolist()
+        
+        # Atribui os candidatos já pontuados, mesmo que o orçamento tenha acabado
+        self._progress.start(STAGE_ASSIGNMENT, len(bank_data), finishing=True)
+        
+        for bank_pos, bank_trans in enumerate(bank_data):
+            self._progress.advance(bank_pos, len(matched))
+            
+            best_match = None
+            best_confidence = 0.0
+            
+            for edge in range(bounds[bank_pos], bounds[bank_pos + 1]):
+                internal_trans = internal_data[positions[edge]]
+                
+                if internal_trans['id'] in matched_internal_ids:
+                    continue
+                
+                if confidences[edge] > best_confidence:
+                    best_match = internal_trans
+                    best_confidence = confidences[edge]
+            
+            if best_match:
+                matched.append({
+                    'bank_transaction': bank_trans,
+                    'internal_transaction': best_match,
+                    'confidence': best_confidence
+                })
+                matched_internal_ids.add(best_match['id'])
+            else:
+                bank_only.append(bank_trans)
+        
+        return matched, bank_only, matched_internal_ids
+    
+    def _assign_optimal(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        edge_bank: np.ndarray,
+        edge_pos: np.ndarray,
+        edge_confidence: np.ndarray
+    ) -> Tuple[List[Dict], List[Dict], set]:
+        """
+        Atribuição ótima: maximiza a soma das confianças (um para um)
+        
+        O grafo de candidatos é dividido em componentes conexos e cada um é
+        resolvido separadamente: componentes com uma só transação bancária
+        são resolvidos direto; os demais viram um problema esparso de custo
+        mínimo.
+        """
+        assigned = {}
+        # Atribui os candidatos já pontuados, mesmo que o orçamento tenha acabado
+        self._progress.start(STAGE_ASSIGNMENT, len(bank_data), finishing=True)
+        
+        if len(edge_bank):
+            bank_count = len(bank_data)
+            size = bank_count + len(internal_data)
+            graph = csr_matrix(
+                (np.ones(len(edge_bank)), (edge_bank, bank_count + edge_pos)),
+                shape=(size, size)
+            )
+            _, labels = connected_components(graph, directed=False)
+            
+            edge_labels = labels[edge_bank]
+            order = np.argsort(edge_labels, kind='stable')
+            splits = np.flatnonzero(np.diff(edge_labels[order])) + 1
+            
+            component_banks = np.bincount(labels[:bank_count]).tolist()
+            solved = 0
+            
+            for component in np.split(order, splits):
+                assigned.update(self._solve_component(
+                    edge_bank[component], edge_pos[component], edge_confidence[component]
+                ))
+                solved += component_banks[edge_labels[component[0]]]
+                self._progress.advance(solved, len(assigned))
+        
+        matched = []
+        bank_only = []
+        matched_internal_ids = set()
+        
+        for bank_pos, bank_trans in enumerate(bank_data):
+            pair = assigned.get(bank_pos)
+            # IDs internos repetidos só podem ser usados uma vez
+            if pair and internal_data[pair[0]]['id'] not in matched_internal_ids:
+                internal_trans = internal_data[pair[0]]
+                matched.append({
+                    'bank_transaction': bank_trans,
+                    'internal_transaction': internal_trans,
+                    'confidence': pair[1]
+                })
+                matched_internal_ids.add(internal_trans['id'])
+            else:
+                bank_only.append(bank_trans)
+        
+        return matched, bank_only, matched_internal_ids
+    
+    def _solve_component(
+        self,
+        edge_bank: np.ndarray,
+        edge_pos: np.ndarray,
+        edge_confidence: np.ndarray
+    ) -> Dict[int, Tuple[int, float]]:
+        """
+        Resolve a atribuição de um componente conexo
+        
+        Cada transação bancária ganha um nó fictício exclusivo (custo 2),
+        então sempre existe atribuição completa; um par real custa
+        2 - confiança. Minimizar o custo total equivale a maximizar a soma
+        das confianças.
+        
+        Returns:
+            Dict posição bancária -> (posição interna, confiança)
+        """
+        bank_nodes, rows = np.unique(edge_bank, return_inverse=True)
+        
+        if len(bank_nodes) == 1:
+            # Um banco, vários candidatos: maior confiança (primeiro em empate)
+            best = int(np.argmax(edge_confidence))
+            return {int(bank_nodes[0]): (int(edge_pos[best]), float(edge_confidence[best]))}
+        
+        internal_nodes, cols = np.unique(edge_pos, return_inverse=True)
+        bank_count = len(bank_nodes)
+        dummy_offset = len(internal_nodes)
+        
+        biadjacency = csr_matrix(
+            (
+                np.concatenate([2.0 - edge_confidence, np.full(bank_count, 2.0)]),
+                (
+                    np.concatenate([rows, np.arange(bank_count)]),
+                    np.concatenate([cols, dummy_offset + np.arange(bank_count)])
+                )
+            ),
+            shape=(bank_count, dummy_offset + bank_count)
+        )
+        _, assigned_cols = min_weight_full_bipartite_matching(biadjacency)
+        
+        confidences = {
+            (row, col): confidence
+            for row, col, confidence in zip(rows.tolist(), cols.tolist(), edge_confidence.tolist())
+        }
+        result = {}
+        for row, col in enumerate(assigned_cols.tolist()):
+            if col < dummy_offset:
+                result[int(bank_nodes[row])] = (int(internal_nodes[col]), confidences[(row, col)])
+        
+        return result
+    
+    def _amount_cents(self, value) -> Optional[int]:
+        """Valor em centavos inteiros, ou None se não for um número finito"""
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+        return int(round(value * 100))
+    
+    def _match_exact(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Primeira passada: hash join por (dia, valor em centavos)
+        
+        Quando uma chave tem exatamente uma transação de cada lado, o par é
+        conciliado direto, desde que atinja o threshold. Chaves repetidas
+        ficam para a busca com tolerância.
+        
+        Returns:
+            Lista de (posição bancária, posição interna, confiança)
+        """
+        def build_keys(data, ordinals):
+            keys = defaultdict(list)
+            for pos, (trans, ordinal) in enumerate(zip(data, ordinals)):
+                cents = self._amount_cents(trans['value'])
+                if ordinal is None or not cents:
+                    continue
+                keys[(ordinal, cents)].append(pos)
+            return keys
+        
+        bank_keys = build_keys(bank_data, bank_ordinals)
+        internal_keys = build_keys(internal_data, internal_ordinals)
+        
+        pairs = []
+        for key, bank_positions in bank_keys.items():
+            internal_positions = internal_keys.get(key)
+            if len(bank_positions) != 1 or not internal_positions or len(internal_positions) != 1:
+                continue
+            
+            bank_pos = bank_positions[0]
+            internal_pos = internal_positions[0]
+            bank_trans = bank_data[bank_pos]
+            internal_trans = internal_data[internal_pos]
+            
+            if not self._values_match(bank_trans['value'], internal_trans['value']):
+                continue
+            
+            confidence = self._prepared_match_confidence(
+                bank_trans, internal_trans,
+                bank_ordinals[bank_pos], internal_ordinals[internal_pos]
+            )
+            if confidence >= self.similarity_threshold:
+                pairs.append((bank_pos, internal_pos, confidence))
+        
+        pairs.sort()
+        return pairs
+    
+    def _subset_sum(
+        self,
+        candidates: List[Tuple[int, int]],
+        target: int
+    ) -> Optional[Tuple[int, ...]]:
+        """
+        Busca limitada do único grupo (2 a aggregate_max_group candidatos)
+        cuja soma é exatamente o alvo, em centavos
+        
+        Os candidatos vêm em ordem crescente de valor, então a busca para
+        assim que a soma passa do alvo; o último membro de cada grupo é
+        encontrado por busca binária, sem percorrer a lista. Se mais de um
+        grupo fecha a soma não há como saber qual é o certo, e nenhum é
+        usado; o mesmo vale quando o total de nós visitados passa de
+        _AGGREGATE_MAX_NODES antes de a busca terminar.
+        
+        Args:
+            candidates: (centavos absolutos, posição) em ordem crescente
+            target: Valor bancário absoluto em centavos
+        
+        Returns:
+            Posições do grupo, ou None (nenhum, mais de um ou busca cortada)
+        """
+        values = [cents for cents, _ in candidates]
+        count = len(values)
+        largest = values[-1] if values else 0
+        nodes = 0
+        found = []
+        
+        def search(start, total, chosen, slots):
+            # slots: membros que ainda faltam (>= 2); o último sai da busca binária.
+            # Retorna True para interromper (ambíguo ou limite de nós).
+            nonlocal nodes
+            remaining = target - total
+            
+            for i in range(start, count):
+                nodes += 1
+                if nodes > _AGGREGATE_MAX_NODES:
+                    return True
+                
+                cents = values[i]
+                if cents * slots > remaining:
+                    break  # Os próximos membros seriam ainda maiores
+                if cents + largest * (slots - 1) < remaining:
+                    continue  # Nem com os maiores valores chega ao alvo
+                
+                if slots == 2:
+                    rest = remaining - cents
+                    last = bisect_left(values, rest, i + 1)
+                    while last < count and values[last] == rest:
+                        found.append(chosen + [i, last])
+                        if len(found) > 1:
+                            return True
+                        last += 1
+                    continue
+                
+                if search(i + 1, total + cents, chosen + [i], slots - 1):
+                    return True
+            return False
+        
+        for size in range(2, self.aggregate_max_group + 1):
+            if search(0, 0, [], size):
+                return None
+        
+        if len(found) != 1:
+            return None
+        return tuple(sorted(candidates[i][1] for i in found[0]))
+    
+    def _aggregate_confidence(self, bank_trans: Dict, members: List[Dict]) -> float:
+        """
+        Confiança de um match agregado: data igual em todas as internas
+        (0.3, ou 0.15 dentro da janela), soma exata (0.4) e a similaridade
+        média de descrição entre o banco e as internas (0.3)
+        
+        A descrição só pesa na nota, não barra o grupo: um lote no banco
+        ("PIX LOTE 0412") raramente se parece com as internas que soma. Quem
+        recusa grupos ao acaso são as condições da busca (soma exata em
+        centavos, grupo único, janela de datas); assim um grupo do mesmo dia
+        sempre atinge o threshold padrão, e um com datas diferentes precisa
+        de descrições parecidas.
+        """
+        desc_sim = sum(
+            self._calculate_description_similarity(bank_trans['description'], member['description'])
+            for member in members
+        ) / len(members)
+        
+        confidence = 0.0
+        
+        if all(member['date'] == bank_trans['date'] for member in members):
+            confidence += 0.3
+        else:
+            confidence += 0.15
+        
+        confidence += 0.4
+        confidence += desc_sim * 0.3
+        
+        return round(confidence, 2)
+    
+    def _match_aggregate(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        bank_ordinals: List[Optional[int]],
+        internal_ordinals: List[Optional[int]]
+    ) -> List[Tuple[int, Tuple[int, ...], float]]:
+        """
+        Passada agregada: um banco igual à soma de várias internas
+        
+        Roda sobre o que sobrou das passadas um para um. Cada banco, na
+        ordem do arquivo, procura entre as internas livres de mesmo sinal
+        dentro da janela de datas o único grupo cuja soma seja exatamente o
+        valor em centavos (_subset_sum), e o grupo precisa atingir o
+        threshold (_aggregate_confidence, em que a descrição só pesa).
+        A tolerância de valor não se aplica aqui: somando várias transações
+        ela aceitaria grupos ao acaso.
+        
+        Returns:
+            Lista de (posição bancária, posições internas, confiança)
+        """
+        if self.aggregate_max_group < 2:
+            return []
+        
+        # (dia, sinal) -> [(centavos absolutos, posição)] em ordem crescente
+        by_day = defaultdict(list)
+        for pos, (trans, ordinal) in enumerate(zip(internal_data, internal_ordinals)):
+            amount = self._amount_cents(trans['value'])
+            if ordinal is not None and amount:
+                by_day[(ordinal, amount > 0)].append((abs(amount), pos))
+        for day_list in by_day.values():
+            day_list.sort()
+        
+        groups = []
+        
+        if self._progress.start(STAGE_AGGREGATE, len(bank_data)):
+            return groups
+        
+        for bank_pos, (bank_trans, bank_ordinal) in enumerate(zip(bank_data, bank_ordinals)):
+            if self._progress.advance(bank_pos, len(groups)):
+                break
+            
+            target = self._amount_cents(bank_trans['value'])
+            if bank_ordinal is None or not target:
+                continue
+            
+            # Internas de mesmo sinal na janela, menores que o alvo
+            target_abs = abs(target)
+            day_lists = [
+                by_day.get((day, target > 0), ())
+                for day in range(bank_ordinal - self.date_tolerance, bank_ordinal + self.date_tolerance + 1)
+            ]
+            candidates = sorted(
+                entry
+                for day_list in day_lists
+                for entry in day_list[:bisect_left(day_list, (target_abs, -1))]
+            )
+            if len(candidates) < 2:
+                continue
+            
+            positions = self._subset_sum(candidates, target_abs)
+            if positions is None:
+                continue
+            
+            members = [internal_data[pos] for pos in positions]
+            confidence = self._aggregate_confidence(bank_trans, members)
+            if confidence >= self.similarity_threshold:
+                groups.append((bank_pos, positions, confidence))
+                
+                # Internas usadas saem da busca dos próximos bancos
+                for pos in positions:
+                    amount = self._amount_cents(internal_data[pos]['value'])
+                    by_day[(internal_ordinals[pos], amount > 0)].remove((abs(amount), pos))
+        
+        return groups
+    
+    def _aggregate_transaction(self, members: List[Dict]) -> Dict[str, Any]:
+        """Transação interna que representa um grupo agregado"""
+        dates = [member['date'] for member in members if isinstance(member['date'], str)]
+        return {
+            'date': max(dates) if dates else None,
+            'value': round(sum(member['value'] for member in members), 2),
+            'description': ' + '.join(str(member['description']) for member in members),
+            'members': members
+        }
+    
+    def reconcile(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        time_budget: Optional[float] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Executa conciliação
+        
+        Args:
+            progress_callback: Recebe o progresso (etapa, linhas processadas,
+                matches até agora) no máximo uma vez a cada
+                settings.RECONCILIATION_PROGRESS_INTERVAL segundos, além de
+                cada troca de etapa
+            cancel_token: Quando cancelado, interrompe com OperationCancelled
+            time_budget: Segundos disponíveis; ao esgotar, as passadas param
+                e o resultado parcial sai com summary['complete'] = False
+        
+        Returns:
+            Dict com:
+            - matched: lista de matches encontrados
+            - bank_only: transações apenas no banco
+            - internal_only: transações apenas no sistema interno
+            - summary: resumo estatístico
+        
+        Raises:
+            OperationCancelled: Se o cancel_token for cancelado
+        """
+        self._progress = ProgressReporter(
+            progress_callback,
+            settings.RECONCILIATION_PROGRESS_INTERVAL,
+            cancel_token=cancel_token,
+            time_budget=time_budget
+        )
+        try:
+            return self._reconcile(bank_data, internal_data)
+        finally:
+            self._progress = ProgressReporter()
+    
+    def _reconcile(self, bank_data: List[Dict], internal_data: List[Dict]) -> Dict[str, Any]:
+        bank_ordinals = self._prepare_ordinals(bank_data)
+        internal_ordinals = self._prepare_ordinals(internal_data)
+        
+        # Passada exata: pares únicos por (dia, centavos)
+        exact_pairs = []
+        if self.exact_first and not self._progress.start(STAGE_EXACT, len(bank_data), 0):
+            exact_pairs = self._match_exact(
+                bank_data, internal_data, bank_ordinals, internal_ordinals
+            )
+        
+        exact_matched = [
+            {
+                'bank_transaction': bank_data[bank_pos],
+                'internal_transaction': internal_data[internal_pos],
+                'confidence': confidence
+            }
+            for bank_pos, internal_pos, confidence in exact_pairs
+        ]
+        exact_bank_positions = {bank_pos for bank_pos, _, _ in exact_pairs}
+        exact_internal_ids = {internal_data[pos]['id'] for _, pos, _ in exact_pairs}
+        self._progress.matched = len(exact_matched)
+        
+        # Restante vai para a busca com tolerância
+        bank_rest = [
+            pos for pos in range(len(bank_data))
+            if pos not in exact_bank_positions
+        ]
+        internal_rest = [
+            pos for pos, trans in enumerate(internal_data)
+            if trans['id'] not in exact_internal_ids
+        ]
+        
+        match_fn = self._match_loop if self.strategy == STRATEGY_LOOP else self._match_indexed
+        fuzzy_matched, bank_only, matched_internal_ids = match_fn(
+            [bank_data[pos] for pos in bank_rest],
+            [internal_data[pos] for pos in internal_rest],
+            [bank_ordinals[pos] for pos in bank_rest],
+            [internal_ordinals[pos] for pos in internal_rest]
+        )
+        matched_internal_ids |= exact_internal_ids
+        
         # Transações internas não conciliadas
         internal_only = [
             trans for trans in internal_data
             if trans['id'] not in matched_internal_ids
         ]
         
+        bank_order = {id(trans): pos for pos, trans in enumerate(bank_data)}
+        
+        # Passada agregada: um banco = soma de várias internas
+        aggregate_matched = []
+        if self.aggregate_max_group >= 2 and bank_only and internal_only:
+            self._progress.matched = len(exact_matched) + len(fuzzy_matched)
+            internal_order = {id(trans): pos for pos, trans in enumerate(internal_data)}
+            groups = self._match_aggregate(
+                bank_only,
+                internal_only,
+                [bank_ordinals[bank_order[id(trans)]] for trans in bank_only],
+                [internal_ordinals[internal_order[id(trans)]] for trans in internal_only]
+            )
+            
+            for bank_pos, positions, confidence in groups:
+                members = [internal_only[pos] for pos in positions]
+                aggregate_matched.append({
+                    'bank_transaction': bank_only[bank_pos],
+                    'internal_transaction': self._aggregate_transaction(members),
+                    'confidence': confidence
+                })
+            
+            grouped_bank = {bank_pos for bank_pos, _, _ in groups}
+            grouped_internal = {pos for _, positions, _ in groups for pos in positions}
+            bank_only = [trans for pos, trans in enumerate(bank_only) if pos not in grouped_bank]
+            internal_only = [trans for pos, trans in enumerate(internal_only) if pos not in grouped_internal]
+        
+        # Matches na ordem do arquivo bancário
+        matched = sorted(
+            exact_matched + fuzzy_matched + aggregate_matched,
+            key=lambda match: bank_order[id(match['bank_transaction'])]
+        )
+        
         # Calcular estatísticas
         total_bank = len(bank_data)
         total_internal = len(internal_data)
         matched_count = len(matched)
         
-        match_rate = 0.0
-        if total_bank > 0 or total_internal > 0:
-            match_rate = (matched_count * 2) / (total_bank + total_internal) * 100
+        # Transações conciliadas (um match agregado consome várias internas)
+        matched_rows = (total_bank - len(bank_only)) + (total_internal - len(internal_only))
+        
+        self._progress.finish(total_bank, matched_count)
         
         return {
             'matched': matched,
@@ -188,6 +1363,218 @@ class ReconciliationProcessor:
                 'matched_count': matched_count,
                 'bank_only_count': len(bank_only),
                 'internal_only_count': len(internal_only),
-                'match_rate': round(match_rate, 2)
+                'match_rate': match_rate(matched_rows, total_bank + total_internal),
+                'matches_by_pass': {
+                    'exact': len(exact_matched),
+                    'fuzzy': len(fuzzy_matched),
+                    'aggregate': len(aggregate_matched)
+                },
+                # False se o orçamento de tempo acabou antes do fim das passadas
+                'complete': not self._progress.expired
+            }
+        }
+    
+    
+    def reconcile_incremental(
+        self,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        pending_bank: List[Dict],
+        pending_internal: List[Dict]
+    ) -> Dict[str, Any]:
+        """
+        Concilia transações novas contra novas e contra pendentes já salvas
+        
+        Pendentes não são comparadas entre si (já foram numa execução
+        anterior), então o custo depende só das transações novas e das
+        pendentes na janela de datas delas. Primeiro os bancos novos
+        escolhem entre internas novas e pendentes; depois os bancos
+        pendentes escolhem entre as internas novas que sobraram.
+        
+        Args:
+            bank_data: Transações bancárias novas
+            internal_data: Transações internas novas
+            pending_bank: Bancárias pendentes (ids distintos das novas)
+            pending_internal: Internas pendentes (ids distintos das novas)
+        
+        Returns:
+            Dict com matched, bank_only e internal_only (apenas transações
+            novas que seguem pendentes) e summary com as contagens do
+            incremento, incluindo quantas pendentes foram conciliadas
+        """
+        new_bank = self.reconcile(bank_data, internal_data + pending_internal)
+        
+        left_ids = {trans['id'] for trans in new_bank['internal_only']}
+        internal_rest = [trans for trans in internal_data if trans['id'] in left_ids]
+        old_bank = self.reconcile(pending_bank, internal_rest)
+        
+        matched = new_bank['matched'] + old_bank['matched']
+        pending_internal_ids = {id(trans) for trans in pending_internal}
+        matched_pending_internal = sum(
+            1 for match in new_bank['matched']
+            for member in internal_members(match)
+            if id(member) in pending_internal_ids
+        )
+        
+        return {
+            'matched': matched,
+            'bank_only': new_bank['bank_only'],
+            'internal_only': old_bank['internal_only'],
+            'summary': {
+                'new_bank_transactions': len(bank_data),
+                'new_internal_transactions': len(internal_data),
+                'matched_count': len(matched),
+                'matched_pending_bank': len(old_bank['matched']),
+                'matched_pending_internal': matched_pending_internal,
+                'bank_only_count': len(new_bank['bank_only']),
+                'internal_only_count': len(old_bank['internal_only'])
+            }
+        }
+    
+    def _ordered_stream(
+        self,
+        transactions: Iterable[Dict],
+        side: str
+    ) -> Iterator[Tuple[Optional[int], Dict]]:
+        """
+        Percorre um lado do fluxo devolvendo (ordinal, transação)
+        
+        Datas inválidas saem com ordinal None (nunca conciliam). As demais
+        precisam vir em ordem crescente de data.
+        
+        Raises:
+            ValueError: Se uma data válida vier antes da anterior
+        """
+        last_ordinal = None
+        for trans in transactions:
+            ordinal = self._date_ordinal(trans['date'])
+            if ordinal is not None:
+                if last_ordinal is not None and ordinal < last_ordinal:
+                    raise ValueError(
+                        f"Transações {side} fora de ordem de data: "
+                        f"{trans['date']} após {date.fromordinal(last_ordinal)}"
+                    )
+                last_ordinal = ordinal
+            yield ordinal, trans
+    
+    def reconcile_stream(
+        self,
+        bank_stream: Iterable[Dict],
+        internal_stream: Iterable[Dict]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Conciliação em fluxo (merge join) para entradas ordenadas por data
+        
+        Só ficam em memória as transações bancárias do dia corrente e as
+        internas a até date_tolerance dias dele, então o pico de memória
+        depende da janela e não do tamanho dos arquivos. Cada dia bancário é
+        conciliado com a busca indexada contra as internas livres da janela;
+        com atribuição 'greedy' o resultado é o mesmo de reconcile com
+        exact_first=False e aggregate_max_group=0. As passadas exata e
+        agregada não se aplicam (dependem do arquivo inteiro).
+        
+        Args:
+            bank_stream: Transações bancárias em ordem crescente de data
+            internal_stream: Transações internas em ordem crescente de data
+        
+        Yields:
+            Eventos na ordem em que são decididos:
+            - {'type': 'matched', 'bank_transaction', 'internal_transaction', 'confidence'}
+            - {'type': 'bank_only', 'transaction'}
+            - {'type': 'internal_only', 'transaction'}
+            - {'type': 'summary', 'summary'} ao final, com as mesmas
+              contagens de reconcile
+        
+        Raises:
+            ValueError: Se algum dos lados não estiver em ordem de data
+        """
+        counts = {'bank': 0, 'internal': 0, 'matched': 0, 'bank_only': 0, 'internal_only': 0}
+        
+        def matched_event(match):
+            counts['matched'] += 1
+            return {'type': 'matched', **match}
+        
+        def bank_only_event(trans):
+            counts['bank_only'] += 1
+            return {'type': 'bank_only', 'transaction': trans}
+        
+        def internal_only_event(trans):
+            counts['internal_only'] += 1
+            return {'type': 'internal_only', 'transaction': trans}
+        
+        def counted(stream, side):
+            for item in stream:
+                counts[side] += 1
+                yield item
+        
+        internal_rows = self._ordered_stream(counted(internal_stream, 'internal'), 'internas')
+        lookahead = next(internal_rows, None)
+        window = deque()  # (ordinal, transação) internas livres, em ordem de chegada
+        
+        bank_rows = self._ordered_stream(counted(bank_stream, 'bank'), 'bancárias')
+        for bank_ordinal, day_rows in groupby(bank_rows, key=lambda row: row[0]):
+            day_bank = [trans for _, trans in day_rows]
+            
+            if bank_ordinal is None:
+                for trans in day_bank:
+                    yield bank_only_event(trans)
+                continue
+            
+            # Traz as internas que alcançam este dia
+            while lookahead is not None and (
+                lookahead[0] is None or lookahead[0] <= bank_ordinal + self.date_tolerance
+            ):
+                if lookahead[0] is None:
+                    yield internal_only_event(lookahead[1])
+                else:
+                    window.append(lookahead)
+                lookahead = next(internal_rows, None)
+            
+            # Internas antigas não alcançam mais nenhum banco
+            while window and window[0][0] < bank_ordinal - self.date_tolerance:
+                yield internal_only_event(window.popleft()[1])
+            
+            matched, bank_only, matched_internal_ids = self._match_indexed(
+                day_bank,
+                [trans for _, trans in window],
+                [bank_ordinal] * len(day_bank),
+                [ordinal for ordinal, _ in window]
+            )
+            
+            for match in matched:
+                yield matched_event(match)
+            for trans in bank_only:
+                yield bank_only_event(trans)
+            
+            if matched_internal_ids:
+                window = deque(
+                    row for row in window
+                    if row[1]['id'] not in matched_internal_ids
+                )
+        
+        for _, trans in window:
+            yield internal_only_event(trans)
+        while lookahead is not None:
+            yield internal_only_event(lookahead[1])
+            lookahead = next(internal_rows, None)
+        
+        total = counts['bank'] + counts['internal']
+        matched_rows = total - counts['bank_only'] - counts['internal_only']
+        
+        yield {
+            'type': 'summary',
+            'summary': {
+                'total_bank_transactions': counts['bank'],
+                'total_internal_transactions': counts['internal'],
+                'matched_count': counts['matched'],
+                'bank_only_count': counts['bank_only'],
+                'internal_only_count': counts['internal_only'],
+                'match_rate': match_rate(matched_rows, total),
+                'matches_by_pass': {
+                    'exact': 0,
+                    'fuzzy': counts['matched'],
+                    'aggregate': 0
+                },
+                'complete': True
             }
         }
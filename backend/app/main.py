@@ -3,12 +3,25 @@ Aplicação principal FastAPI
 Sistema de Conciliação Bancária - LM Conciliation
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from app.core.body_limit import BodySizeLimitMiddleware
 from app.core.config import settings as app_settings
 from app.api.routes import upload, process, reconcile, auth, history, settings, manual_match, password_reset
+from app.services.upload_retention import retention_worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia e para a limpeza periódica de uploads"""
+    retention_worker.start()
+    yield
+    retention_worker.stop(timeout=5)
+
 
 # Criar aplicação
 app = FastAPI(
@@ -16,7 +29,8 @@ app = FastAPI(
     description="Sistema de Conciliação Bancária Automatizado",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS
@@ -29,6 +43,13 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Uploads grandes demais são recusados antes de o corpo ser lido
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    paths=["/api/upload"],
+    max_body_size=upload.max_request_size
+)
+
 # Incluir rotas
 app.include_router(auth.router, prefix="/api/auth", tags=["Autenticação"])
 app.include_router(password_reset.router, prefix="/api/auth", tags=["Autenticação"])
@@ -3,13 +3,18 @@ Models package
 """
 
 from app.models.user import User
-from app.models.reconciliation import Reconciliation, ReconciliationMatch, ManualMatch
+from app.models.reconciliation import (
+    Reconciliation, ReconciliationMatch, ManualMatch, ReconciliationTransaction
+)
 from app.models.user_settings import UserSettings
+from app.models.upload import Upload
 
 __all__ = [
     "User",
     "Reconciliation",
     "ReconciliationMatch", 
     "ManualMatch",
-    "UserSettings"
+    "ReconciliationTransaction",
+    "UserSettings",
+    "Upload"
 ]
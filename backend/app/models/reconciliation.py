@@ -1,8 +1,8 @@
 """
 Models de reconciliação
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON, Index
+from sqlalchemy.sql import func, true
 from app.core.database import Base
 
 class Reconciliation(Base):
@@ -19,6 +19,8 @@ class Reconciliation(Base):
     bank_only_count = Column(Integer)
     internal_only_count = Column(Integer)
     match_rate = Column(Float)
+    # False quando o orçamento de tempo acabou e o resultado salvo é parcial
+    is_complete = Column(Boolean, nullable=False, default=True, server_default=true())
 
 
 class ReconciliationMatch(Base):
@@ -40,3 +42,31 @@ class ManualMatch(Base):
     bank_transaction_id = Column(Integer)
     internal_transaction_id = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReconciliationTransaction(Base):
+    """Transação normalizada de uma conciliação (banco ou interna)"""
+    __tablename__ = "reconciliation_transactions"
+    __table_args__ = (
+        # Pendentes de um lado dentro de uma faixa de datas
+        Index(
+            "ix_reconciliation_transactions_pending",
+            "reconciliation_id", "side", "match_id", "date"
+        ),
+        # Pendentes de um lado ordenadas por valor (paginação por cursor)
+        Index(
+            "ix_reconciliation_transactions_pending_value",
+            "reconciliation_id", "side", "match_id", "value", "transaction_id"
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    reconciliation_id = Column(Integer, ForeignKey("reconciliations.id", ondelete="CASCADE"), nullable=False, index=True)
+    side = Column(String(10), nullable=False)  # 'bank' ou 'internal'
+    transaction_id = Column(Integer, nullable=False)  # 'id' da transação no motor
+    date = Column(String)  # YYYY-MM-DD, ou o texto original se não foi normalizada
+    value = Column(Float)
+    description = Column(String)
+    original = Column(JSON)
+    match_id = Column(Integer, ForeignKey("reconciliation_matches.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
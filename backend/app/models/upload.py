@@ -0,0 +1,25 @@
+"""
+Model de uploads
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class Upload(Base):
+    """Arquivo enviado por um usuário, com os metadados calculados no upload"""
+    __tablename__ = "uploads"
+    __table_args__ = (
+        # Listagem paginada dos uploads de um usuário, mais recentes primeiro
+        Index("ix_uploads_user_created", "user_id", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    filename = Column(String, unique=True, nullable=False)  # Nome no diretório de uploads
+    kind = Column(String(10), nullable=False)  # 'bank' ou 'internal'
+    original_name = Column(String)  # Nome do arquivo enviado
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA-256
+    size_bytes = Column(BigInteger, nullable=False)
+    row_count = Column(Integer)  # Linhas de dados do CSV (None para PDF)
+    columns = Column(JSON)  # Colunas detectadas (None se não foi possível ler)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,201 @@
+"""
+Fila de jobs em segundo plano
+
+Executa tarefas pesadas (ex.: conciliação) fora do event loop, num pool de
+threads com limite de jobs simultâneos. Os jobs ficam em memória no processo
+e são descartados depois de JOB_RETENTION_SECONDS do término. Por isso a API
+roda com um worker só (ver render.yaml): em outro processo o job não existe.
+
+O cancelamento é cooperativo: um job na fila nem começa, e um job em execução
+para quando a tarefa consultar o CancellationToken recebido.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from app.core.progress import CancellationToken, OperationCancelled
+
+
+# Estados de um job
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+# Tempo que um job terminado continua consultável
+JOB_RETENTION_SECONDS = 3600
+
+
+class Job:
+    """Um job da fila e seu estado"""
+    
+    def __init__(self, user_id: int, kind: str, inputs: Iterable[str] = ()):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.kind = kind
+        self.inputs = tuple(inputs)  # Arquivos de upload que o job vai ler
+        self.status = JOB_QUEUED
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.progress: Optional[Dict[str, Any]] = None
+        self.progress_version = 0
+        self.cancel_token = CancellationToken()
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.done = threading.Event()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado do job no formato da API"""
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error
+        }
+    
+    def report_progress(self, progress: Dict[str, Any]) -> None:
+        """Callback de progresso passado à tarefa (ver JobQueue.submit)"""
+        self.progress = progress
+        self.progress_version += 1
+
+
+class JobQueue:
+    """
+    Fila de jobs com no máximo `max_workers` em execução
+    
+    Jobs além do limite esperam na fila do executor com estado 'queued'.
+    """
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='job'
+        )
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+    
+    def submit(
+        self,
+        user_id: int,
+        kind: str,
+        fn: Callable,
+        *args,
+        with_progress: bool = False,
+        cancellable: bool = False,
+        inputs: Iterable[str] = (),
+        **kwargs
+    ) -> Job:
+        """
+        Enfileira `fn(*args, **kwargs)` e retorna o job imediatamente
+        
+        O retorno de `fn` vira o resultado do job; uma exceção marca o job
+        como 'failed' com a mensagem (o `detail` se for HTTPException), e
+        OperationCancelled marca o job como 'cancelled'.
+        Com `with_progress`, `fn` recebe também `progress_callback`, que
+        atualiza o progresso do job; com `cancellable`, recebe `cancel_token`.
+        `inputs` são os uploads que o job lê (ver active_inputs).
+        """
+        job = Job(user_id, kind, inputs)
+        if with_progress:
+            kwargs['progress_callback'] = job.report_progress
+        if cancellable:
+            kwargs['cancel_token'] = job.cancel_token
+        
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+    
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[Job]:
+        """Busca um job (opcionalmente só se pertencer ao usuário)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+    
+    def cancel(self, job_id: str, user_id: Optional[int] = None) -> Optional[Job]:
+        """
+        Pede o cancelamento de um job (opcionalmente só se for do usuário)
+        
+        Um job na fila é cancelado na hora e libera a vaga sem executar; um
+        job em execução fica 'running' até a tarefa notar o token. Jobs já
+        terminados não mudam.
+        """
+        job = self.get(job_id, user_id=user_id)
+        if job is None:
+            return None
+        
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                return job
+            
+            job.cancel_token.cancel()
+            if job.status == JOB_QUEUED:
+                self._finish(job, JOB_CANCELLED)
+        
+        return job
+    
+    def active_inputs(self) -> Set[str]:
+        """Uploads lidos por jobs na fila ou em execução (a limpeza não os remove)"""
+        with self._lock:
+            return {
+                name for job in self._jobs.values()
+                if job.status not in FINISHED_STATES
+                for name in job.inputs
+            }
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Espera o job terminar (ou o timeout) e retorna o job"""
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+    
+    def _run(self, job: Job, fn: Callable, args, kwargs) -> None:
+        with self._lock:
+            # Cancelado enquanto estava na fila
+            if job.status != JOB_QUEUED:
+                return
+            job.status = JOB_RUNNING
+            job.started_at = datetime.now(timezone.utc)
+        
+        try:
+            result = fn(*args, **kwargs)
+        except OperationCancelled:
+            self._finish(job, JOB_CANCELLED)
+        except Exception as e:
+            job.error = str(getattr(e, 'detail', e))
+            self._finish(job, JOB_FAILED)
+        else:
+            job.result = result
+            self._finish(job, JOB_COMPLETED)
+    
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        job.done.set()
+    
+    def _prune(self) -> None:
+        """Remove jobs terminados há mais de JOB_RETENTION_SECONDS (com o lock)"""
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in FINISHED_STATES and job.finished_at.timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
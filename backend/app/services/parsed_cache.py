@@ -0,0 +1,450 @@
+"""
+Cache de arquivos já lidos e normalizados
+
+Preview, processamento, conciliação, pendências e histórico leem os mesmos
+uploads várias vezes. O cache guarda em disco, uma vez por conteúdo:
+
+- a tabela lida do upload (`load_frame`), chave = hash do conteúdo. CSVs
+  passam pelo CSVProcessor; extratos em PDF, pelo PDFProcessor, então a
+  extração do PDF roda uma vez só
+- as transações normalizadas (`load_transactions`), chave = hash do
+  conteúdo + mapeamento de colunas
+
+Cada entrada é um .npz colunar, gravado de forma atômica: números ficam em
+float64 / int64 contíguos e texto fica em UTF-8 concatenado com os limites
+de cada valor, mais o tipo de cada valor (nulos inclusive). Nenhum objeto
+Python é serializado, então as entradas são lidas com allow_pickle=False e
+um arquivo plantado no diretório não executa código. Quando o diretório
+passa de `max_bytes`, as entradas menos usadas (mtime mais antigo; um
+acerto atualiza o mtime) são removidas.
+
+Como a chave é o conteúdo, um arquivo alterado gera outra chave. Ao remover
+um upload, `invalidate` apaga as entradas do conteúdo dele.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.csv_processor import CSVProcessor
+from app.core.pdf_processor import PDF_EXTENSION, PDFProcessor
+from app.core.progress import CancellationToken
+
+
+# Sufixo das entradas e nome da entrada da tabela lida
+ENTRY_SUFFIX = '.npz'
+FRAME_KEY = 'frame'
+
+# Colunas normalizadas de cada transação
+TRANSACTION_FIELDS = ('id', 'date', 'value', 'description')
+
+# Hashes lembrados por (caminho, tamanho, mtime)
+_HASH_MEMO_SIZE = 4096
+
+
+def is_pdf(file_path: str) -> bool:
+    """Indica se o upload é um extrato em PDF (pela extensão)"""
+    return os.path.splitext(file_path)[1].lower() == PDF_EXTENSION
+
+
+# Tipo de cada valor nas colunas que não são só de números
+_KIND_NONE, _KIND_STR, _KIND_FLOAT, _KIND_INT, _KIND_BOOL = range(5)
+
+
+def _encode_column(name: str, values) -> Dict[str, np.ndarray]:
+    """
+    Arrays de uma coluna, sem objetos Python, que voltam iguais com
+    _decode_column
+    
+    Arrays numéricos ficam como estão e listas só de float, int ou bool viram
+    float64 / int64 / bool. O resto (texto, None, tipos misturados, arrays de
+    objetos) vira o
+    tipo de cada valor (`<name>.kind`), o texto em UTF-8 concatenado
+    (`<name>.utf8`) com os limites de cada valor (`<name>.offsets`) e os
+    números em `<name>.num` / `<name>.int`.
+    
+    Raises:
+        TypeError: valor de um tipo que o cache não guarda
+    """
+    if isinstance(values, np.ndarray):
+        if values.dtype != object:
+            return {name: values}
+        # Array de objetos volta como array de objetos
+        values = values.tolist()
+    else:
+        kinds = {type(value) for value in values}
+        
+        if kinds == {float}:
+            return {name: np.array(values, dtype=np.float64)}
+        if kinds == {bool}:
+            return {name: np.array(values, dtype=np.bool_)}
+        if kinds == {int}:
+            try:
+                return {name: np.array(values, dtype=np.int64)}
+            except OverflowError:
+                pass
+    
+    count = len(values)
+    codes = np.empty(count, dtype=np.uint8)
+    numbers = np.zeros(count, dtype=np.float64)
+    integers = np.zeros(count, dtype=np.int64)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    chunks = []
+    size = 0
+    
+    for position, value in enumerate(values):
+        if value is None:
+            codes[position] = _KIND_NONE
+        elif isinstance(value, str):
+            codes[position] = _KIND_STR
+            data = value.encode('utf-8', 'surrogatepass')
+            chunks.append(data)
+            size += len(data)
+        elif isinstance(value, (bool, np.bool_)):
+            codes[position] = _KIND_BOOL
+            integers[position] = value
+        elif isinstance(value, (int, np.integer)):
+            codes[position] = _KIND_INT
+            try:
+                integers[position] = value
+            except OverflowError:
+                raise TypeError(f"Inteiro fora de int64 na coluna {name}")
+        elif isinstance(value, (float, np.floating)):
+            codes[position] = _KIND_FLOAT
+            numbers[position] = value
+        else:
+            raise TypeError(f"Tipo não suportado no cache: {type(value).__name__}")
+        offsets[position + 1] = size
+    
+    arrays = {
+        f"{name}.kind": codes,
+        f"{name}.utf8": np.frombuffer(b''.join(chunks), dtype=np.uint8),
+        f"{name}.offsets": offsets
+    }
+    if (codes == _KIND_FLOAT).any():
+        arrays[f"{name}.num"] = numbers
+    if ((codes == _KIND_INT) | (codes == _KIND_BOOL)).any():
+        arrays[f"{name}.int"] = integers
+    return arrays
+
+
+def _decode_column(arrays: Dict[str, np.ndarray], name: str) -> np.ndarray:
+    """Coluna gravada por _encode_column (texto e tipos mistos em array de objetos)"""
+    if name in arrays:
+        return arrays[name]
+    
+    codes = arrays[f"{name}.kind"].tolist()
+    data = arrays[f"{name}.utf8"].tobytes()
+    offsets = arrays[f"{name}.offsets"].tolist()
+    numbers = arrays[f"{name}.num"].tolist() if f"{name}.num" in arrays else None
+    integers = arrays[f"{name}.int"].tolist() if f"{name}.int" in arrays else None
+    
+    values = np.empty(len(codes), dtype=object)
+    for position, code in enumerate(codes):
+        if code == _KIND_STR:
+            values[position] = data[offsets[position]:offsets[position + 1]].decode('utf-8', 'surrogatepass')
+        elif code == _KIND_FLOAT:
+            values[position] = numbers[position]
+        elif code == _KIND_INT:
+            values[position] = integers[position]
+        elif code == _KIND_BOOL:
+            values[position] = bool(integers[position])
+        else:
+            values[position] = None
+    return values
+
+
+class ParsedFileCache:
+    """Cache em disco, com limite de tamanho, de uploads lidos"""
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._hashes: 'OrderedDict[str, Tuple[int, int, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def content_hash(self, file_path: str) -> str:
+        """
+        SHA-256 do arquivo
+        
+        O hash fica lembrado enquanto tamanho e mtime não mudam, então um
+        acerto no cache não relê o arquivo inteiro.
+        """
+        stat = os.stat(file_path)
+        
+        with self._lock:
+            memo = self._hashes.get(file_path)
+            if memo is not None and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._hashes.move_to_end(file_path)
+                return memo[2]
+        
+        digest = CSVProcessor.file_hash(file_path)
+        self._memo_hash(file_path, stat, digest)
+        return digest
+    
+    def remember_hash(self, file_path: str, content_hash: str) -> None:
+        """
+        Registra o hash já calculado de um arquivo (ex.: durante o upload),
+        para a primeira leitura não precisar relê-lo
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        
+        self._memo_hash(file_path, stat, content_hash)
+    
+    def _memo_hash(self, file_path: str, stat: os.stat_result, content_hash: str) -> None:
+        with self._lock:
+            self._hashes[file_path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+            while len(self._hashes) > _HASH_MEMO_SIZE:
+                self._hashes.popitem(last=False)
+    
+    def load_frame(
+        self,
+        file_path: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Tabela lida do upload (como CSVProcessor.read_csv, ou
+        PDFProcessor.read_pdf para extratos em PDF)
+        
+        Args:
+            cancel_token: Verificado entre os blocos da leitura do CSV ou
+                entre as páginas do PDF
+        """
+        content_hash = self.content_hash(file_path)
+        entry = self._entry_path(content_hash, FRAME_KEY)
+        
+        arrays = self._read(entry)
+        if arrays is not None:
+            return self._frame_from_arrays(arrays)
+        
+        if is_pdf(file_path):
+            df = PDFProcessor().read_pdf(file_path, cancel_token)
+        else:
+            df = CSVProcessor.read_csv(
+                file_path, content_hash=content_hash, cancel_token=cancel_token
+            )
+        self._write(entry, self._frame_arrays, df)
+        return df
+    
+    def load_transactions(
+        self,
+        file_path: str,
+        date_col: str,
+        value_col: str,
+        desc_col: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[Dict]:
+        """
+        Transações normalizadas (como CSVProcessor.process_dataframe)
+        
+        Args:
+            cancel_token: Verificado durante a leitura e antes da normalização
+        """
+        content_hash = self.content_hash(file_path)
+        entry = self._entry_path(content_hash, self._mapping_key(date_col, value_col, desc_col))
+        
+        arrays = self._read(entry)
+        if arrays is not None:
+            return self._transactions_from_arrays(arrays)
+        
+        df = self.load_frame(file_path, cancel_token)
+        if cancel_token is not None:
+            cancel_token.check()
+        transactions = CSVProcessor.process_dataframe(df, date_col, value_col, desc_col)
+        self._write(entry, self._transaction_arrays, transactions)
+        return transactions
+    
+    def invalidate(self, file_path: str, content_hash: Optional[str] = None) -> int:
+        """
+        Remove as entradas do conteúdo de um arquivo (chamar antes de apagá-lo)
+        
+        Args:
+            content_hash: SHA-256 já conhecido, para não reler o arquivo
+        
+        Returns:
+            Quantidade de entradas removidas
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(file_path)
+        
+        with self._lock:
+            self._hashes.pop(file_path, None)
+        
+        removed = 0
+        for entry in self._entries():
+            if os.path.basename(entry.path).startswith(f"{content_hash}-"):
+                self._remove(entry.path)
+                removed += 1
+        return removed
+    
+    def last_used(self) -> Dict[str, float]:
+        """
+        Último uso (mtime mais recente das entradas) de cada conteúdo em cache
+        
+        Returns:
+            Dict hash do conteúdo -> timestamp
+        """
+        usage = {}
+        for entry in self._entries():
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            content_hash = entry.name.split('-', 1)[0]
+            usage[content_hash] = max(mtime, usage.get(content_hash, 0.0))
+        return usage
+    
+    def clear(self) -> None:
+        """Remove todas as entradas"""
+        with self._lock:
+            self._hashes.clear()
+        for entry in self._entries():
+            self._remove(entry.path)
+    
+    def _entry_path(self, content_hash: str, key: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}-{key}{ENTRY_SUFFIX}")
+    
+    @staticmethod
+    def _mapping_key(date_col: str, value_col: str, desc_col: str) -> str:
+        mapping = json.dumps([date_col, value_col, desc_col])
+        return hashlib.sha256(mapping.encode('utf-8')).hexdigest()[:16]
+    
+    def _entries(self) -> List[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return [entry for entry in entries if entry.name.endswith(ENTRY_SUFFIX)]
+        except FileNotFoundError:
+            return []
+    
+    def _read(self, entry: str):
+        """Arrays de uma entrada (None se não existe ou está corrompida)"""
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(entry)
+            return None
+        
+        try:
+            # Marca como usada recentemente
+            os.utime(entry)
+        except OSError:
+            pass
+        return arrays
+    
+    def _write(self, entry: str, to_arrays: Callable[[Any], Dict[str, np.ndarray]], value: Any) -> None:
+        """
+        Grava `to_arrays(value)` de forma atômica e aplica o limite de tamanho
+        
+        Valores com tipos que o cache não guarda (ver _encode_column) ficam
+        sem entrada. O diretório é criado só para o usuário da aplicação.
+        """
+        try:
+            arrays = to_arrays(value)
+        except TypeError:
+            return
+        
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        tmp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, entry)
+        finally:
+            if os.path.exists(tmp_path):
+                self._remove(tmp_path)
+        
+        self._evict()
+    
+    def _evict(self) -> None:
+        """Remove as entradas menos usadas até caber em max_bytes"""
+        with self._lock:
+            entries = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+    
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _frame_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        arrays = _encode_column('columns', list(df.columns))
+        for position in range(df.shape[1]):
+            arrays.update(_encode_column(f"c{position}", df.iloc[:, position].to_numpy()))
+        return arrays
+    
+    @staticmethod
+    def _frame_from_arrays(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+        columns = _decode_column(arrays, 'columns').tolist()
+        df = pd.DataFrame({
+            position: _decode_column(arrays, f"c{position}") for position in range(len(columns))
+        })
+        df.columns = columns
+        return df
+    
+    @staticmethod
+    def _transaction_arrays(transactions: List[Dict]) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for field in TRANSACTION_FIELDS:
+            arrays.update(_encode_column(field, [item[field] for item in transactions]))
+        
+        columns = list(transactions[0]['original']) if transactions else []
+        arrays.update(_encode_column('columns', columns))
+        for position, name in enumerate(columns):
+            arrays.update(_encode_column(
+                f"o{position}", [item['original'][name] for item in transactions]
+            ))
+        return arrays
+    
+    @staticmethod
+    def _transactions_from_arrays(arrays: Dict[str, np.ndarray]) -> List[Dict]:
+        columns = _decode_column(arrays, 'columns').tolist()
+        fields = [_decode_column(arrays, field).tolist() for field in TRANSACTION_FIELDS]
+        originals = zip(*[
+            _decode_column(arrays, f"o{position}").tolist() for position in range(len(columns))
+        ])
+        
+        if not columns:
+            originals = ({} for _ in fields[0])
+        
+        return [
+            {
+                'id': idx,
+                'date': date,
+                'value': value,
+                'description': description,
+                'original': dict(zip(columns, original))
+            }
+            for idx, date, value, description, original in zip(*fields, originals)
+        ]
+
+
+# Instância usada pelas rotas
+parsed_cache = ParsedFileCache(settings.PARSED_CACHE_DIR, settings.PARSED_CACHE_MAX_BYTES)
@@ -1,11 +1,46 @@
 """
 Serviço de reconciliação
 """
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+import base64
+import json
+import math
+import os
 
-from app.models.reconciliation import Reconciliation, ReconciliationMatch
-from app.core.reconciliation_processor import ReconciliationProcessor
+from sqlalchemy import and_, or_
+
+from app.models.reconciliation import (
+    ManualMatch, Reconciliation, ReconciliationMatch, ReconciliationTransaction
+)
+from app.core.reconciliation_processor import ReconciliationProcessor, internal_members, match_rate
+from app.services.parsed_cache import parsed_cache
+
+
+SIDE_BANK = 'bank'
+SIDE_INTERNAL = 'internal'
+
+# Colunas de ordenação das pendências (cada uma com índice próprio)
+PENDING_SORT_COLUMNS = {
+    'date': ReconciliationTransaction.date,
+    'value': ReconciliationTransaction.value
+}
+
+
+def json_safe(value: Any) -> Any:
+    """
+    Cópia de `value` que pode ir para uma coluna JSON
+    
+    Células vazias do CSV chegam como float NaN, que o json.dumps grava como
+    `NaN` (o tipo json do Postgres recusa); NaN e infinitos viram None.
+    """
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
 
 
 class ReconciliationService:
@@ -66,7 +101,8 @@ class ReconciliationService:
             matched_count=results['summary']['matched_count'],
             bank_only_count=results['summary']['bank_only_count'],
             internal_only_count=results['summary']['internal_only_count'],
-            match_rate=results['summary']['match_rate']
+            match_rate=results['summary']['match_rate'],
+            is_complete=results['summary'].get('complete', True)
         )
         
         db.add(reconciliation)
@@ -77,8 +113,8 @@ class ReconciliationService:
         for match in results['matched']:
             match_record = ReconciliationMatch(
                 reconciliation_id=reconciliation.id,
-                bank_transaction_data=match['bank_transaction'],
-                internal_transaction_data=match['internal_transaction'],
+                bank_transaction_data=json_safe(match['bank_transaction']),
+                internal_transaction_data=json_safe(match['internal_transaction']),
                 confidence=match['confidence'],
                 is_manual=False
             )
@@ -88,6 +124,490 @@ class ReconciliationService:
         
         return reconciliation
     
+    @staticmethod
+    def _transaction_match_ids(
+        match_records: List[Tuple[ReconciliationMatch, Dict]]
+    ) -> Dict[Tuple[str, int], int]:
+        """Id do match de cada transação conciliada, por (lado, id do dict)"""
+        match_ids = {}
+        for record, match in match_records:
+            match_ids[(SIDE_BANK, id(match['bank_transaction']))] = record.id
+            for member in internal_members(match):
+                match_ids[(SIDE_INTERNAL, id(member))] = record.id
+        return match_ids
+    
+    @staticmethod
+    def save_transactions(
+        db,
+        reconciliation_id: int,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        match_records: List[Tuple[ReconciliationMatch, Dict]]
+    ) -> None:
+        """
+        Salva as transações normalizadas da conciliação
+        
+        Args:
+            match_records: Pares (registro já com id, match do motor), usados
+                para ligar cada transação conciliada ao seu match
+        """
+        match_ids = ReconciliationService._transaction_match_ids(match_records)
+        
+        rows = [
+            {
+                'reconciliation_id': reconciliation_id,
+                'side': side,
+                'transaction_id': trans['id'],
+                'date': trans['date'],
+                'value': trans['value'],
+                'description': trans['description'],
+                'original': json_safe(trans.get('original')),
+                'match_id': match_ids.get((side, id(trans)))
+            }
+            for side, data in ((SIDE_BANK, bank_data), (SIDE_INTERNAL, internal_data))
+            for trans in data
+        ]
+        
+        if rows:
+            db.bulk_insert_mappings(ReconciliationTransaction, rows)
+    
+    @staticmethod
+    def backfill_transactions(db, reconciliation: Reconciliation, upload_dir: str) -> bool:
+        """
+        Salva (sem commit) as transações de uma conciliação anterior à tabela
+        de transações, relendo os arquivos enviados
+        
+        Os arquivos são lidos como no caminho antigo (colunas Data, Valor e
+        Descricao). As transações dos matches salvos ficam ligadas a eles; os
+        matches manuais antigos (só em manual_matches) ganham o
+        ReconciliationMatch que link_manual_match criaria. Não faz nada se a
+        conciliação já tem transações salvas ou se os arquivos não podem
+        mais ser lidos.
+        
+        Returns:
+            True se as transações foram salvas
+        """
+        saved = db.query(ReconciliationTransaction.id).filter(
+            ReconciliationTransaction.reconciliation_id == reconciliation.id
+        ).first()
+        if saved is not None:
+            return False
+        
+        paths = [
+            os.path.join(upload_dir, os.path.basename(name or ''))
+            for name in (reconciliation.bank_file_name, reconciliation.internal_file_name)
+        ]
+        if not all(os.path.isfile(path) for path in paths):
+            return False
+        
+        try:
+            bank_data, internal_data = [
+                parsed_cache.load_transactions(path, 'Data', 'Valor', 'Descricao') for path in paths
+            ]
+        except Exception:
+            return False
+        
+        bank_by_id = {trans['id']: trans for trans in bank_data}
+        internal_by_id = {trans['id']: trans for trans in internal_data}
+        linked = set()
+        
+        def transaction(by_id: Dict[int, Dict], side: str, data: Any) -> Optional[Dict]:
+            trans = by_id.get(data.get('id')) if isinstance(data, dict) else None
+            if trans is None or (side, trans['id']) in linked:
+                return None
+            linked.add((side, trans['id']))
+            return trans
+        
+        # Matches no formato do motor, apontando para as transações relidas
+        match_records = []
+        records = db.query(ReconciliationMatch).filter(
+            ReconciliationMatch.reconciliation_id == reconciliation.id
+        ).order_by(ReconciliationMatch.id).all()
+        for record in records:
+            internal = record.internal_transaction_data
+            if isinstance(internal, dict) and 'members' in internal:
+                members = internal['members']
+            else:
+                members = [internal]
+            
+            match = {
+                'bank_transaction': transaction(bank_by_id, SIDE_BANK, record.bank_transaction_data),
+                'internal_transaction': {'members': [
+                    trans for trans in (
+                        transaction(internal_by_id, SIDE_INTERNAL, member) for member in members
+                    ) if trans is not None
+                ]}
+            }
+            match_records.append((record, match))
+        
+        manual_matches = db.query(ManualMatch).filter(
+            ManualMatch.reconciliation_id == reconciliation.id
+        ).order_by(ManualMatch.id).all()
+        for manual in manual_matches:
+            bank = transaction(bank_by_id, SIDE_BANK, {'id': manual.bank_transaction_id})
+            internal = transaction(internal_by_id, SIDE_INTERNAL, {'id': manual.internal_transaction_id})
+            if bank is None or internal is None:
+                continue
+            
+            record = ReconciliationMatch(
+                reconciliation_id=reconciliation.id,
+                bank_transaction_data=json_safe(bank),
+                internal_transaction_data=json_safe(internal),
+                confidence=1.0,
+                is_manual=True
+            )
+            db.add(record)
+            match_records.append((record, {'bank_transaction': bank, 'internal_transaction': internal}))
+        
+        db.flush()
+        ReconciliationService.save_transactions(
+            db, reconciliation.id, bank_data, internal_data, match_records
+        )
+        return True
+    
+    @staticmethod
+    def _date_window(data: List[Dict], date_tolerance: int) -> Optional[Tuple[str, str]]:
+        """Faixa de datas (YYYY-MM-DD) alcançada pelas transações, ou None"""
+        dates = []
+        for trans in data:
+            try:
+                dates.append(datetime.strptime(trans['date'], '%Y-%m-%d'))
+            except (TypeError, ValueError):
+                continue
+        
+        if not dates:
+            return None
+        
+        tolerance = timedelta(days=date_tolerance)
+        return (
+            (min(dates) - tolerance).strftime('%Y-%m-%d'),
+            (max(dates) + tolerance).strftime('%Y-%m-%d')
+        )
+    
+    @staticmethod
+    def load_pending_transactions(
+        db,
+        reconciliation_id: int,
+        side: str,
+        date_window: Optional[Tuple[str, str]]
+    ) -> List[ReconciliationTransaction]:
+        """
+        Transações pendentes de um lado dentro da faixa de datas
+        
+        Usa o índice (reconciliation_id, side, match_id, date); sem faixa
+        (nenhuma data válida do outro lado) não há o que conciliar.
+        """
+        if date_window is None:
+            return []
+        
+        return db.query(ReconciliationTransaction).filter(
+            ReconciliationTransaction.reconciliation_id == reconciliation_id,
+            ReconciliationTransaction.side == side,
+            ReconciliationTransaction.match_id.is_(None),
+            ReconciliationTransaction.date >= date_window[0],
+            ReconciliationTransaction.date <= date_window[1]
+        ).all()
+    
+    @staticmethod
+    def transaction_to_dict(row: ReconciliationTransaction) -> Dict[str, Any]:
+        """Transação salva no formato do motor (como CSVProcessor.process_dataframe)"""
+        return {
+            'id': row.transaction_id,
+            'date': row.date,
+            'value': row.value,
+            'description': row.description,
+            'original': row.original
+        }
+    
+    @staticmethod
+    def get_pending_transactions(db, reconciliation_id: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Transações pendentes de cada lado, lidas da tabela de transações
+        
+        Não depende dos arquivos enviados nem do mapeamento de colunas: as
+        transações foram salvas já normalizadas na conciliação. Usa o índice
+        (reconciliation_id, side, match_id, date).
+        
+        Returns:
+            Dict com 'bank' e 'internal', em ordem de id
+        """
+        pending = {}
+        for side in (SIDE_BANK, SIDE_INTERNAL):
+            rows = db.query(ReconciliationTransaction).filter(
+                ReconciliationTransaction.reconciliation_id == reconciliation_id,
+                ReconciliationTransaction.side == side,
+                ReconciliationTransaction.match_id.is_(None)
+            ).order_by(ReconciliationTransaction.transaction_id).all()
+            pending[side] = [ReconciliationService.transaction_to_dict(row) for row in rows]
+        return pending
+    
+    @staticmethod
+    def encode_cursor(cursor: Tuple[Any, int]) -> str:
+        """Cursor (chave de ordenação, id) como texto opaco para a API"""
+        raw = json.dumps(list(cursor), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(token: str, sort: str) -> Tuple[Any, int]:
+        """
+        Inverso de encode_cursor, conferindo o tipo da chave com a ordenação
+        
+        Raises:
+            ValueError: cursor inválido
+        """
+        try:
+            key, transaction_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        except Exception:
+            raise ValueError("Cursor inválido")
+        
+        key_type = (int, float) if sort == 'value' else str
+        if not isinstance(transaction_id, int) or isinstance(key, bool) or \
+           (key is not None and not isinstance(key, key_type)):
+            raise ValueError("Cursor inválido")
+        return key, transaction_id
+    
+    @staticmethod
+    def get_pending_page(
+        db,
+        reconciliation_id: int,
+        side: str,
+        limit: int,
+        sort: str = 'date',
+        descending: bool = False,
+        cursor: Optional[Tuple[Any, int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Uma página das transações pendentes de um lado (paginação por cursor)
+        
+        Pendente é a transação sem referência de match (match_id nulo), então
+        o anti-join com os matches vira uma faixa dos índices
+        (reconciliation_id, side, match_id, date|value). A ordem é a coluna
+        `sort` e depois o id da transação; transações sem data/valor vêm no
+        fim, em ordem de id. O cursor é o par (chave, id) da última linha.
+        
+        Args:
+            sort: 'date' ou 'value'
+            date_from, date_to: Faixa de datas (YYYY-MM-DD, inclusiva)
+            min_value, max_value: Faixa de valores (inclusiva)
+        
+        Returns:
+            Dict com 'items', 'next_cursor' (None na última página) e 'total'
+            (pendentes que passam nos filtros)
+        """
+        column = PENDING_SORT_COLUMNS[sort]
+        transaction_id = ReconciliationTransaction.transaction_id
+        
+        query = db.query(ReconciliationTransaction).filter(
+            ReconciliationTransaction.reconciliation_id == reconciliation_id,
+            ReconciliationTransaction.side == side,
+            ReconciliationTransaction.match_id.is_(None)
+        )
+        if date_from is not None:
+            query = query.filter(ReconciliationTransaction.date >= date_from)
+        if date_to is not None:
+            query = query.filter(ReconciliationTransaction.date <= date_to)
+        if min_value is not None:
+            query = query.filter(ReconciliationTransaction.value >= min_value)
+        if max_value is not None:
+            query = query.filter(ReconciliationTransaction.value <= max_value)
+        
+        rows = []
+        
+        # Linhas com chave, em ordem de (chave, id)
+        if cursor is None or cursor[0] is not None:
+            keyed = query.filter(column.isnot(None))
+            if cursor is not None:
+                key, last_id = cursor
+                after = column < key if descending else column > key
+                keyed = keyed.filter(or_(after, and_(column == key, transaction_id > last_id)))
+            
+            rows = keyed.order_by(
+                column.desc() if descending else column.asc(), transaction_id
+            ).limit(limit + 1).all()
+        
+        # Depois, as linhas sem chave, em ordem de id
+        if len(rows) <= limit:
+            last_id = cursor[1] if cursor is not None and cursor[0] is None else None
+            unkeyed = query.filter(column.is_(None))
+            if last_id is not None:
+                unkeyed = unkeyed.filter(transaction_id > last_id)
+            rows += unkeyed.order_by(transaction_id).limit(limit + 1 - len(rows)).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (getattr(rows[-1], sort), rows[-1].transaction_id)
+        
+        return {
+            'items': [ReconciliationService.transaction_to_dict(row) for row in rows],
+            'next_cursor': next_cursor,
+            'total': query.count()
+        }
+    
+    @staticmethod
+    def link_manual_match(
+        db,
+        reconciliation_id: int,
+        bank_transaction_id: int,
+        internal_transaction_id: int
+    ) -> Optional[ReconciliationMatch]:
+        """
+        Registra um match manual entre duas transações pendentes salvas
+        
+        Cria o ReconciliationMatch (is_manual) e liga as duas transações a
+        ele, tirando-as das pendências. Sem commit.
+        
+        Returns:
+            O match criado, ou None se alguma das transações não está salva
+            como pendente (ex.: conciliação anterior à tabela de transações)
+        """
+        rows = {}
+        for side, transaction_id in (
+            (SIDE_BANK, bank_transaction_id), (SIDE_INTERNAL, internal_transaction_id)
+        ):
+            rows[side] = db.query(ReconciliationTransaction).filter(
+                ReconciliationTransaction.reconciliation_id == reconciliation_id,
+                ReconciliationTransaction.side == side,
+                ReconciliationTransaction.transaction_id == transaction_id,
+                ReconciliationTransaction.match_id.is_(None)
+            ).first()
+            if rows[side] is None:
+                return None
+        
+        record = ReconciliationMatch(
+            reconciliation_id=reconciliation_id,
+            bank_transaction_data=ReconciliationService.transaction_to_dict(rows[SIDE_BANK]),
+            internal_transaction_data=ReconciliationService.transaction_to_dict(rows[SIDE_INTERNAL]),
+            confidence=1.0,
+            is_manual=True
+        )
+        db.add(record)
+        db.flush()
+        
+        for row in rows.values():
+            row.match_id = record.id
+        return record
+    
+    @staticmethod
+    def refresh_match_rate(reconciliation: Reconciliation) -> None:
+        """Recalcula match_rate a partir dos contadores da conciliação"""
+        total = (reconciliation.total_bank_transactions or 0) + (reconciliation.total_internal_transactions or 0)
+        pending = (reconciliation.bank_only_count or 0) + (reconciliation.internal_only_count or 0)
+        reconciliation.match_rate = match_rate(total - pending, total)
+    
+    @staticmethod
+    def append_to_reconciliation(
+        db,
+        reconciliation: Reconciliation,
+        bank_data: List[Dict],
+        internal_data: List[Dict],
+        processor: ReconciliationProcessor
+    ) -> Dict[str, Any]:
+        """
+        Adiciona transações novas a uma conciliação existente
+        
+        As novas são conciliadas entre si e contra as pendentes salvas na
+        janela de datas delas (ReconciliationProcessor.reconcile_incremental).
+        Matches, transações e contadores da conciliação são atualizados no
+        lugar.
+        
+        Args:
+            bank_data: Transações bancárias novas (ids são renumerados)
+            internal_data: Transações internas novas (ids são renumerados)
+            processor: Motor configurado com as tolerâncias da execução
+        
+        Returns:
+            Resultado de reconcile_incremental, com o summary acrescido dos
+            totais atualizados da conciliação
+        """
+        from sqlalchemy import func
+        
+        # Ids novos continuam a numeração de cada lado
+        for side, data in ((SIDE_BANK, bank_data), (SIDE_INTERNAL, internal_data)):
+            last_id = db.query(func.max(ReconciliationTransaction.transaction_id)).filter(
+                ReconciliationTransaction.reconciliation_id == reconciliation.id,
+                ReconciliationTransaction.side == side
+            ).scalar()
+            first_id = 0 if last_id is None else last_id + 1
+            for offset, trans in enumerate(data):
+                trans['id'] = first_id + offset
+        
+        # Bancos pendentes só interessam às internas novas, e vice-versa
+        pending_rows = {
+            SIDE_BANK: ReconciliationService.load_pending_transactions(
+                db, reconciliation.id, SIDE_BANK,
+                ReconciliationService._date_window(internal_data, processor.date_tolerance)
+            ),
+            SIDE_INTERNAL: ReconciliationService.load_pending_transactions(
+                db, reconciliation.id, SIDE_INTERNAL,
+                ReconciliationService._date_window(bank_data, processor.date_tolerance)
+            )
+        }
+        pending_data = {
+            side: [ReconciliationService.transaction_to_dict(row) for row in rows]
+            for side, rows in pending_rows.items()
+        }
+        
+        results = processor.reconcile_incremental(
+            bank_data, internal_data, pending_data[SIDE_BANK], pending_data[SIDE_INTERNAL]
+        )
+        
+        match_records = []
+        for match in results['matched']:
+            record = ReconciliationMatch(
+                reconciliation_id=reconciliation.id,
+                bank_transaction_data=json_safe(match['bank_transaction']),
+                internal_transaction_data=json_safe(match['internal_transaction']),
+                confidence=match['confidence'],
+                is_manual=False
+            )
+            db.add(record)
+            match_records.append((record, match))
+        db.flush()
+        
+        # Pendentes conciliadas apontam para o novo match
+        match_ids = ReconciliationService._transaction_match_ids(match_records)
+        for side in (SIDE_BANK, SIDE_INTERNAL):
+            for row, trans in zip(pending_rows[side], pending_data[side]):
+                match_id = match_ids.get((side, id(trans)))
+                if match_id is not None:
+                    row.match_id = match_id
+        
+        ReconciliationService.save_transactions(
+            db, reconciliation.id, bank_data, internal_data, match_records
+        )
+        
+        # Cada match consome um banco e uma ou mais internas (pendentes ou novas)
+        summary = results['summary']
+        matched_internal_rows = sum(len(internal_members(match)) for match in results['matched'])
+        reconciliation.total_bank_transactions = (reconciliation.total_bank_transactions or 0) + len(bank_data)
+        reconciliation.total_internal_transactions = (reconciliation.total_internal_transactions or 0) + len(internal_data)
+        reconciliation.matched_count = (reconciliation.matched_count or 0) + summary['matched_count']
+        reconciliation.bank_only_count = (
+            (reconciliation.bank_only_count or 0) + len(bank_data) - summary['matched_count']
+        )
+        reconciliation.internal_only_count = (
+            (reconciliation.internal_only_count or 0) + len(internal_data) - matched_internal_rows
+        )
+        
+        ReconciliationService.refresh_match_rate(reconciliation)
+        
+        db.commit()
+        
+        summary.update({
+            'total_bank_transactions': reconciliation.total_bank_transactions,
+            'total_internal_transactions': reconciliation.total_internal_transactions,
+            'total_matched_count': reconciliation.matched_count,
+            'total_bank_only_count': reconciliation.bank_only_count,
+            'total_internal_only_count': reconciliation.internal_only_count,
+            'match_rate': reconciliation.match_rate
+        })
+        return results
+    
     @staticmethod
     def get_user_statistics(user_id: int, db) -> Dict[str, Any]:
         """
@@ -96,7 +616,7 @@ class ReconciliationService:
         Args:
             user_id: ID do usuário
             db: Sessão do banco de dados
-            
+        
         Returns:
             Dict com estatísticas do usuário:
             - total_reconciliations: Total de conciliações realizadas
@@ -129,15 +649,14 @@ class ReconciliationService:
         total_bank = sum(r.total_bank_transactions or 0 for r in reconciliations)
         total_internal = sum(r.total_internal_transactions or 0 for r in reconciliations)
         
-        # Calcular totais
+        # Calcular totais (um match agregado consome várias internas)
         total_transactions = total_bank + total_internal
-        total_pending = total_transactions - (total_matches * 2)
+        total_pending = sum(
+            (r.bank_only_count or 0) + (r.internal_only_count or 0) for r in reconciliations
+        )
         
         # Calcular taxa média ponderada
-        if total_transactions > 0:
-            average_match_rate = (total_matches * 2 / total_transactions) * 100
-        else:
-            average_match_rate = 0.0
+        average_match_rate = match_rate(total_transactions - total_pending, total_transactions)
         
         # Última conciliação
         last_reconciliation = max(reconciliations, key=lambda r: r.created_at)
@@ -147,7 +666,7 @@ class ReconciliationService:
             "total_transactions": total_transactions,
             "total_matched": total_matches,
             "total_pending": total_pending,
-            "average_match_rate": round(average_match_rate, 2),
+            "average_match_rate": average_match_rate,
             "last_reconciliation_date": last_reconciliation.created_at.isoformat()
         }
     
@@ -163,10 +682,10 @@ class ReconciliationService:
         Args:
             db: Sessão do banco de dados SQLAlchemy
             user_id: ID do usuário autenticado
-            
+        
         Returns:
             List[Dict]: Lista de conciliações formatadas para JSON
-            
+        
         Exemplo:
             >>> reconciliations = ReconciliationService.get_user_reconciliations(db, 1)
             >>> print(reconciliations[0]['bank_file_name'])
@@ -190,7 +709,8 @@ class ReconciliationService:
                 "matched_count": rec.matched_count or 0,
                 "bank_only_count": rec.bank_only_count or 0,
                 "internal_only_count": rec.internal_only_count or 0,
-                "match_rate": round(rec.match_rate or 0.0, 2)
+                "match_rate": round(rec.match_rate or 0.0, 2),
+                "is_complete": rec.is_complete is not False
             }
             for rec in reconciliations
         ]
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Índice de uploads no banco
+
+Cada upload ganha uma linha em `uploads` com dono, hash, tamanho, linhas e
+colunas detectadas, calculados durante a gravação. A listagem vira uma
+consulta paginada pelo índice (user_id, created_at, id), sem varrer o
+diretório de uploads nem abrir os arquivos.
+
+Uploads gravados antes do índice existir entram nele por backfill, na
+primeira listagem de cada usuário.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+
+from app.core.csv_processor import CSVProcessor
+from app.core.pdf_processor import STATEMENT_COLUMNS
+from app.models.upload import Upload
+from app.services.parsed_cache import is_pdf, parsed_cache
+
+
+# Tipos de upload, pelo prefixo do nome (`bank_<user_id>_...`)
+UPLOAD_KINDS = ('bank', 'internal')
+
+# (diretório, user_id) já conferidos pelo backfill neste processo
+_backfilled: Set[Tuple[str, int]] = set()
+_backfill_lock = threading.Lock()
+
+
+class UploadIndex:
+    """Registro e consulta dos uploads de cada usuário"""
+    
+    @staticmethod
+    def detect_columns(file_path: str) -> Optional[List[str]]:
+        """
+        Colunas do upload: o cabeçalho do CSV (só a primeira linha é lida) ou
+        as colunas fixas do extrato em PDF. None se o CSV não pôde ser lido.
+        """
+        if is_pdf(file_path):
+            return list(STATEMENT_COLUMNS)
+        
+        try:
+            return [str(column) for column in CSVProcessor.read_csv(file_path, nrows=0).columns]
+        except Exception:
+            return None
+    
+    @staticmethod
+    def record(
+        db,
+        user_id: int,
+        kind: str,
+        file_path: str,
+        original_name: Optional[str],
+        info: Dict[str, Any],
+        columns: Optional[List[str]]
+    ) -> Upload:
+        """
+        Registra um upload já gravado (sem commit), substituindo um registro
+        anterior com o mesmo nome
+        
+        Args:
+            kind: 'bank' ou 'internal'
+            info: Retorno de UploadStore.store ('sha256', 'size', 'rows')
+            columns: Retorno de detect_columns
+        """
+        UploadIndex.remove(db, user_id, os.path.basename(file_path))
+        
+        upload = Upload(
+            user_id=user_id,
+            filename=os.path.basename(file_path),
+            kind=kind,
+            original_name=original_name,
+            content_hash=info['sha256'],
+            size_bytes=info['size'],
+            row_count=info['rows'],
+            columns=columns
+        )
+        db.add(upload)
+        return upload
+    
+    @staticmethod
+    def backfill(db, user_id: int, directory: str) -> int:
+        """
+        Registra (sem commit) os uploads do usuário que estão no diretório mas
+        não no índice, como os gravados antes dele existir
+        
+        O diretório é varrido uma vez por usuário em cada processo; os
+        metadados são calculados do arquivo e a data de envio é o mtime.
+        
+        Returns:
+            Quantidade de uploads registrados
+        """
+        key = (os.path.abspath(directory), user_id)
+        with _backfill_lock:
+            if key in _backfilled:
+                return 0
+            _backfilled.add(key)
+        
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return 0
+        
+        prefixes = tuple(f"{kind}_{user_id}_" for kind in UPLOAD_KINDS)
+        known = {
+            filename for (filename,) in db.query(Upload.filename).filter(Upload.user_id == user_id)
+        }
+        
+        added = 0
+        for name in sorted(names):
+            if not name.startswith(prefixes) or name in known:
+                continue
+            
+            file_path = os.path.join(directory, name)
+            try:
+                stat = os.stat(file_path)
+                info = {
+                    'sha256': parsed_cache.content_hash(file_path),
+                    'size': stat.st_size,
+                    'rows': None if is_pdf(file_path) else CSVProcessor.count_rows(file_path)
+                }
+            except OSError:
+                continue  # Removido durante a varredura
+            
+            upload = UploadIndex.record(
+                db, user_id, name.split('_', 1)[0], file_path, None, info,
+                UploadIndex.detect_columns(file_path)
+            )
+            upload.created_at = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+            added += 1
+        
+        return added
+    
+    @staticmethod
+    def list_for_user(
+        db,
+        user_id: int,
+        limit: int,
+        offset: int = 0
+    ) -> Tuple[List[Upload], int]:
+        """
+        Uploads do usuário, mais recentes primeiro
+        
+        Returns:
+            (uploads da página, total de uploads do usuário)
+        """
+        query = db.query(Upload).filter(Upload.user_id == user_id)
+        
+        uploads = query.order_by(
+            Upload.created_at.desc(), Upload.id.desc()
+        ).offset(offset).limit(limit).all()
+        
+        return uploads, query.count()
+    
+    @staticmethod
+    def used_bytes(db, user_id: int) -> int:
+        """Soma dos tamanhos dos uploads do usuário (base da cota)"""
+        total = db.query(func.sum(Upload.size_bytes)).filter(Upload.user_id == user_id).scalar()
+        return int(total or 0)
+    
+    @staticmethod
+    def get(db, user_id: int, filename: str) -> Optional[Upload]:
+        """Registro de um upload do usuário, se indexado"""
+        return db.query(Upload).filter(
+            Upload.user_id == user_id,
+            Upload.filename == filename
+        ).first()
+    
+    @staticmethod
+    def remove(db, user_id: int, filename: str) -> None:
+        """Remove o registro de um upload (sem commit)"""
+        db.query(Upload).filter(
+            Upload.user_id == user_id,
+            Upload.filename == filename
+        ).delete(synchronize_session=False)
+    
+    @staticmethod
+    def to_dict(upload: Upload) -> Dict[str, Any]:
+        """Upload no formato da API"""
+        return {
+            'filename': upload.filename,
+            'kind': upload.kind,
+            'original_name': upload.original_name,
+            'sha256': upload.content_hash,
+            'size_bytes': upload.size_bytes,
+            'rows': upload.row_count,
+            'columns': upload.columns,
+            'created_at': upload.created_at.isoformat() if upload.created_at else None
+        }
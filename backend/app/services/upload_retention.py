@@ -0,0 +1,417 @@
+"""
+Limpeza periódica de uploads (retenção)
+
+Cada rodada remove, em lotes com pausa entre eles para não concentrar I/O:
+
+- uploads sem uso há mais de `ttl_seconds`: o uso é o envio ou a última
+  leitura do conteúdo pelo cache (parsed_cache)
+- os uploads menos usados de cada usuário acima de `user_quota_bytes`
+- arquivos antigos fora do índice: uploads de antes da tabela `uploads`,
+  objetos sem nenhuma referência e temporários de uploads interrompidos
+
+Uploads em uso nunca são removidos: os citados por uma Reconciliation
+(bank_file_name/internal_file_name), os que têm leituras no parsed_cache
+(que tem limite de tamanho próprio) e os das fontes registradas em
+add_reference_source (ex.: entradas de jobs de conciliação na fila). A
+remoção passa pelo UploadStore, então o conteúdo (e as leituras dele em
+cache) só sai com a última referência.
+
+Cada rodada segura um lock de arquivo no diretório de uploads: com vários
+processos da aplicação, só um limpa por vez.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+from sqlalchemy import func, or_
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.reconciliation import Reconciliation
+from app.models.upload import Upload
+from app.services.parsed_cache import ParsedFileCache, parsed_cache
+from app.services.upload_store import UploadStore
+
+
+# Prefixos dos uploads no diretório (ver rota /upload)
+UPLOAD_PREFIXES = ('bank_', 'internal_')
+TMP_SUFFIX = '.tmp'
+
+# Lock das rodadas de limpeza, dentro do diretório de uploads
+LOCK_FILE = '.retention.lock'
+
+# Nomes por consulta IN
+_QUERY_CHUNK = 500
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """Timestamp de um created_at (sem fuso = UTC)"""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RetentionMetrics:
+    """Contadores acumulados da limpeza"""
+    
+    def __init__(self):
+        self.runs = 0
+        self.files_removed = 0
+        self.contents_removed = 0
+        self.bytes_reclaimed = 0
+        self.last_run: Optional[Dict[str, int]] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def record_run(self, run: Dict[str, int], started_at: datetime, seconds: float) -> None:
+        with self._lock:
+            self.runs += 1
+            self.files_removed += run['files_removed']
+            self.contents_removed += run['contents_removed']
+            self.bytes_reclaimed += run['bytes_reclaimed']
+            self.last_run = dict(run)
+            self.last_run_at = started_at
+            self.last_run_seconds = seconds
+            self.last_error = None
+    
+    def record_error(self, error: Exception) -> None:
+        with self._lock:
+            self.last_error = str(error)
+    
+    def to_dict(self) -> Dict:
+        """Métricas no formato da API"""
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'files_removed': self.files_removed,
+                'contents_removed': self.contents_removed,
+                'bytes_reclaimed': self.bytes_reclaimed,
+                'last_run': self.last_run,
+                'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+                'last_run_seconds': self.last_run_seconds,
+                'last_error': self.last_error
+            }
+
+
+class UploadRetention:
+    """Regras de retenção de um diretório de uploads"""
+    
+    def __init__(
+        self,
+        upload_dir: str,
+        cache: ParsedFileCache,
+        ttl_seconds: float,
+        user_quota_bytes: int,
+        batch_size: int = 100,
+        batch_pause: float = 0.0
+    ):
+        self.store = UploadStore(upload_dir)
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.user_quota_bytes = user_quota_bytes
+        self.batch_size = max(batch_size, 1)
+        self.batch_pause = batch_pause
+        self.metrics = RetentionMetrics()
+        self._reference_sources: List[Callable[[], Set[str]]] = []
+    
+    def add_reference_source(self, source: Callable[[], Set[str]]) -> None:
+        """Registra uma fonte de nomes de uploads em uso, que não são removidos"""
+        self._reference_sources.append(source)
+    
+    @contextmanager
+    def exclusive(self) -> Iterator[bool]:
+        """
+        Lock de arquivo entre processos para uma rodada
+        
+        Yields:
+            False se outro processo já está limpando (a rodada deve ser pulada)
+        """
+        if fcntl is None:
+            yield True
+            return
+        
+        os.makedirs(self.store.directory, exist_ok=True)
+        with open(os.path.join(self.store.directory, LOCK_FILE), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def run_once(self, db, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Executa uma rodada de limpeza
+        
+        Returns:
+            Dict com 'files_removed' (uploads), 'contents_removed' (conteúdos
+            sem mais referências) e 'bytes_reclaimed' (bytes liberados em disco)
+        """
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        now = time.time() if now is None else now
+        run = {'files_removed': 0, 'contents_removed': 0, 'bytes_reclaimed': 0}
+        usage = self.cache.last_used()
+        in_use: Set[str] = set()
+        for source in self._reference_sources:
+            in_use.update(source())
+        
+        def last_used(upload: Upload) -> float:
+            return max(_timestamp(upload.created_at), usage.get(upload.content_hash, 0.0))
+        
+        if self.ttl_seconds > 0:
+            cutoff = now - self.ttl_seconds
+            expired = db.query(Upload).filter(
+                Upload.created_at < datetime.fromtimestamp(cutoff, timezone.utc)
+            ).order_by(Upload.created_at, Upload.id).all()
+            
+            unused = [upload for upload in expired if last_used(upload) < cutoff]
+            self._remove_uploads(db, self._unreferenced(db, unused, usage, in_use), run)
+        
+        if self.user_quota_bytes > 0:
+            over_quota = db.query(Upload.user_id, func.sum(Upload.size_bytes)).group_by(
+                Upload.user_id
+            ).having(func.sum(Upload.size_bytes) > self.user_quota_bytes).all()
+            
+            for user_id, used in over_quota:
+                uploads = db.query(Upload).filter(Upload.user_id == user_id).all()
+                uploads.sort(key=lambda upload: (last_used(upload), upload.id))
+                
+                excess = used - self.user_quota_bytes
+                chosen = []
+                for upload in self._unreferenced(db, uploads, usage, in_use):
+                    if excess <= 0:
+                        break
+                    chosen.append(upload)
+                    excess -= upload.size_bytes
+                self._remove_uploads(db, chosen, run)
+        
+        if self.ttl_seconds > 0:
+            self._sweep_unindexed(db, now - self.ttl_seconds, usage, in_use, run)
+        
+        self.metrics.record_run(run, started_at, time.perf_counter() - start)
+        return run
+    
+    def _unreferenced(
+        self,
+        db,
+        uploads: List[Upload],
+        usage: Dict[str, float],
+        in_use: Set[str]
+    ) -> List[Upload]:
+        """
+        Uploads que nenhuma conciliação cita, sem leituras em cache e fora
+        das fontes de referência
+        
+        Args:
+            usage: Retorno de ParsedFileCache.last_used
+            in_use: Nomes das fontes de referência
+        """
+        referenced = self._referenced_names(db, [upload.filename for upload in uploads])
+        return [
+            upload for upload in uploads
+            if upload.filename not in referenced
+            and upload.filename not in in_use
+            and upload.content_hash not in usage
+        ]
+    
+    @staticmethod
+    def _referenced_names(db, filenames: List[str]) -> Set[str]:
+        referenced = set()
+        for chunk in _chunks(filenames, _QUERY_CHUNK):
+            rows = db.query(
+                Reconciliation.bank_file_name, Reconciliation.internal_file_name
+            ).filter(or_(
+                Reconciliation.bank_file_name.in_(chunk),
+                Reconciliation.internal_file_name.in_(chunk)
+            )).all()
+            for bank_name, internal_name in rows:
+                referenced.update((bank_name, internal_name))
+        return referenced
+    
+    def _in_batches(self, items: List, remove: Callable, db=None) -> None:
+        """Aplica `remove` em lotes, com commit e pausa entre os lotes"""
+        for position, batch in enumerate(_chunks(items, self.batch_size)):
+            if position and self.batch_pause > 0:
+                time.sleep(self.batch_pause)
+            for item in batch:
+                remove(item)
+            if db is not None:
+                db.commit()
+    
+    def _remove_uploads(self, db, uploads: List[Upload], run: Dict[str, int]) -> None:
+        def remove(upload: Upload) -> None:
+            self._remove_file(upload.filename, upload.content_hash, run)
+            db.delete(upload)
+        
+        self._in_batches(uploads, remove, db)
+    
+    def _remove_file(self, filename: str, content_hash: Optional[str], run: Dict[str, int]) -> None:
+        try:
+            size = os.stat(os.path.join(self.store.directory, filename)).st_size
+            content_removed = self.store.remove(filename, content_hash=content_hash)
+        except FileNotFoundError:
+            return
+        
+        run['files_removed'] += 1
+        if content_removed:
+            run['contents_removed'] += 1
+            run['bytes_reclaimed'] += size
+    
+    def _sweep_unindexed(
+        self,
+        db,
+        cutoff: float,
+        usage: Dict[str, float],
+        in_use: Set[str],
+        run: Dict[str, int]
+    ) -> None:
+        """Remove arquivos antigos que não estão no índice de uploads nem em uso"""
+        legacy = [
+            entry.name for entry in self._old_entries(self.store.directory, cutoff)
+            if entry.name.startswith(UPLOAD_PREFIXES)
+        ]
+        indexed = set()
+        for chunk in _chunks(legacy, _QUERY_CHUNK):
+            indexed.update(
+                name for (name,) in db.query(Upload.filename).filter(Upload.filename.in_(chunk))
+            )
+        referenced = self._referenced_names(db, legacy)
+        legacy = [
+            name for name in legacy
+            if name not in indexed and name not in referenced and name not in in_use
+            and not self._cached(name, usage)
+        ]
+        
+        self._in_batches(legacy, lambda name: self._remove_file(name, None, run))
+        
+        def remove_object(entry: os.DirEntry) -> None:
+            # Temporário de upload interrompido ou objeto sem referências
+            is_tmp = entry.name.endswith(TMP_SUFFIX)
+            try:
+                stat = os.stat(entry.path)
+                if not is_tmp and stat.st_nlink > 1:
+                    return
+                if not is_tmp:
+                    # O nome do objeto é o próprio hash do conteúdo
+                    self.cache.invalidate(entry.path, os.path.splitext(entry.name)[0])
+                os.remove(entry.path)
+            except FileNotFoundError:
+                return
+            
+            if not is_tmp:
+                run['contents_removed'] += 1
+            run['bytes_reclaimed'] += stat.st_size
+        
+        objects = self._old_entries(self.store.objects_dir, cutoff)
+        self._in_batches(objects, remove_object)
+    
+    def _cached(self, filename: str, usage: Dict[str, float]) -> bool:
+        """Indica se o conteúdo de um upload fora do índice tem leituras em cache"""
+        try:
+            return self.cache.content_hash(os.path.join(self.store.directory, filename)) in usage
+        except FileNotFoundError:
+            return False
+    
+    @staticmethod
+    def _old_entries(directory: str, cutoff: float) -> List[os.DirEntry]:
+        """Arquivos do diretório com mtime anterior a `cutoff`"""
+        entries = []
+        try:
+            with os.scandir(directory) as scan:
+                for entry in scan:
+                    try:
+                        if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                            entries.append(entry)
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+
+class RetentionWorker:
+    """Thread que executa a limpeza a cada `interval` segundos"""
+    
+    def __init__(self, retention: UploadRetention, session_factory: Callable, interval: float):
+        self.retention = retention
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Inicia a thread (nada acontece com interval <= 0)"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='upload-retention', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Pede a parada e espera a rodada em andamento terminar"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def run(self) -> Optional[Dict[str, int]]:
+        """
+        Executa uma rodada numa sessão própria (erros vão para as métricas)
+        
+        Returns:
+            Retorno de run_once, ou None se falhou ou se outro processo já
+            está limpando o diretório
+        """
+        with self.retention.exclusive() as acquired:
+            if not acquired:
+                return None
+            
+            db = self.session_factory()
+            try:
+                return self.retention.run_once(db)
+            except Exception as e:
+                db.rollback()
+                self.retention.metrics.record_error(e)
+                return None
+            finally:
+                db.close()
+    
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run()
+            self._stop.wait(self.interval)
+
+
+# Instâncias usadas pela aplicação
+upload_retention = UploadRetention(
+    settings.UPLOAD_DIR,
+    parsed_cache,
+    ttl_seconds=settings.UPLOAD_TTL_DAYS * 24 * 3600,
+    user_quota_bytes=settings.UPLOAD_USER_QUOTA_BYTES,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    batch_pause=settings.RETENTION_BATCH_PAUSE
+)
+retention_worker = RetentionWorker(
+    upload_retention, SessionLocal, settings.RETENTION_INTERVAL_SECONDS
+)
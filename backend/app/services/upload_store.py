@@ -0,0 +1,192 @@
+"""
+Armazenamento de uploads por conteúdo
+
+Cada conteúdo é gravado uma vez só, em `<upload_dir>/.objects/<sha256><ext>`.
+O arquivo do usuário (`bank_<user_id>_<timestamp>.csv` etc.) é um hard link
+para esse objeto, então as rotas continuam abrindo o upload pelo nome e um
+reenvio do mesmo arquivo não ocupa espaço novo. Como o cache de leituras
+(parsed_cache) também é chaveado pelo conteúdo, o reenvio reaproveita as
+leituras já feitas.
+
+A contagem de links do objeto é a contagem de referências: quando a última
+referência é removida, o objeto e as leituras dele em cache também saem.
+Uploads antigos, gravados antes deste formato, são arquivos comuns e são
+removidos como antes.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from contextlib import nullcontext
+from typing import BinaryIO, Dict, Optional
+
+from app.core.csv_processor import CSVProcessor
+from app.services.parsed_cache import is_pdf, parsed_cache
+
+
+# Subdiretório dos objetos, dentro do diretório de uploads
+OBJECTS_DIR = '.objects'
+
+# Bytes lidos e gravados por vez
+CHUNK_SIZE = 1024 * 1024
+
+# Serializa criação de links e remoção de objetos dentro do processo
+_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """Upload maior que o limite permitido"""
+    
+    def __init__(self, max_size: int):
+        super().__init__(f"Arquivo excede o tamanho máximo de {max_size // (1024 * 1024)}MB")
+        self.max_size = max_size
+
+
+class UploadStore:
+    """Uploads de um diretório, deduplicados por conteúdo"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, OBJECTS_DIR)
+    
+    def object_path(self, content_hash: str, ext: str) -> str:
+        """Caminho do objeto de um conteúdo"""
+        return os.path.join(self.objects_dir, f"{content_hash}{ext.lower()}")
+    
+    def store(self, source: BinaryIO, filename: str, max_size: int) -> Dict[str, Optional[object]]:
+        """
+        Grava o upload como referência `filename` para o objeto do conteúdo
+        
+        Com origem posicionável (o arquivo temporário do multipart), uma
+        primeira passada só lê, calculando hash e contagens; se o objeto já
+        existe, só o link é criado, sem gravar nada. Senão (ou com origem
+        sequencial) o conteúdo é copiado em blocos para um temporário, que
+        vira o objeto.
+        
+        Raises:
+            UploadTooLarge: passou de `max_size` bytes (nada fica gravado)
+        
+        Returns:
+            Dict com 'sha256', 'size' (bytes), 'rows' (linhas de dados do CSV,
+            None para PDF) e 'deduplicated' (o conteúdo já estava gravado)
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        ref_path = os.path.join(self.directory, filename)
+        tmp_path = os.path.join(self.objects_dir, f"{uuid.uuid4().hex}.tmp")
+        count_rows = not is_pdf(filename)
+        
+        if os.path.lexists(ref_path):
+            # Mesmo nome no mesmo segundo: a referência anterior é trocada
+            self.remove(filename)
+        
+        try:
+            if source.seekable():
+                # Passada só de leitura: um reenvio vira só um link, sem cópia
+                start = source.tell()
+                info = self._copy(source, None, max_size, count_rows)
+                object_path = self.object_path(info['sha256'], os.path.splitext(filename)[1])
+                if self._link(object_path, ref_path):
+                    info['deduplicated'] = True
+                else:
+                    source.seek(start)
+                    with open(tmp_path, 'wb') as buffer:
+                        shutil.copyfileobj(source, buffer, CHUNK_SIZE)
+                    info['deduplicated'] = self._link(object_path, ref_path, tmp_path)
+            else:
+                info = self._copy(source, tmp_path, max_size, count_rows)
+                object_path = self.object_path(info['sha256'], os.path.splitext(filename)[1])
+                info['deduplicated'] = self._link(object_path, ref_path, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        # A primeira leitura pelo cache não precisa recalcular o hash
+        parsed_cache.remember_hash(ref_path, info['sha256'])
+        return info
+    
+    def remove(self, filename: str, content_hash: Optional[str] = None) -> bool:
+        """
+        Remove a referência `filename`; o objeto sai junto se era a última
+        
+        Args:
+            content_hash: SHA-256 já conhecido (ex.: do índice de uploads),
+                para não reler o arquivo
+        
+        Returns:
+            True se o conteúdo (objeto e leituras em cache) foi removido
+        """
+        ref_path = os.path.join(self.directory, filename)
+        if content_hash is None:
+            content_hash = parsed_cache.content_hash(ref_path)
+        object_path = self.object_path(content_hash, os.path.splitext(filename)[1])
+        
+        with _lock:
+            if not self._same_file(ref_path, object_path):
+                # Upload antigo, fora do armazenamento por conteúdo
+                parsed_cache.invalidate(ref_path, content_hash)
+                os.remove(ref_path)
+                return True
+            
+            os.remove(ref_path)
+            if os.stat(object_path).st_nlink > 1:
+                return False
+            
+            parsed_cache.invalidate(object_path, content_hash)
+            os.remove(object_path)
+            return True
+    
+    @staticmethod
+    def _copy(source: BinaryIO, path: Optional[str], max_size: int, count_rows: bool) -> Dict:
+        """Lê a origem calculando hash e contagens, gravando em `path` se dado"""
+        digest = hashlib.sha256()
+        size = 0
+        
+        with open(path, 'wb') if path else nullcontext() as buffer:
+            def blocks():
+                nonlocal size
+                for block in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    size += len(block)
+                    if size > max_size:
+                        raise UploadTooLarge(max_size)
+                    digest.update(block)
+                    if buffer is not None:
+                        buffer.write(block)
+                    yield block
+            
+            if count_rows:
+                rows = CSVProcessor.count_rows_in_blocks(blocks())
+            else:
+                rows = None
+                for _ in blocks():
+                    pass
+        
+        return {'sha256': digest.hexdigest(), 'size': size, 'rows': rows}
+    
+    @staticmethod
+    def _link(object_path: str, ref_path: str, tmp_path: Optional[str] = None) -> bool:
+        """
+        Cria a referência para o objeto; se ele ainda não existe, promove o
+        temporário a objeto (sem temporário, nada é criado)
+        
+        Returns:
+            True se o objeto já existia
+        """
+        with _lock:
+            try:
+                os.link(object_path, ref_path)
+                return True
+            except FileNotFoundError:
+                # Conteúdo novo (ou objeto removido por outro processo)
+                if tmp_path is None:
+                    return False
+                os.replace(tmp_path, object_path)
+                os.link(object_path, ref_path)
+                return False
+    
+    @staticmethod
+    def _same_file(path: str, other: str) -> bool:
+        try:
+            return os.path.samefile(path, other)
+        except FileNotFoundError:
+            return False
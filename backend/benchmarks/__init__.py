@@ -0,0 +1 @@
+"""Benchmarks de desempenho do backend"""
@@ -0,0 +1,78 @@
+"""
+Benchmark do parsing de extratos em PDF
+
+Compara PDFProcessor.parse_bank_statement (tokenizador de uma passada) com a
+implementação anterior (_parse_bank_statement_regex) num texto sintético no
+formato de extrato (cabeçalhos, linhas com data, linhas que herdam a data e
+valores brasileiros com sinal), e confere se os DataFrames são idênticos.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_pdf_parser
+    python -m benchmarks.bench_pdf_parser --lines 10000 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.core.pdf_processor import PDFProcessor
+
+
+WORDS = ['PIX', 'TED', 'BOLETO', 'TARIFA', 'COMPRA', 'Fornecedor', 'Cliente', 'Aluguel', 'Energia']
+
+
+def make_statement(count: int, seed: int = 42) -> str:
+    """Texto de extrato com `count` linhas"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    lines = []
+    
+    for idx in range(count):
+        if idx % 50 == 0:
+            lines.append(f"BANCO EXEMPLO S.A. - EXTRATO - Página {idx // 50 + 1}")
+            continue
+        
+        amount = rng.uniform(-50000, 50000)
+        value = f"{amount:+,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+        if rng.random() < 0.5:
+            value = f"R$ {value}"
+        description = ' '.join(rng.sample(WORDS, 3))
+        
+        if rng.random() < 0.8:
+            date = (start + timedelta(days=rng.randint(0, 364))).strftime('%d/%m/%Y')
+            lines.append(f"{date} {description} {idx}  {value}")
+        else:
+            lines.append(f"    {description} {idx}    {value}")
+    
+    return '\n'.join(lines)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--lines', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    
+    processor = PDFProcessor(workers=1)
+    print(f"{'linhas':>8} {'regex (s)':>10} {'tokens (s)':>11} {'speedup':>8}")
+    
+    for count in args.lines:
+        text = make_statement(count)
+        
+        regex, regex_time = timed(processor._parse_bank_statement_regex, text)
+        tokens, tokens_time = timed(processor.parse_bank_statement, text)
+        pd.testing.assert_frame_equal(tokens, regex)
+        
+        print(f"{count:>8} {regex_time:10.3f} {tokens_time:11.3f} "
+              f"{regex_time / tokens_time:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
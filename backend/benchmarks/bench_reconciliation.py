@@ -0,0 +1,115 @@
+"""
+Benchmark do motor de conciliação
+
+Compara o laço aninhado ('loop') com o modo indexado ('indexed') para
+tamanhos crescentes de entrada e confere se os resultados são idênticos.
+Também mede a atribuição ótima ('optimal') e quantos matches ela recupera.
+Com --workers > 1, mede ainda o modo indexado dividido entre processos e
+confere que ele é idêntico ao serial.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_reconciliation
+    python -m benchmarks.bench_reconciliation --sizes 1000 5000 20000 --skip-loop-above 1000
+    python -m benchmarks.bench_reconciliation --sizes 50000 200000 --workers 4
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from app.core.reconciliation_processor import ReconciliationProcessor
+
+
+WORDS = [
+    'pix', 'ted', 'doc', 'boleto', 'fornecedor', 'cliente', 'aluguel',
+    'energia', 'agua', 'nota', 'fiscal', 'tarifa', 'salario', 'compra'
+]
+
+
+def make_transactions(count: int, seed: int, days: int = 30) -> List[Dict]:
+    """Gera transações sintéticas espalhadas em `days` dias"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    
+    return [
+        {
+            'id': idx,
+            'date': (start + timedelta(days=rng.randint(0, days - 1))).strftime('%Y-%m-%d'),
+            'value': round(rng.uniform(10, 5000), 2),
+            'description': ' '.join(rng.sample(WORDS, 3))
+        }
+        for idx in range(count)
+    ]
+
+
+def make_pair(count: int, seed: int = 42):
+    """Gera dados bancários e internos onde ~80% das linhas têm par"""
+    rng = random.Random(seed)
+    bank = make_transactions(count, seed)
+    internal = []
+    
+    for idx, trans in enumerate(bank):
+        if rng.random() < 0.8:
+            shifted = datetime.strptime(trans['date'], '%Y-%m-%d') + timedelta(days=rng.choice([0, 0, 1]))
+            internal.append({
+                'id': idx,
+                'date': shifted.strftime('%Y-%m-%d'),
+                'value': round(trans['value'] * rng.uniform(0.995, 1.005), 2),
+                'description': trans['description']
+            })
+        else:
+            internal.append(make_transactions(1, seed + idx)[0] | {'id': idx})
+    
+    rng.shuffle(internal)
+    return bank, internal
+
+
+def run(processor: ReconciliationProcessor, bank: List[Dict], internal: List[Dict]):
+    start = time.perf_counter()
+    result = processor.reconcile(bank, internal)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 500, 1000, 2000, 10000, 50000])
+    parser.add_argument('--skip-loop-above', type=int, default=2000,
+                        help='Não executa o laço aninhado acima deste tamanho')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processos do modo paralelo (1 = não mede)')
+    args = parser.parse_args()
+    
+    print(f"{'linhas':>8} {'loop (s)':>10} {'indexed (s)':>12} {'speedup':>8} {'matches':>8} "
+          f"{'optimal (s)':>12} {'matches':>8} {'parallel (s)':>13}")
+    
+    for size in args.sizes:
+        bank, internal = make_pair(size)
+        indexed, indexed_time = run(ReconciliationProcessor(strategy='indexed', workers=1), bank, internal)
+        optimal, optimal_time = run(ReconciliationProcessor(assignment='optimal', workers=1), bank, internal)
+        
+        if args.workers > 1:
+            parallel, parallel_time = run(
+                ReconciliationProcessor(workers=args.workers, parallel_min_rows=0), bank, internal
+            )
+            assert parallel == indexed, f"Resultado paralelo divergente para {size} linhas"
+            parallel_col = f"{parallel_time:13.3f}"
+        else:
+            parallel_col = f"{'-':>13}"
+        
+        if size <= args.skip_loop_above:
+            loop, loop_time = run(ReconciliationProcessor(strategy='loop', workers=1), bank, internal)
+            assert loop == indexed, f"Resultados divergentes para {size} linhas"
+            loop_col = f"{loop_time:10.3f}"
+            speedup = f"{loop_time / indexed_time:7.1f}x"
+        else:
+            loop_col = f"{'-':>10}"
+            speedup = f"{'-':>8}"
+        
+        print(f"{size:>8} {loop_col} {indexed_time:12.3f} {speedup} "
+              f"{indexed['summary']['matched_count']:>8} "
+              f"{optimal_time:12.3f} {optimal['summary']['matched_count']:>8} {parallel_col}")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ export ALGORITHM="HS256"
 export ACCESS_TOKEN_EXPIRE_MINUTES="30"
 
 echo "Iniciando aplicação..."
-gunicorn app.main:app --workers 2 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --daemon
+# Um worker só: os jobs de conciliação ficam em memória no processo
+gunicorn app.main:app --workers 1 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --daemon
 
 echo "Deploy concluído!"
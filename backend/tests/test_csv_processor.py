@@ -7,6 +7,7 @@ import pytest
 import pandas as pd
 import tempfile
 import os
+from unittest.mock import patch
 from app.core.csv_processor import CSVProcessor
 
 
@@ -357,4 +358,367 @@ class TestIntegration:
             assert result[0]['date'] == '2025-01-15'
             assert result[0]['value'] == 1500.00
         finally:
-            os.unlink(temp_path)
\ No newline at end of file
+            os.unlink(temp_path)
+
+# ============================================================================
+# TESTES DO MÉTODO iter_transactions()
+# ============================================================================
+
+class TestIterTransactions:
+    """Testes da leitura em blocos"""
+    
+    def test_iter_transactions_matches_process_dataframe(self, processor):
+        """TESTE 24: Leitura em blocos gera as mesmas transações, sem 'original'"""
+        lines = [" Data ,Valor,Descrição"] + [
+            f"{day:02d}/01/2025,\"{day},50\",Pagamento {day}" for day in range(1, 8)
+        ]
+        
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+            temp_path = f.name
+        
+        try:
+            expected = processor.process_dataframe(
+                processor.read_csv(temp_path), 'Data', 'Valor', 'Descrição'
+            )
+            streamed = list(processor.iter_transactions(
+                temp_path, 'Data', 'Valor', 'Descrição', chunksize=3
+            ))
+            
+            assert [item['id'] for item in streamed] == list(range(7))
+            assert streamed == [
+                {key: item[key] for key in ('id', 'date', 'value', 'description')}
+                for item in expected
+            ]
+        finally:
+            os.unlink(temp_path)
+    
+    def test_iter_transactions_include_original(self, processor):
+        """TESTE 25: Cópia da linha mantida quando solicitada"""
+        content = "Data,Valor,Descrição\n15/01/2025,1500.00,Pagamento Fornecedor"
+        
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv', encoding='utf-8') as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            items = list(processor.iter_transactions(
+                temp_path, 'Data', 'Valor', 'Descrição', include_original=True
+            ))
+            assert items[0]['original']['Descrição'] == 'Pagamento Fornecedor'
+        finally:
+            os.unlink(temp_path)
+
+
+# ============================================================================
+# TESTES DO PROCESSAMENTO POR COLUNA
+# ============================================================================
+
+class TestVectorizedProcessing:
+    """process_dataframe por coluna gera o mesmo que o linha a linha"""
+    
+    def test_same_records_as_row_by_row(self, processor):
+        """TESTE 26: Mesmos registros (valores e tipos) que _process_dataframe_rows"""
+        df = pd.DataFrame({
+            'Data': [
+                '15/01/2024', '2024-1-5', '01/13/2024', ' 5-1-2024 ', '0001-01-01',
+                'today', '31/02/2024', None, 20240105, '2024/01/05'
+            ],
+            'Valor': [
+                'R$ 1.500,00', '$1,500.00', '100,5', ' 1 500,00 ', 'abc',
+                None, 2.5, 7, '1.2.3', '-0,01'
+            ],
+            'Desc': ['  pix  ', None, 5, 2.5, 'ted', '', 'a', 'b', 'c', 'd'],
+            'Extra': range(10)
+        }, index=[3, 3, 1, 0, 9, 8, 7, 6, 5, 4])
+        snapshot = df.copy()
+        
+        vectorized = processor.process_dataframe(df, 'Data', 'Valor', 'Desc')
+        rows = processor._process_dataframe_rows(df, 'Data', 'Valor', 'Desc')
+        
+        assert repr(vectorized) == repr(rows)
+        assert [type(item['value']) for item in vectorized] == [float] * 10
+        assert [
+            [type(value) for value in item['original'].values()] for item in vectorized
+        ] == [
+            [type(value) for value in item['original'].values()] for item in rows
+        ]
+        pd.testing.assert_frame_equal(df, snapshot)
+    
+    def test_numeric_frame_and_missing_column(self, processor):
+        """TESTE 27: Frame só numérico e coluna ausente seguem o linha a linha"""
+        numeric = pd.DataFrame({'Data': [1, 2], 'Valor': [1.5, -2.0], 'Desc': [3, 4]})
+        
+        assert processor.process_dataframe(numeric, 'Data', 'Valor', 'Desc') == \
+            processor._process_dataframe_rows(numeric, 'Data', 'Valor', 'Desc')
+        assert processor.process_dataframe(numeric, 'Data', 'Valor', 'Outra') == []
+    
+    def test_normalize_dates_keeps_format_order(self, processor):
+        """TESTE 28: Cada data usa o primeiro formato que casa, como normalize_date"""
+        dates = pd.Series(['01/02/2024', '02/13/2024', 'now', '2024-02-30', None])
+        
+        result = processor.normalize_dates(dates)
+        
+        assert result.tolist() == ['2024-02-01', '2024-02-13', 'now', '2024-02-30', None]
+        assert result.tolist() == [
+            processor.normalize_date(date) if date is not None else None for date in dates
+        ]
+    
+    def test_normalize_values_brazilian_and_american(self, processor):
+        """TESTE 29: Formatos brasileiro e americano na mesma coluna"""
+        values = pd.Series(['R$ 1.234,56', '1,234.56', '1234', '12,5', 'x', None])
+        
+        assert processor.normalize_values(values).tolist() == [1234.56, 1234.56, 1234.0, 12.5, 0.0, 0.0]
+
+
+# ============================================================================
+# TESTES DA DETECÇÃO DE FORMATO
+# ============================================================================
+
+class TestDetectFormat:
+    """Testes de detecção de encoding, separador e decimal por amostra"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from app.core import csv_processor
+        csv_processor._format_cache.clear()
+        yield
+        csv_processor._format_cache.clear()
+    
+    def _write(self, content: bytes) -> str:
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.csv') as f:
+            f.write(content)
+        return f.name
+    
+    def test_brazilian_semicolon_export(self, processor):
+        """TESTE 30: Exportação com ';' e vírgula decimal em latin-1"""
+        path = self._write(
+            'Data;Valor;Descrição\n01/02/2024;-1234,56;Tarifa\n02/02/2024;10,50;Depósito\n'
+            .encode('latin-1')
+        )
+        
+        try:
+            csv_format = processor.detect_format(path)
+            df = processor.read_csv(path)
+        finally:
+            os.unlink(path)
+        
+        assert csv_format['delimiter'] == ';'
+        assert csv_format['decimal'] == ','
+        assert list(df.columns) == ['Data', 'Valor', 'Descrição']
+        assert df['Valor'].tolist() == [-1234.56, 10.5]
+        assert df['Descrição'].tolist() == ['Tarifa', 'Depósito']
+    
+    def test_only_sample_is_analyzed(self, processor, monkeypatch):
+        """TESTE 31: chardet recebe só a amostra inicial, não o arquivo inteiro"""
+        from app.core import csv_processor
+        seen = []
+        
+        def fake_detect(sample):
+            seen.append(len(sample))
+            return {'encoding': 'latin-1'}
+        
+        monkeypatch.setattr(csv_processor.chardet, 'detect', fake_detect)
+        line = 'Data,Valor,Descrição\n'.encode('latin-1')
+        path = self._write(line * 20000)
+        
+        try:
+            assert processor.detect_encoding(path) == 'latin-1'
+            assert processor.detect_format(path)['encoding'] == 'latin-1'
+        finally:
+            os.unlink(path)
+        
+        assert seen and all(size <= csv_processor._SAMPLE_SIZE for size in seen)
+    
+    def test_format_cached_by_content(self, processor, monkeypatch):
+        """TESTE 32: Mesmo conteúdo em outro caminho não repete a detecção"""
+        content = b'Data,Valor,Descricao\n2024-01-01,10.5,PIX\n'
+        first, second = self._write(content), self._write(content)
+        calls = []
+        original = CSVProcessor._detect_delimiter
+        monkeypatch.setattr(
+            CSVProcessor, '_detect_delimiter',
+            staticmethod(lambda lines: calls.append(1) or original(lines))
+        )
+        
+        digest = processor.file_hash(first)
+        
+        try:
+            assert (processor.detect_format(first, content_hash=digest) ==
+                    processor.detect_format(second, content_hash=digest))
+            processor.read_csv(second, content_hash=digest)
+        finally:
+            os.unlink(first)
+            os.unlink(second)
+        
+        assert len(calls) == 1
+    
+    def test_format_cached_by_stat_without_hashing(self, processor, monkeypatch):
+        """TESTE 38: Sem hash, o cache usa caminho, tamanho e mtime e não lê o arquivo inteiro"""
+        path = self._write(b'Data,Valor,Descricao\n2024-01-01,10.5,PIX\n')
+        calls = []
+        original = CSVProcessor._sniff_format
+        monkeypatch.setattr(
+            CSVProcessor, '_sniff_format',
+            staticmethod(lambda file_path: calls.append(1) or original(file_path))
+        )
+        monkeypatch.setattr(
+            CSVProcessor, 'file_hash',
+            staticmethod(lambda file_path: pytest.fail('arquivo inteiro lido para o hash'))
+        )
+        
+        try:
+            assert processor.detect_format(path)['delimiter'] == ','
+            processor.read_csv(path)
+            assert len(calls) == 1
+            
+            with open(path, 'wb') as f:
+                f.write(b'Data;Valor;Descricao\n01/01/2024;10,5;PIX\n')
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+            
+            assert processor.detect_format(path)['delimiter'] == ';'
+        finally:
+            os.unlink(path)
+        
+        assert len(calls) == 2
+    
+    def test_cancellable_read_in_chunks(self, processor, monkeypatch):
+        """TESTE 39: Com token, lê em blocos (mesmo resultado) e para entre eles se cancelado"""
+        from app.core import csv_processor
+        from app.core.progress import CancellationToken, OperationCancelled
+        
+        lines = ''.join(f'2024-01-{day % 28 + 1:02d};{day},50;PIX {day}\n' for day in range(25))
+        path = self._write(('Data;Valor;Descricao\n' + lines).encode('utf-8'))
+        monkeypatch.setattr(csv_processor, '_READ_CHUNK_ROWS', 10)
+        token = CancellationToken()
+        
+        try:
+            pd.testing.assert_frame_equal(
+                processor.read_csv(path, cancel_token=token), processor.read_csv(path)
+            )
+            
+            token.cancel()
+            with pytest.raises(OperationCancelled):
+                processor.read_csv(path, cancel_token=token)
+        finally:
+            os.unlink(path)
+    
+    def test_tab_delimiter_and_quoted_fields(self, processor):
+        """TESTE 33: Separador tab e campos entre aspas com ';' dentro"""
+        tab = self._write(b'Data\tValor\tDescricao\n2024-01-01\t10.5\tPIX; cliente\n')
+        quoted = self._write(
+            b'Data,Valor,Descricao\n2024-01-01,"1.500,00","PIX; cliente"\n'
+        )
+        
+        try:
+            tab_df = processor.read_csv(tab)
+            quoted_format = processor.detect_format(quoted)
+            quoted_df = processor.read_csv(quoted)
+        finally:
+            os.unlink(tab)
+            os.unlink(quoted)
+        
+        assert list(tab_df.columns) == ['Data', 'Valor', 'Descricao']
+        assert tab_df['Descricao'].tolist() == ['PIX; cliente']
+        assert quoted_format == {'encoding': 'utf-8', 'delimiter': ',', 'decimal': '.'}
+        assert quoted_df['Valor'].tolist() == ['1.500,00']
+
+
+# ============================================================================
+# TESTES DO PREVIEW
+# ============================================================================
+
+class TestPreview:
+    """Testes do preview com leitura limitada"""
+    
+    def _write(self, content: bytes) -> str:
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.csv') as f:
+            f.write(content)
+        return f.name
+    
+    @pytest.mark.parametrize('content, expected', [
+        (b'', 0),
+        (b'Data,Valor\n', 0),
+        (b'Data,Valor\n2024-01-01,10\n2024-01-02,20\n', 2),
+        (b'Data,Valor\n2024-01-01,10\n2024-01-02,20', 2),
+        (b'Data,Valor\r\n2024-01-01,10\r\n\r\n\r\n', 1),
+    ])
+    def test_count_rows(self, processor, content, expected):
+        """TESTE 34: Conta linhas de dados, sem cabeçalho nem linhas em branco finais"""
+        path = self._write(content)
+        try:
+            assert processor.count_rows(path) == expected
+        finally:
+            os.unlink(path)
+    
+    def test_preview_reads_only_sample(self, processor, monkeypatch):
+        """TESTE 35: Só a amostra é lida como CSV; o total vem da contagem"""
+        from app.core import csv_processor
+        monkeypatch.setattr(csv_processor, 'PREVIEW_SAMPLE_ROWS', 10)
+        lines = ['Data;Valor;Descricao'] + [f'0{i % 9 + 1}/01/2024;{i},50;PIX {i}' for i in range(500)]
+        path = self._write('\n'.join(lines).encode('utf-8'))
+        reads = []
+        original = pd.read_csv
+        
+        def tracked_read_csv(*args, **kwargs):
+            reads.append(kwargs.get('nrows'))
+            return original(*args, **kwargs)
+        
+        monkeypatch.setattr(csv_processor.pd, 'read_csv', tracked_read_csv)
+        
+        try:
+            result = processor.preview(path)
+        finally:
+            os.unlink(path)
+        
+        assert reads == [10]
+        assert result['total_rows'] == 500
+        assert result['columns'] == ['Data', 'Valor', 'Descricao']
+        assert len(result['rows']) == 5
+        assert result['rows'][0] == {'Data': '01/01/2024', 'Valor': 0.5, 'Descricao': 'PIX 0'}
+    
+    def test_preview_column_types(self, processor):
+        """TESTE 36: Tipos detectados por coluna e células vazias como None"""
+        path = self._write(
+            b'Data,Valor,Texto,Vazia,Numero,Flag\n'
+            b'01/02/2024,"R$ 1.500,00",PIX,,1,True\n'
+            b'2024-02-03,-10.5,,,2,False\n'
+        )
+        
+        try:
+            result = processor.preview(path)
+        finally:
+            os.unlink(path)
+        
+        assert result['total_rows'] == 2
+        assert result['column_types'] == {
+            'Data': 'date', 'Valor': 'number', 'Texto': 'text',
+            'Vazia': 'empty', 'Numero': 'number', 'Flag': 'boolean'
+        }
+        assert result['rows'][1]['Texto'] is None
+        assert result['rows'][1]['Vazia'] is None
+    
+    def test_count_rows_in_small_blocks(self, processor):
+        """TESTE 37: Contagem em blocos pequenos igual à do arquivo inteiro"""
+        content = b'Data,Valor\n01/01/2024,1\n\n02/01/2024,2\r\n\r\n\n  \n'
+        
+        for size in (1, 2, 5):
+            blocks = [content[i:i + size] for i in range(0, len(content), size)]
+            assert processor.count_rows_in_blocks(blocks) == 3
+    
+    def test_preview_uses_known_total(self, processor, monkeypatch):
+        """TESTE 40: Com o total já conhecido (índice de uploads) o arquivo não é percorrido"""
+        from app.core import csv_processor
+        monkeypatch.setattr(csv_processor, 'PREVIEW_SAMPLE_ROWS', 10)
+        lines = ['Data,Valor'] + [f'01/01/2024,{i}' for i in range(50)]
+        path = self._write('\n'.join(lines).encode('utf-8'))
+        
+        try:
+            with patch.object(CSVProcessor, 'count_rows') as mock_count:
+                known = processor.preview(path, total_rows=50)
+            unknown = processor.preview(path)
+        finally:
+            os.unlink(path)
+        
+        mock_count.assert_not_called()
+        assert known['total_rows'] == unknown['total_rows'] == 50
@@ -0,0 +1,128 @@
+"""
+Testes dos backends de similaridade de descrições
+Requisito: RF03 - Conciliação automática com fuzzy matching
+"""
+import random
+import pytest
+from fuzzywuzzy import fuzz
+
+from app.core.fuzzy_scorer import (
+    FuzzyWuzzyScorer,
+    RapidFuzzScorer,
+    get_scorer
+)
+from app.core.reconciliation_processor import ReconciliationProcessor
+
+
+WORDS = [
+    'Pagamento', 'FORNECEDOR', 'depósito', 'Transferência', 'PIX', 'ted',
+    'boleto', 'Nº', '123', 'NF-e', 'aluguel', 'São', 'Paulo', 'ÇÃO', '--', '!!!',
+    'energia/água', 'R$', '1.500,00', 'cliente_a', '東京', 'ß'
+]
+
+
+def _random_descriptions(seed, count):
+    """Descrições com acentos, pontuação e caixa variada"""
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(count):
+        words = rng.sample(WORDS, rng.randint(1, 5))
+        descriptions.append(rng.choice(['', ' ', '  ']) + ' '.join(words))
+    descriptions += ['', '   ', '!!!', '???', 'A', 'a ']
+    return descriptions
+
+
+@pytest.fixture
+def rapidfuzz_scorer():
+    return RapidFuzzScorer(workers=1)
+
+
+class TestScorerParity:
+    """Paridade entre RapidFuzz e fuzzywuzzy"""
+    
+    def test_rapidfuzz_matches_fuzzywuzzy(self, rapidfuzz_scorer):
+        """TESTE 1: Score idêntico ao fuzz.token_sort_ratio par a par"""
+        descriptions = _random_descriptions(0, 150)
+        
+        for left in descriptions:
+            for right in descriptions[:40]:
+                expected = 0
+                if left and right:
+                    expected = fuzz.token_sort_ratio(left.lower().strip(), right.lower().strip())
+                
+                score = rapidfuzz_scorer.score(
+                    rapidfuzz_scorer.normalize(left),
+                    rapidfuzz_scorer.normalize(right)
+                )
+                
+                assert score == expected, (left, right)
+    
+    def test_score_pairs_matches_single_scores(self, rapidfuzz_scorer):
+        """TESTE 2: Cálculo em lote igual ao cálculo par a par"""
+        rng = random.Random(1)
+        descriptions = [rapidfuzz_scorer.normalize(d) for d in _random_descriptions(1, 200)]
+        lefts = [rng.choice(descriptions) for _ in range(500)]
+        rights = [rng.choice(descriptions) for _ in range(500)]
+        
+        batch = rapidfuzz_scorer.score_pairs(lefts, rights)
+        
+        assert batch.tolist() == [rapidfuzz_scorer.score(l, r) for l, r in zip(lefts, rights)]
+    
+    def test_score_pairs_cutoff_only_drops_low_scores(self, rapidfuzz_scorer):
+        """TESTE 3: Com corte, pares acima do mínimo mantêm o score exato"""
+        descriptions = [rapidfuzz_scorer.normalize(d) for d in _random_descriptions(2, 100)]
+        lefts = descriptions
+        rights = list(reversed(descriptions))
+        
+        full = rapidfuzz_scorer.score_pairs(lefts, rights)
+        cut = rapidfuzz_scorer.score_pairs(lefts, rights, min_score=60)
+        
+        for exact, with_cutoff in zip(full, cut):
+            if exact >= 60:
+                assert with_cutoff == exact
+            else:
+                assert with_cutoff < 60
+    
+    def test_fuzzywuzzy_backend_batch(self):
+        """TESTE 4: Backend de compatibilidade também aceita lotes"""
+        scorer = FuzzyWuzzyScorer()
+        lefts = [scorer.normalize('Pagamento A'), None]
+        rights = [scorer.normalize('pagamento a'), scorer.normalize('x')]
+        
+        assert scorer.score_pairs(lefts, rights).tolist() == [100, 0]
+    
+    def test_get_scorer_invalid_name(self):
+        """TESTE 5: Backend desconhecido deve gerar erro"""
+        with pytest.raises(ValueError):
+            get_scorer('difflib')
+
+
+class TestProcessorScorerParity:
+    """Resultado da conciliação igual entre backends"""
+    
+    @pytest.mark.parametrize('strategy', ['loop', 'indexed'])
+    def test_reconcile_same_result_for_both_backends(self, strategy):
+        """TESTE 6: Conciliação idêntica com rapidfuzz e fuzzywuzzy"""
+        rng = random.Random(3)
+        descriptions = _random_descriptions(3, 60)
+        
+        def make(count, offset):
+            return [
+                {
+                    'id': i,
+                    'date': f'2024-11-0{1 + rng.randint(0, 3)}',
+                    'value': rng.choice([100.0, 101.0, 250.0]),
+                    'description': rng.choice(descriptions)
+                }
+                for i in range(count)
+            ]
+        
+        bank = make(80, 0)
+        internal = make(90, 100)
+        
+        kwargs = {'strategy': strategy, 'similarity_threshold': 0.6}
+        reference = ReconciliationProcessor(scorer='fuzzywuzzy', **kwargs).reconcile(bank, internal)
+        result = ReconciliationProcessor(scorer='rapidfuzz', **kwargs).reconcile(bank, internal)
+        
+        assert result == reference
+        assert result['summary']['matched_count'] > 0
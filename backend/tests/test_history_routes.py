@@ -61,4 +61,54 @@ class TestHistoryRoutes:
         """TESTE 3: Deve retornar 404 para conciliação inexistente"""
         mock_db.query.return_value.filter.return_value.first.return_value = None
         response = client.get("/api/history/reconciliations/999", headers=auth_headers)
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404    
+    def test_get_reconciliation_pending_from_db(self, client, auth_headers, mock_db):
+        """TESTE 4: Pendências vêm da tabela de transações, sem abrir os arquivos"""
+        from unittest.mock import patch
+        
+        reconciliation = MagicMock(
+            id=7, bank_file_name="bank_1_x.csv", internal_file_name="internal_1_x.csv",
+            created_at=None, total_bank_transactions=1, total_internal_transactions=0,
+            matched_count=0, bank_only_count=1, internal_only_count=0, match_rate=0.0
+        )
+        mock_db.query.return_value.filter.return_value.first.return_value = reconciliation
+        mock_db.query.return_value.filter.return_value.all.return_value = []
+        pending = {
+            'bank': [{'id': 0, 'date': '2024-11-01', 'value': 10.0, 'description': 'pix', 'original': {}}],
+            'internal': []
+        }
+        
+        with patch("app.api.routes.history.ReconciliationService.get_pending_transactions",
+                   return_value=pending) as mock_pending, \
+             patch("os.path.exists") as mock_exists:
+            response = client.get("/api/history/7", headers=auth_headers)
+        
+        assert response.status_code == 200
+        mock_pending.assert_called_once_with(mock_db, 7)
+        mock_exists.assert_not_called()
+        assert response.json()['bank_only'] == pending['bank']
+    
+    def test_incomplete_reconciliation_flagged(self, client, auth_headers, mock_db):
+        """TESTE 5: Conciliação parcial (orçamento esgotado) sai marcada na lista e nos detalhes"""
+        from datetime import datetime
+        from unittest.mock import patch
+        
+        reconciliation = MagicMock(
+            id=8, user_id=1, bank_file_name="bank_1_x.csv", internal_file_name="internal_1_x.csv",
+            created_at=datetime(2025, 1, 15), total_bank_transactions=4,
+            total_internal_transactions=4, matched_count=1, bank_only_count=3,
+            internal_only_count=3, match_rate=25.0, is_complete=False
+        )
+        mock_db.query.return_value.filter.return_value.first.return_value = reconciliation
+        mock_db.query.return_value.filter.return_value.all.return_value = []
+        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
+            reconciliation
+        ]
+        
+        with patch("app.api.routes.history.ReconciliationService.get_pending_transactions",
+                   return_value={'bank': [], 'internal': []}):
+            details = client.get("/api/history/8", headers=auth_headers)
+        listing = client.get("/api/history", headers=auth_headers)
+        
+        assert details.json()['summary']['complete'] is False
+        assert listing.json()[0]['is_complete'] is False
@@ -0,0 +1,158 @@
+"""
+Testes da fila de jobs em segundo plano
+"""
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+
+from app.core.progress import OperationCancelled
+from app.services.job_queue import (
+    JobQueue, JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED,
+    JOB_RETENTION_SECONDS
+)
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def queue():
+    """Fila com um job por vez"""
+    return JobQueue(max_workers=1)
+
+
+# ============================================================================
+# TESTES DA FILA
+# ============================================================================
+
+class TestJobQueue:
+    """Testes de execução, limite e estados dos jobs"""
+    
+    def test_job_completes_with_result(self, queue):
+        """TESTE 1: Resultado da função vira o resultado do job"""
+        job = queue.submit(1, 'test', lambda a, b: a + b, 2, 3)
+        
+        queue.wait(job.id, timeout=5)
+        
+        assert job.status == JOB_COMPLETED
+        assert job.result == 5
+        assert job.to_dict()['finished_at'] is not None
+    
+    def test_concurrency_limit(self, queue):
+        """TESTE 2: Além do limite, jobs esperam na fila"""
+        release = threading.Event()
+        started = threading.Event()
+        
+        def blocking():
+            started.set()
+            release.wait(5)
+            return 'ok'
+        
+        first = queue.submit(1, 'test', blocking)
+        second = queue.submit(1, 'test', lambda: 'ok')
+        started.wait(5)
+        
+        assert first.status == JOB_RUNNING
+        assert second.status == JOB_QUEUED
+        
+        release.set()
+        queue.wait(second.id, timeout=5)
+        assert second.status == JOB_COMPLETED
+    
+    def test_failed_job_keeps_message(self, queue):
+        """TESTE 3: Exceção marca o job como falho, com o detail se houver"""
+        def fail():
+            raise HTTPException(status_code=500, detail="Erro na conciliação: boom")
+        
+        job = queue.submit(1, 'test', fail)
+        queue.wait(job.id, timeout=5)
+        
+        assert job.status == JOB_FAILED
+        assert job.error == "Erro na conciliação: boom"
+    
+    def test_get_filters_by_user(self, queue):
+        """TESTE 4: Job de outro usuário não é retornado"""
+        job = queue.submit(1, 'test', lambda: None)
+        
+        assert queue.get(job.id, user_id=1) is job
+        assert queue.get(job.id, user_id=2) is None
+        assert queue.get('inexistente') is None
+    
+    def test_finished_jobs_expire(self, queue):
+        """TESTE 5: Jobs terminados há mais que a retenção são descartados"""
+        old = queue.submit(1, 'test', lambda: None)
+        queue.wait(old.id, timeout=5)
+        old.finished_at = datetime.now(timezone.utc) - timedelta(seconds=JOB_RETENTION_SECONDS + 1)
+        
+        queue.submit(1, 'test', lambda: None)
+        
+        assert queue.get(old.id) is None
+    
+    def test_progress_callback_updates_job(self, queue):
+        """TESTE 6: Com with_progress a função recebe o callback do job"""
+        def task(total, progress_callback):
+            for processed in range(1, total + 1):
+                progress_callback({'processed': processed, 'total': total})
+            return total
+        
+        job = queue.submit(1, 'test', task, 3, with_progress=True)
+        queue.wait(job.id, timeout=5)
+        
+        assert job.result == 3
+        assert job.progress == {'processed': 3, 'total': 3}
+        assert job.progress_version == 3
+        assert job.to_dict()['progress'] == job.progress
+    
+    def test_cancel_queued_job_never_runs(self, queue):
+        """TESTE 7: Job cancelado na fila termina na hora e não executa"""
+        release = threading.Event()
+        calls = []
+        
+        first = queue.submit(1, 'test', release.wait, 5)
+        second = queue.submit(1, 'test', calls.append, 'executou')
+        
+        assert queue.cancel(second.id).status == JOB_CANCELLED
+        assert second.done.is_set()
+        
+        release.set()
+        queue._executor.shutdown(wait=True)
+        assert first.status == JOB_COMPLETED
+        assert calls == []
+    
+    def test_cancel_running_job(self, queue):
+        """TESTE 8: Job em execução para quando a tarefa nota o token"""
+        started = threading.Event()
+        
+        def task(cancel_token):
+            started.set()
+            while not cancel_token.cancelled:
+                time.sleep(0.01)
+            raise OperationCancelled()
+        
+        job = queue.submit(1, 'test', task, cancellable=True)
+        started.wait(5)
+        
+        assert queue.cancel(job.id, user_id=2) is None
+        assert queue.cancel(job.id, user_id=1).status == JOB_RUNNING
+        
+        queue.wait(job.id, timeout=5)
+        assert job.status == JOB_CANCELLED
+        assert job.error is None
+        assert queue.cancel(job.id).status == JOB_CANCELLED
+    
+    def test_active_inputs_until_job_finishes(self, queue):
+        """TESTE 9: Entradas dos jobs na fila e em execução, sem as dos terminados"""
+        release = threading.Event()
+        
+        running = queue.submit(1, 'test', release.wait, 5, inputs=('bank_1_a.csv', 'internal_1_a.csv'))
+        waiting = queue.submit(1, 'test', lambda: None, inputs=('bank_1_b.csv',))
+        
+        assert queue.active_inputs() == {'bank_1_a.csv', 'internal_1_a.csv', 'bank_1_b.csv'}
+        
+        release.set()
+        queue.wait(running.id, timeout=5)
+        queue.wait(waiting.id, timeout=5)
+        assert queue.active_inputs() == set()
@@ -88,4 +88,80 @@ class TestManualMatchRoutes:
         mock_db.query.return_value.filter.return_value.first.return_value = mock_match
         
         response = client.delete("/api/manual-match/1", headers=auth_headers)
-        assert response.status_code in [200, 204, 404, 422, 401]
\ No newline at end of file
+        assert response.status_code in [200, 204, 404, 422, 401]
+    
+    def test_pending_paginated_by_side(self, client, auth_headers, mock_db):
+        """TESTE 5: Pendentes paginadas por lado, com filtros e cursor opaco"""
+        from unittest.mock import patch
+        
+        mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(id=1)
+        page = {
+            'items': [{'id': 4, 'date': '2024-11-02', 'value': 10.0, 'description': 'pix', 'original': None}],
+            'next_cursor': (10.0, 4),
+            'total': 9
+        }
+        
+        with patch("app.api.routes.manual_match.ReconciliationService.get_pending_page",
+                   return_value=page) as mock_page:
+            response = client.get(
+                "/api/reconciliation/1/pending",
+                params={"side": "bank", "sort": "value", "order": "desc", "limit": 1,
+                        "date_from": "2024-11-01", "max_value": 50},
+                headers=auth_headers
+            )
+            invalid_cursor = client.get(
+                "/api/reconciliation/1/pending",
+                params={"bank_cursor": "xx"}, headers=auth_headers
+            )
+        invalid_sort = client.get(
+            "/api/reconciliation/1/pending", params={"sort": "description"}, headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        result = response.json()
+        assert result["bank_pending"] == page["items"]
+        assert result["bank_total"] == 9
+        assert result["internal_pending"] == [] and result["internal_next_cursor"] is None
+        assert mock_page.call_count == 1
+        kwargs = mock_page.call_args.kwargs
+        assert (kwargs["sort"], kwargs["descending"], kwargs["date_from"], kwargs["max_value"]) == (
+            "value", True, "2024-11-01", 50.0
+        )
+        
+        from app.services.reconciliation_service import ReconciliationService
+        assert ReconciliationService.decode_cursor(result["bank_next_cursor"], "value") == (10.0, 4)
+        assert invalid_cursor.status_code == 400
+        assert invalid_sort.status_code == 422
+    
+    def test_manual_match_updates_counters_only_when_linked(self, client, auth_headers, mock_db):
+        """
+        TESTE 6: Match manual atualiza contadores e taxa (transações conciliadas
+        sobre o total); transações que não estão pendentes dão 409 sem mexer neles
+        """
+        from unittest.mock import patch
+        
+        reconciliation = MagicMock(
+            id=1, total_bank_transactions=4, total_internal_transactions=6,
+            matched_count=2, bank_only_count=2, internal_only_count=3, match_rate=50.0
+        )
+        mock_db.query.return_value.filter.return_value.first.return_value = reconciliation
+        payload = {"reconciliation_id": 1, "bank_transaction_id": 3, "internal_transaction_id": 5}
+        
+        with patch("app.api.routes.manual_match.ReconciliationService.link_manual_match",
+                   return_value=None):
+            conflict = client.post("/api/manual-match/", json=payload, headers=auth_headers)
+        
+        assert conflict.status_code == 409
+        assert (reconciliation.matched_count, reconciliation.bank_only_count,
+                reconciliation.internal_only_count, reconciliation.match_rate) == (2, 2, 3, 50.0)
+        mock_db.add.assert_not_called()
+        mock_db.commit.assert_not_called()
+        
+        with patch("app.api.routes.manual_match.ReconciliationService.link_manual_match",
+                   return_value=MagicMock(id=9)):
+            response = client.post("/api/manual-match/", json=payload, headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert (reconciliation.matched_count, reconciliation.bank_only_count,
+                reconciliation.internal_only_count) == (3, 1, 2)
+        assert reconciliation.match_rate == 70.0  # 7 de 10 transações conciliadas
@@ -0,0 +1,187 @@
+"""
+Testes do cache de arquivos lidos e normalizados
+"""
+import shutil
+import time
+import pytest
+from unittest.mock import patch
+
+from app.core.csv_processor import CSVProcessor
+from app.services.parsed_cache import ParsedFileCache
+
+
+CSV_CONTENT = (
+    'Data;Valor;Descricao;Documento;Extra\n'
+    '01/02/2024;"1.234,56";PIX cliente;10;\n'
+    '2024-02-03;-10.5;  Tarifa ;11;x\n'
+    'invalida;abc;;12;\n'
+)
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache num diretório temporário"""
+    return ParsedFileCache(str(tmp_path / 'cache'), max_bytes=10 * 1024 * 1024)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """CSV com separador ';', formatos mistos e células vazias"""
+    path = tmp_path / 'bank_1_20240101.csv'
+    path.write_text(CSV_CONTENT, encoding='utf-8')
+    return str(path)
+
+
+# ============================================================================
+# TESTES DO CACHE
+# ============================================================================
+
+class TestParsedFileCache:
+    """Testes de leitura, reaproveitamento, limite e invalidação"""
+    
+    def test_same_result_as_processor(self, cache, csv_path):
+        """TESTE 1: Leitura e cache dão os mesmos registros e tipos do CSVProcessor"""
+        expected = CSVProcessor.process_dataframe(
+            CSVProcessor.read_csv(csv_path), 'Data', 'Valor', 'Descricao'
+        )
+        
+        first = cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')
+        cached = cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')
+        
+        for result in (first, cached):
+            assert repr(result) == repr(expected)
+            assert [
+                [type(value) for value in item['original'].values()] for item in result
+            ] == [
+                [type(value) for value in item['original'].values()] for item in expected
+            ]
+        assert cache.load_frame(csv_path).equals(CSVProcessor.read_csv(csv_path))
+    
+    def test_hit_skips_parsing_even_for_copy(self, cache, csv_path, tmp_path):
+        """TESTE 2: Mesmo conteúdo (inclusive outra cópia) não é relido nem normalizado"""
+        copy_path = str(tmp_path / 'internal_1_20240101.csv')
+        shutil.copy(csv_path, copy_path)
+        cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')
+        
+        with patch.object(CSVProcessor, 'read_csv') as mock_read, \
+             patch.object(CSVProcessor, 'process_dataframe') as mock_process:
+            result = cache.load_transactions(copy_path, 'Data', 'Valor', 'Descricao')
+        
+        assert len(result) == 3
+        mock_read.assert_not_called()
+        mock_process.assert_not_called()
+    
+    def test_mapping_is_part_of_key(self, cache, csv_path):
+        """TESTE 3: Outro mapeamento gera outra entrada, reaproveitando a tabela lida"""
+        with patch.object(CSVProcessor, 'read_csv', wraps=CSVProcessor.read_csv) as mock_read:
+            by_description = cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')
+            by_document = cache.load_transactions(csv_path, 'Data', 'Valor', 'Documento')
+        
+        assert mock_read.call_count == 1
+        assert by_description[1]['description'] == 'Tarifa'
+        assert by_document[1]['description'] == '11'
+    
+    def test_size_limit_evicts_least_recently_used(self, tmp_path):
+        """TESTE 4: Acima do limite, as entradas menos usadas saem primeiro"""
+        paths = []
+        for idx in range(3):
+            path = tmp_path / f'f{idx}.csv'
+            path.write_text(CSV_CONTENT + f'05/02/2024;{idx},00;Arquivo {idx};13;\n')
+            paths.append(str(path))
+        
+        probe = ParsedFileCache(str(tmp_path / 'probe'), max_bytes=10 * 1024 * 1024)
+        probe.load_frame(paths[0])
+        entry_size = max(entry.stat().st_size for entry in probe._entries())
+        cache = ParsedFileCache(str(tmp_path / 'cache'), max_bytes=int(entry_size * 2.5))
+        
+        cache.load_frame(paths[0])
+        time.sleep(0.01)
+        cache.load_frame(paths[1])
+        time.sleep(0.01)
+        cache.load_frame(paths[0])  # Acerto: f0 passa a ser a mais recente
+        time.sleep(0.01)
+        cache.load_frame(paths[2])
+        
+        kept = {entry.name.split('-')[0] for entry in cache._entries()}
+        assert kept == {cache.content_hash(paths[0]), cache.content_hash(paths[2])}
+    
+    def test_invalidate_and_corrupted_entry(self, cache, csv_path):
+        """TESTE 5: invalidate apaga as entradas; entrada corrompida é refeita"""
+        cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')
+        assert len(cache._entries()) == 2
+        
+        for entry in cache._entries():
+            with open(entry.path, 'wb') as f:
+                f.write(b'corrompido')
+        assert len(cache.load_transactions(csv_path, 'Data', 'Valor', 'Descricao')) == 3
+        
+        assert cache.invalidate(csv_path) == 2
+        assert cache._entries() == []
+    
+    def test_pdf_extracted_once(self, cache, tmp_path):
+        """TESTE 6: Extrato em PDF passa pelo PDFProcessor uma vez, com valores com sinal"""
+        from reportlab.pdfgen import canvas
+        from app.core.pdf_processor import PDFProcessor
+        
+        path = str(tmp_path / 'bank_1_20240101.pdf')
+        c = canvas.Canvas(path)
+        c.drawString(100, 750, "10/01/2025 Pagamento Fornecedor  -150,00")
+        c.drawString(100, 730, "11/01/2025 PIX Recebido  +200,50")
+        c.save()
+        
+        with patch.object(PDFProcessor, 'read_pdf', autospec=True,
+                          side_effect=PDFProcessor.read_pdf) as mock_read:
+            first = cache.load_transactions(path, 'Data', 'Valor', 'Descricao')
+            again = cache.load_transactions(path, 'Data', 'Valor', 'Descricao')
+            frame = cache.load_frame(path)
+        
+        assert mock_read.call_count == 1
+        assert again == first
+        assert [(t['date'], t['value'], t['description']) for t in first] == [
+            ('2025-01-10', -150.0, 'Pagamento Fornecedor'),
+            ('2025-01-11', 200.5, 'PIX Recebido')
+        ]
+        assert list(frame.columns) == ['Data', 'Descricao', 'Valor', 'Tipo']
+    
+    def test_entries_hold_no_pickled_objects(self, cache, tmp_path):
+        """
+        TESTE 7: Entradas abrem com allow_pickle=False e devolvem os mesmos
+        valores (texto, nulos, NaN e tipos misturados); entrada com pickle é
+        descartada sem ser carregada
+        """
+        import os
+        import numpy as np
+        import pandas as pd
+        
+        df = pd.DataFrame({
+            'Texto': np.array(['ação', None, float('nan'), ''], dtype=object),
+            'Misto': np.array([1, 'dois', 3.5, True], dtype=object),
+            'Valor': [1.5, 2.0, float('nan'), -4.25],
+            'Qtd': [1, 2, 3, 4]
+        })
+        path = str(tmp_path / 'internal_1_20240101.csv')
+        with open(path, 'w') as f:
+            f.write('x')
+        
+        with patch.object(CSVProcessor, 'read_csv', return_value=df):
+            cache.load_frame(path)
+        loaded = cache.load_frame(path)
+        
+        for entry in cache._entries():
+            with np.load(entry.path, allow_pickle=False) as data:
+                assert all(data[name].dtype != object for name in data.files)
+        pd.testing.assert_frame_equal(loaded, df)
+        assert loaded['Misto'].tolist() == [1, 'dois', 3.5, True]
+        assert loaded['Texto'].tolist()[:2] == ['ação', None]
+        
+        entry = cache._entries()[0].path
+        with open(entry, 'wb') as f:
+            np.savez(f, columns=np.array([object()], dtype=object))
+        with patch.object(CSVProcessor, 'read_csv', return_value=df) as mock_read:
+            pd.testing.assert_frame_equal(cache.load_frame(path), df)
+        assert mock_read.call_count == 1
+        assert os.stat(cache.directory).st_mode & 0o777 == 0o700
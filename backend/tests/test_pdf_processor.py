@@ -287,4 +287,136 @@ class TestIntegration:
         
         # 3. Gerar resumo
         summary = processor.get_summary(df)
-        assert isinstance(summary, dict)
\ No newline at end of file
+        assert isinstance(summary, dict)
+
+# ============================================================================
+# TESTES DA EXTRAÇÃO POR PÁGINA
+# ============================================================================
+
+@pytest.fixture
+def sample_pdf_long():
+    """PDF de 10 páginas; a data da última linha de cada página vale para a próxima"""
+    temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    temp_path = temp_file.name
+    temp_file.close()
+    
+    c = canvas.Canvas(temp_path, pagesize=letter)
+    for page_num in range(10):
+        c.drawString(100, 750, f"Página {page_num + 1}")
+        c.drawString(100, 730, f"Tarifa pacote {page_num}  R$ {page_num},50")
+        c.drawString(100, 710, f"{page_num + 10}/01/2025 PIX {page_num}  R$ 1.{page_num}00,00")
+        c.showPage()
+    c.save()
+    
+    yield temp_path
+    
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+
+
+class TestPageStreaming:
+    """Testes da extração em páginas e em paralelo"""
+    
+    def test_iter_pages_is_generator(self, sample_pdf_long):
+        """TESTE 19: iter_pages gera uma página por vez, na ordem"""
+        pages = PDFProcessor(workers=1).iter_pages(sample_pdf_long)
+        
+        first = next(pages)
+        rest = list(pages)
+        
+        assert "Página 1" in first
+        assert len(rest) == 9
+        assert "Página 10" in rest[-1]
+    
+    def test_parallel_matches_serial(self, sample_pdf_long):
+        """TESTE 20: Extração em processos dá as mesmas páginas da serial"""
+        serial = PDFProcessor(workers=1)
+        parallel = PDFProcessor(workers=2, parallel_min_pages=2)
+        
+        assert list(parallel.iter_pages(sample_pdf_long)) == list(serial.iter_pages(sample_pdf_long))
+        assert parallel.extract_text_from_pdf(sample_pdf_long) == \
+            serial.extract_text_from_pdf(sample_pdf_long)
+    
+    def test_parse_pages_stream(self, processor, sample_pdf_long):
+        """TESTE 21: Páginas consumidas em sequência dão o mesmo que o texto inteiro"""
+        text = processor.extract_text_from_pdf(sample_pdf_long)
+        
+        from_text = processor.parse_bank_statement(text)
+        from_pages = processor.parse_bank_statement(processor.iter_pages(sample_pdf_long))
+        from_pdf = PDFProcessor(workers=2, parallel_min_pages=2).parse_pdf(sample_pdf_long)
+        
+        pd.testing.assert_frame_equal(from_pages, from_text)
+        pd.testing.assert_frame_equal(from_pdf, from_text)
+        # Tarifa do topo da página 2 usa a data do fim da página 1
+        assert ('2025-01-10', 1.5) in set(zip(from_pdf['Data'], from_pdf['Valor']))
+    
+    def test_no_output_and_errors(self, processor, sample_pdf_simple, capsys):
+        """TESTE 22: Nada é impresso; arquivo inexistente e PDF inválido levantam erro"""
+        processor.parse_pdf(sample_pdf_simple)
+        
+        assert capsys.readouterr().out == ""
+        with pytest.raises(FileNotFoundError):
+            processor.parse_pdf('/path/inexistente.pdf')
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as invalid:
+            invalid.write(b"Not a valid PDF")
+            invalid.flush()
+            with pytest.raises(ValueError):
+                processor.parse_pdf(invalid.name)
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_cancel_between_pages(self, sample_pdf_long, workers):
+        """TESTE 25: Token cancelado para a leitura na página seguinte"""
+        from app.core.progress import CancellationToken, OperationCancelled
+        
+        processor = PDFProcessor(workers=workers, parallel_min_pages=2)
+        token = CancellationToken()
+        read = []
+        iter_pages = processor.iter_pages
+        
+        def pages(file_path):
+            for page_text in iter_pages(file_path):
+                read.append(page_text)
+                token.cancel()
+                yield page_text
+        
+        processor.iter_pages = pages
+        with pytest.raises(OperationCancelled):
+            processor.read_pdf(sample_pdf_long, cancel_token=token)
+        
+        assert len(read) == 1
+
+
+# ============================================================================
+# TESTES DO TOKENIZADOR DE LINHAS
+# ============================================================================
+
+class TestLineTokenizer:
+    """Testes do parsing de linhas numa passada só"""
+    
+    def test_tokenize_line(self, processor):
+        """TESTE 23: Primeira data, último valor e descrição sem datas e valores"""
+        line = "10/01/2025 Saldo anterior: 1.000,00   11/01/2025 Débito: -150,00"
+        
+        assert processor._tokenize_line(line) == (
+            '10/01/2025', ' -150,00', 'Saldo anterior: Débito:'
+        )
+        assert processor._tokenize_line(line) == processor._match_line_regex(line)
+    
+    @pytest.mark.parametrize('line', [
+        "ABC 10/01/2025 150,00DEF",
+        "R$ 10/01/2025 150,00 Pagamento",
+        "Compra 10/01/2025,50 loja 20,00",
+        "Tarifa 12.2024/02/29 5,00",
+        "2025-01-10 PIX 150,00- estorno 1,00",
+        "Pagamento Fornecedor    R$ -1.500,00",
+        "BANCO EXEMPLO S.A.",
+    ])
+    def test_same_result_as_regex_search(self, processor, line):
+        """TESTE 24: Mesmo DataFrame da busca padrão a padrão, inclusive em casos ambíguos"""
+        text = "\n".join(["09/01/2025 Saldo inicial  1,00", line, "  Tarifa avulsa  2,50"])
+        
+        assert processor._tokenize_line(line) == processor._match_line_regex(line)
+        pd.testing.assert_frame_equal(
+            processor.parse_bank_statement(text),
+            processor._parse_bank_statement_regex(text)
+        )
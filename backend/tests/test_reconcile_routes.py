@@ -4,13 +4,19 @@ Cobertura: Validações, Autenticação, Processamento e Erros
 
 """
 import pytest
+import json
 import os
+import threading
+import time
 from unittest.mock import Mock, patch, MagicMock
 from fastapi.testclient import TestClient
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from app.main import app
 from app.core.deps import get_current_user, get_db
+from app.api.routes import reconcile as reconcile_routes
+from app.core.progress import OperationCancelled
+from app.models.reconciliation import Reconciliation
 
 # Cliente de teste
 client = TestClient(app)
@@ -49,15 +55,30 @@ def override_get_current_user(mock_current_user):
 
 @pytest.fixture
 def override_get_db(mock_db):
-    """Override da dependência de banco de dados"""
+    """Override da dependência de banco de dados (e da sessão dos jobs)"""
     def _get_db_override():
         yield mock_db
     
     app.dependency_overrides[get_db] = _get_db_override
-    yield
+    with patch("app.api.routes.reconcile.SessionLocal", return_value=mock_db):
+        yield
     app.dependency_overrides.clear()
 
 
+def _reconcile(payload, headers=None):
+    """
+    POST /reconcile e, se o job foi aceito, espera terminar e retorna
+    GET /reconcile/jobs/{job_id}
+    """
+    response = client.post("/api/reconcile", json=payload, headers=headers)
+    if response.status_code != 202:
+        return response
+    
+    job_id = response.json()["job_id"]
+    reconcile_routes.job_queue.wait(job_id, timeout=10)
+    return client.get(f"/api/reconcile/jobs/{job_id}")
+
+
 @pytest.fixture
 def valid_reconcile_request():
     """Payload válido para conciliação"""
@@ -147,7 +168,7 @@ class TestReconcileValidations:
         }
         
         # Act
-        response = client.post("/api/reconcile", json=payload)
+        response = _reconcile(payload)
         
         # Assert
         assert response.status_code == 422  # Validation error
@@ -165,7 +186,7 @@ class TestReconcileValidations:
         }
         
         # Act
-        response = client.post("/api/reconcile", json=payload)
+        response = _reconcile(payload)
         
         # Assert
         assert response.status_code == 422
@@ -182,7 +203,7 @@ class TestReconcileValidations:
         }
         
         # Act
-        response = client.post("/api/reconcile", json=payload)
+        response = _reconcile(payload)
         
         # Assert
         assert response.status_code == 422
@@ -200,8 +221,7 @@ class TestReconcileValidations:
         valid_reconcile_request["similarity_threshold"] = 0.85
         
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=[]), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
@@ -215,7 +235,7 @@ class TestReconcileValidations:
             }
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 200
@@ -239,7 +259,7 @@ class TestReconcileAuthentication:
         Requisito: RNF02 - Segurança
         """
         # Act
-        response = client.post("/api/reconcile", json=valid_reconcile_request)
+        response = _reconcile(valid_reconcile_request)
         
         # Assert
         assert response.status_code == 401
@@ -254,7 +274,7 @@ class TestReconcileAuthentication:
         headers = {"Authorization": "Bearer invalid-token-123"}
         
         # Act
-        response = client.post("/api/reconcile", json=valid_reconcile_request, headers=headers)
+        response = _reconcile(valid_reconcile_request, headers=headers)
         
         # Assert
         assert response.status_code == 401
@@ -277,7 +297,7 @@ class TestReconcileFileValidation:
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=False):
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 404
@@ -292,8 +312,7 @@ class TestReconcileFileValidation:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists") as mock_exists, \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=[]), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_exists.return_value = True
@@ -308,7 +327,7 @@ class TestReconcileFileValidation:
             }
             
             # Act
-            client.post("/api/reconcile", json=valid_reconcile_request)
+            _reconcile(valid_reconcile_request)
             
             # Assert
             assert mock_exists.call_count >= 2
@@ -334,19 +353,19 @@ class TestReconcileProcessing:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.return_value = mock_reconciliation_result
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 200
-            result = response.json()
+            assert response.json()["status"] == "completed"
+            result = response.json()["result"]
             assert "reconciliation_id" in result
             assert "summary" in result
             assert result["summary"]["matched_count"] == 1
@@ -362,15 +381,14 @@ class TestReconcileProcessing:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.return_value = mock_reconciliation_result
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 200
@@ -393,19 +411,18 @@ class TestReconcileProcessing:
         mock_db.refresh.side_effect = mock_refresh
         
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.return_value = mock_reconciliation_result
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 200
-            result = response.json()
+            result = response.json()["result"]
             
             assert "reconciliation_id" in result
             assert "summary" in result
@@ -435,14 +452,14 @@ class TestReconcileErrorHandling:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv", side_effect=Exception("CSV corrupto")):
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", side_effect=Exception("CSV corrupto")):
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
-            assert response.status_code == 500
-            assert "erro na conciliação" in response.json()["detail"].lower()
+            assert response.json()["status"] == "failed"
+            assert "erro na conciliação" in response.json()["error"].lower()
     
     def test_reconcile_handles_processor_error(
         self, override_get_current_user, override_get_db,
@@ -454,18 +471,17 @@ class TestReconcileErrorHandling:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.side_effect = Exception("Erro no algoritmo")
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
-            assert response.status_code == 500
+            assert response.json()["status"] == "failed"
     
     def test_reconcile_handles_database_error(
         self, override_get_current_user, override_get_db, mock_db,
@@ -479,18 +495,17 @@ class TestReconcileErrorHandling:
         mock_db.commit.side_effect = Exception("Database connection lost")
         
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.return_value = mock_reconciliation_result
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
-            assert response.status_code == 500
+            assert response.json()["status"] == "failed"
 
 
 # ============================================================================
@@ -510,8 +525,7 @@ class TestReconcileIntegration:
         """
         # Arrange
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe") as mock_process, \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions") as mock_process, \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_process.return_value = mock_csv_data
@@ -526,7 +540,7 @@ class TestReconcileIntegration:
             }
             
             # Act
-            client.post("/api/reconcile", json=valid_reconcile_request)
+            _reconcile(valid_reconcile_request)
             
             # Assert
             assert mock_process.call_count == 2
@@ -548,18 +562,364 @@ class TestReconcileIntegration:
         mock_current_user.id = 42
         
         with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
-             patch("app.api.routes.reconcile.CSVProcessor.read_csv"), \
-             patch("app.api.routes.reconcile.CSVProcessor.process_dataframe", return_value=mock_csv_data), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data), \
              patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
             
             mock_processor = MockProcessor.return_value
             mock_processor.reconcile.return_value = mock_reconciliation_result
             
             # Act
-            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            response = _reconcile(valid_reconcile_request)
             
             # Assert
             assert response.status_code == 200
             added_obj = mock_db.add.call_args_list[0][0][0]
             assert hasattr(added_obj, 'user_id')
-            assert added_obj.user_id == 42
\ No newline at end of file
+            assert added_obj.user_id == 42
+
+# ============================================================================
+# SUITE 5: CONCILIAÇÃO INCREMENTAL (/reconcile/{id}/append)
+# ============================================================================
+
+class TestReconcileAppend:
+    """Testes do endpoint de adição de transações"""
+    
+    @pytest.fixture
+    def append_request(self):
+        return {
+            "bank_file": "bank_day2.csv",
+            "bank_mapping": {"date_col": "Data", "value_col": "Valor", "desc_col": "Descrição"}
+        }
+    
+    def test_append_reconciliation_not_found(
+        self, override_get_current_user, override_get_db, mock_db, append_request
+    ):
+        """TESTE 17: Conciliação de outro usuário ou inexistente retorna 404"""
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        
+        response = client.post("/api/reconcile/99/append", json=append_request)
+        
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Conciliação não encontrada"
+    
+    def test_append_requires_a_file(self, override_get_current_user, override_get_db):
+        """TESTE 18: Sem arquivos novos retorna 400"""
+        response = client.post("/api/reconcile/1/append", json={})
+        
+        assert response.status_code == 400
+    
+    def test_append_requires_mapping(self, override_get_current_user, override_get_db):
+        """TESTE 19: Arquivo sem mapeamento de colunas retorna 400"""
+        response = client.post("/api/reconcile/1/append", json={"internal_file": "x.csv"})
+        
+        assert response.status_code == 400
+    
+    def test_append_processes_only_new_rows(
+        self, override_get_current_user, override_get_db, mock_db,
+        append_request, mock_csv_data
+    ):
+        """TESTE 20: Só o arquivo novo é lido e o serviço recebe as novas"""
+        reconciliation = Mock()
+        reconciliation.id = 7
+        mock_db.query.return_value.filter.return_value.first.return_value = reconciliation
+        append_result = {
+            'matched': [], 'bank_only': mock_csv_data, 'internal_only': [],
+            'summary': {'new_bank_transactions': 1, 'matched_count': 0}
+        }
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=mock_csv_data) as mock_load, \
+             patch("app.api.routes.reconcile.ReconciliationService.append_to_reconciliation",
+                   return_value=append_result) as mock_append:
+            
+            response = client.post("/api/reconcile/7/append", json=append_request)
+        
+        assert response.status_code == 200
+        assert response.json()["reconciliation_id"] == 7
+        assert response.json()["summary"]["new_bank_transactions"] == 1
+        mock_load.assert_called_once_with(
+            os.path.join("/tmp/lm-conciliation-uploads", "bank_day2.csv"), "Data", "Valor", "Descrição"
+        )
+        args = mock_append.call_args[0]
+        assert args[1] is reconciliation
+        assert args[2] == mock_csv_data
+        assert args[3] == []
+    
+    def test_append_to_reconciliation_before_transactions_table(
+        self, override_get_current_user, tmp_path
+    ):
+        """
+        TESTE 30: Append numa conciliação anterior à tabela de transações salva
+        antes as pendentes antigas (a partir dos uploads), que conciliam com as
+        novas e continuam pendentes se não conciliarem
+        """
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from app.core.database import Base
+        from app.models.reconciliation import Reconciliation
+        from app.services.reconciliation_service import ReconciliationService
+        
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        
+        (tmp_path / "bank_1_old.csv").write_text("Data,Valor,Descricao\n2024-11-01,100.00,pix cliente\n")
+        (tmp_path / "internal_1_old.csv").write_text("Data,Valor,Descricao\n2024-11-05,40.00,tarifa\n")
+        (tmp_path / "internal_1_new.csv").write_text("Data,Valor,Descricao\n2024-11-01,100.00,pix cliente\n")
+        reconciliation = Reconciliation(
+            user_id=1, bank_file_name="bank_1_old.csv", internal_file_name="internal_1_old.csv",
+            total_bank_transactions=1, total_internal_transactions=1, matched_count=0,
+            bank_only_count=1, internal_only_count=1, match_rate=0.0
+        )
+        db.add(reconciliation)
+        db.commit()
+        
+        def _get_db_override():
+            yield db
+        
+        app.dependency_overrides[get_db] = _get_db_override
+        try:
+            with patch("app.api.routes.reconcile.UPLOAD_DIR", str(tmp_path)):
+                response = client.post(f"/api/reconcile/{reconciliation.id}/append", json={
+                    "internal_file": "internal_1_new.csv",
+                    "internal_mapping": {"date_col": "Data", "value_col": "Valor", "desc_col": "Descricao"}
+                })
+            
+            assert response.status_code == 200
+            assert response.json()["summary"]["matched_count"] == 1
+            
+            pending = ReconciliationService.get_pending_transactions(db, reconciliation.id)
+            assert pending['bank'] == []
+            assert [t['description'] for t in pending['internal']] == ['tarifa']
+        finally:
+            db.close()
+            engine.dispose()
+
+
+# ============================================================================
+# SUITE 6: JOBS EM SEGUNDO PLANO
+# ============================================================================
+
+class TestReconcileJobs:
+    """Testes da conciliação em segundo plano"""
+    
+    def test_reconcile_returns_job_immediately(
+        self, override_get_current_user, override_get_db, valid_reconcile_request
+    ):
+        """TESTE 21: POST responde 202 com o id do job, sem esperar o motor"""
+        release = threading.Event()
+        
+        def slow_read(*args, **kwargs):
+            release.wait(5)
+            raise Exception("interrompido")
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", side_effect=slow_read):
+            response = client.post("/api/reconcile", json=valid_reconcile_request)
+            
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            assert response.json()["status"] in ("queued", "running")
+            
+            status_response = client.get(f"/api/reconcile/jobs/{job_id}")
+            assert status_response.json()["status"] in ("queued", "running")
+            assert status_response.json()["result"] is None
+            
+            release.set()
+            reconcile_routes.job_queue.wait(job_id, timeout=5)
+    
+    def test_job_not_found(self, override_get_current_user):
+        """TESTE 22: Job inexistente retorna 404"""
+        response = client.get("/api/reconcile/jobs/inexistente")
+        
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Job não encontrado"
+    
+    def test_job_of_other_user_not_visible(self, override_get_current_user):
+        """TESTE 23: Job de outro usuário retorna 404"""
+        job = reconcile_routes.job_queue.submit(999, 'reconcile', lambda: {})
+        
+        response = client.get(f"/api/reconcile/jobs/{job.id}")
+        
+        assert response.status_code == 404
+    
+    def test_job_events_stream_progress_and_result(
+        self, override_get_current_user, override_get_db, valid_reconcile_request
+    ):
+        """TESTE 24: SSE emite o progresso do motor e termina com o estado final"""
+        bank = [{'id': 0, 'date': '2024-01-15', 'value': 100.0, 'description': 'Pagamento A'}]
+        internal = [{'id': 0, 'date': '2024-01-15', 'value': 100.0, 'description': 'Pagamento A'}]
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", side_effect=[bank, internal]), \
+             patch("app.api.routes.reconcile.ReconciliationService.save_transactions"):
+            job_id = client.post("/api/reconcile", json=valid_reconcile_request).json()["job_id"]
+            reconcile_routes.job_queue.wait(job_id, timeout=10)
+            
+            token = client.post(f"/api/reconcile/jobs/{job_id}/events-token").json()["token"]
+            response = client.get(f"/api/reconcile/jobs/{job_id}/events", params={"token": token})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in response.text.strip().split("\n\n")
+        ]
+        assert events[0] == ("progress", {'stage': 'done', 'processed': 1, 'total': 1, 'matched': 1})
+        assert events[-1][0] == "completed"
+        assert events[-1][1]["result"]["summary"]["matched_count"] == 1
+    
+    def test_job_events_not_found(self, override_get_current_user):
+        """TESTE 25: Token do SSE de job inexistente retorna 404"""
+        response = client.post("/api/reconcile/jobs/inexistente/events-token")
+        
+        assert response.status_code == 404
+    
+    def test_cancel_running_job(
+        self, override_get_current_user, override_get_db, valid_reconcile_request
+    ):
+        """TESTE 26: DELETE para o job em execução, sem salvar a conciliação"""
+        started = threading.Event()
+        
+        def slow_reconcile(bank, internal, cancel_token=None, **kwargs):
+            started.set()
+            while not cancel_token.cancelled:
+                time.sleep(0.01)
+            raise OperationCancelled()
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
+             patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
+            MockProcessor.return_value.reconcile.side_effect = slow_reconcile
+            
+            job_id = client.post("/api/reconcile", json=valid_reconcile_request).json()["job_id"]
+            started.wait(5)
+            
+            response = client.delete(f"/api/reconcile/jobs/{job_id}")
+            assert response.status_code == 202
+            
+            reconcile_routes.job_queue.wait(job_id, timeout=5)
+        
+        job = client.get(f"/api/reconcile/jobs/{job_id}").json()
+        assert job["status"] == "cancelled"
+        assert job["result"] is None
+        
+        response = client.delete(f"/api/reconcile/jobs/{job_id}")
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Job já terminado"
+    
+    def test_cancel_while_loading_files(
+        self, override_get_current_user, override_get_db, valid_reconcile_request
+    ):
+        """TESTE 28: DELETE durante a leitura do primeiro arquivo não lê o segundo"""
+        started = threading.Event()
+        loaded = []
+        
+        def slow_load(path, *args, cancel_token=None):
+            loaded.append(path)
+            started.set()
+            while not cancel_token.cancelled:
+                time.sleep(0.01)
+            return []
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", side_effect=slow_load), \
+             patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
+            job_id = client.post("/api/reconcile", json=valid_reconcile_request).json()["job_id"]
+            started.wait(5)
+            
+            assert client.delete(f"/api/reconcile/jobs/{job_id}").status_code == 202
+            reconcile_routes.job_queue.wait(job_id, timeout=5)
+        
+        assert client.get(f"/api/reconcile/jobs/{job_id}").json()["status"] == "cancelled"
+        assert len(loaded) == 1
+        MockProcessor.assert_not_called()
+    
+    def test_time_budget_reaches_engine(
+        self, override_get_current_user, override_get_db, valid_reconcile_request,
+        mock_reconciliation_result
+    ):
+        """TESTE 27: time_budget do request (ou o padrão) chega ao motor"""
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
+             patch("app.api.routes.reconcile.ReconciliationService.save_transactions"), \
+             patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
+            MockProcessor.return_value.reconcile.return_value = mock_reconciliation_result
+            
+            _reconcile(dict(valid_reconcile_request, time_budget=30))
+            _reconcile(valid_reconcile_request)
+        
+        budgets = [call.kwargs["time_budget"] for call in MockProcessor.return_value.reconcile.call_args_list]
+        assert budgets == [30, 0]
+    
+    def test_job_events_token_scoped_to_job(
+        self, override_get_current_user, override_get_db, valid_reconcile_request,
+        mock_reconciliation_result
+    ):
+        """
+        TESTE 29: O stream exige o token do próprio job (o EventSource não manda
+        o header Authorization) e esse token não serve para as outras rotas
+        """
+        from app.core.security import create_access_token
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
+             patch("app.api.routes.reconcile.ReconciliationService.save_transactions"), \
+             patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
+            MockProcessor.return_value.reconcile.return_value = mock_reconciliation_result
+            job_id = client.post("/api/reconcile", json=valid_reconcile_request).json()["job_id"]
+            other_id = client.post("/api/reconcile", json=valid_reconcile_request).json()["job_id"]
+            reconcile_routes.job_queue.wait(job_id, timeout=10)
+            reconcile_routes.job_queue.wait(other_id, timeout=10)
+        
+        issued = client.post(f"/api/reconcile/jobs/{job_id}/events-token").json()
+        token = issued["token"]
+        expired = create_access_token(
+            data={"sub": "test@example.com", "type": "job_events", "job_id": job_id, "user_id": 1},
+            expires_delta=timedelta(seconds=-1)
+        )
+        login_token = create_access_token(data={"sub": "test@example.com"})
+        
+        def stream(target, token=None):
+            params = {"token": token} if token else {}
+            return client.get(f"/api/reconcile/jobs/{target}/events", params=params).status_code
+        
+        assert issued["expires_in"] > 0
+        assert stream(job_id, token) == 200
+        assert stream(job_id) == 422
+        assert stream(other_id, token) == 401
+        assert stream(job_id, expired) == 401
+        assert stream(job_id, login_token) == 401
+        
+        app.dependency_overrides.pop(get_current_user)
+        response = client.get(
+            f"/api/reconcile/jobs/{job_id}", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 401
+    
+    def test_partial_result_saved_as_incomplete(
+        self, override_get_current_user, override_get_db, mock_db, valid_reconcile_request,
+        mock_reconciliation_result
+    ):
+        """TESTE 31: Resultado parcial (orçamento esgotado) é salvo marcado como incompleto"""
+        partial = dict(mock_reconciliation_result)
+        partial['summary'] = dict(mock_reconciliation_result['summary'], complete=False)
+        
+        with patch("app.api.routes.reconcile.os.path.exists", return_value=True), \
+             patch("app.api.routes.reconcile.parsed_cache.load_transactions", return_value=[]), \
+             patch("app.api.routes.reconcile.ReconciliationService.save_transactions"), \
+             patch("app.api.routes.reconcile.ReconciliationProcessor") as MockProcessor:
+            MockProcessor.return_value.reconcile.side_effect = [partial, mock_reconciliation_result]
+            
+            assert _reconcile(valid_reconcile_request).json()["result"]["summary"]["complete"] is False
+            _reconcile(valid_reconcile_request)
+        
+        saved = [
+            call.args[0] for call in mock_db.add.call_args_list
+            if isinstance(call.args[0], Reconciliation)
+        ]
+        assert [reconciliation.is_complete for reconciliation in saved] == [False, True]
@@ -5,7 +5,11 @@ Requisito: RF03 - Conciliação automática com fuzzy matching
 Requisito: RNF09 - TDD demonstrado no core business
 """
 import pytest
-from datetime import datetime
+import random
+import numpy as np
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from app.core.progress import CancellationToken, OperationCancelled
 from app.core.reconciliation_processor import ReconciliationProcessor
 
 
@@ -521,4 +525,803 @@ class TestReconciliationProcessorEdgeCases:
         
         # Apenas 1 match (primeiro banco com único interno)
         assert len(result['matched']) == 1
-        assert len(result['bank_only']) == 1
\ No newline at end of file
+        assert len(result['bank_only']) == 1
+
+
+# ============================================================================
+# MODO INDEXADO
+# ============================================================================
+
+def _random_transactions(seed, count, negative_ratio=0.1, bad_date_ratio=0.02):
+    """Gera transações sintéticas com colisões de data/valor frequentes"""
+    rng = random.Random(seed)
+    words = ['pix', 'ted', 'boleto', 'fornecedor', 'aluguel', 'energia', 'nota', 'cliente']
+    start = datetime(2024, 11, 1)
+    transactions = []
+    
+    for idx in range(count):
+        value = round(rng.choice([50, 100, 150.5, 200]) * rng.uniform(0.97, 1.03), 2)
+        if rng.random() < negative_ratio:
+            value = -value
+        if rng.random() < 0.03:
+            value = 0.0
+        
+        date = (start + timedelta(days=rng.randint(0, 10))).strftime('%Y-%m-%d')
+        if rng.random() < bad_date_ratio:
+            date = rng.choice(['31/11/2024', '', None])
+        
+        transactions.append({
+            'id': idx,
+            'date': date,
+            'value': value,
+            'description': ' '.join(rng.sample(words, 3))
+        })
+    
+    return transactions
+
+
+class TestIndexedStrategy:
+    """Testes do modo indexado (paridade com o laço aninhado)"""
+    
+    def test_default_strategy_is_indexed(self):
+        """TESTE 30: Modo indexado é o padrão"""
+        assert ReconciliationProcessor().strategy == 'indexed'
+    
+    def test_invalid_strategy_raises(self):
+        """TESTE 31: Estratégia desconhecida deve gerar erro"""
+        with pytest.raises(ValueError):
+            ReconciliationProcessor(strategy='quantum')
+    
+    @pytest.mark.parametrize('seed', range(5))
+    @pytest.mark.parametrize('params', [
+        {},
+        {'date_tolerance': 0, 'value_tolerance': 0.0, 'similarity_threshold': 0.6},
+        {'date_tolerance': 3, 'value_tolerance': 0.05, 'similarity_threshold': 0.5},
+        {'date_tolerance': 2, 'value_tolerance': 1.5, 'similarity_threshold': 0.4},
+    ])
+    def test_indexed_matches_loop(self, seed, params):
+        """TESTE 32: Modo indexado retorna exatamente o mesmo resultado do laço"""
+        bank = _random_transactions(seed, 120)
+        internal = _random_transactions(seed + 100, 140)
+        
+        loop = ReconciliationProcessor(strategy='loop', **params).reconcile(bank, internal)
+        indexed = ReconciliationProcessor(strategy='indexed', **params).reconcile(bank, internal)
+        
+        assert indexed == loop
+    
+    def test_indexed_keeps_file_order_on_ties(self):
+        """TESTE 33: Em empate de confiança vence o primeiro interno do arquivo"""
+        bank = [{'id': 0, 'date': '2024-11-02', 'value': 100.0, 'description': 'Pag A'}]
+        internal = [
+            {'id': 0, 'date': '2024-11-03', 'value': 100.0, 'description': 'Pag A'},
+            {'id': 1, 'date': '2024-11-01', 'value': 100.0, 'description': 'Pag A'}
+        ]
+        
+        result = ReconciliationProcessor(strategy='indexed').reconcile(bank, internal)
+        
+        assert result['matched'][0]['internal_transaction']['id'] == 0
+    
+    def test_indexed_negative_values_follow_loop(self):
+        """TESTE 34: Valores negativos seguem a mesma regra do laço"""
+        bank = [{'id': 0, 'date': '2024-11-01', 'value': -100.0, 'description': 'Tarifa'}]
+        internal = [{'id': 0, 'date': '2024-11-01', 'value': -180.0, 'description': 'Tarifa'}]
+        
+        loop = ReconciliationProcessor(strategy='loop').reconcile(bank, internal)
+        indexed = ReconciliationProcessor(strategy='indexed').reconcile(bank, internal)
+        
+        assert indexed == loop
+
+
+# ============================================================================
+# PREPARAÇÃO DE DATAS
+# ============================================================================
+
+class TestDatePreparation:
+    """Testes da etapa de preparação (datas convertidas uma única vez)"""
+    
+    def test_prepare_ordinals_flags_invalid_dates(self, processor):
+        """TESTE 35: Datas inválidas viram None"""
+        data = [
+            {'date': '2024-11-01'},
+            {'date': '01/11/2024'},
+            {'date': None},
+            {'date': '2024-11-02'}
+        ]
+        
+        ordinals = processor._prepare_ordinals(data)
+        
+        assert ordinals[0] == datetime(2024, 11, 1).toordinal()
+        assert ordinals[1] is None
+        assert ordinals[2] is None
+        assert ordinals[3] == ordinals[0] + 1
+    
+    @pytest.mark.parametrize('strategy', ['loop', 'indexed'])
+    def test_each_distinct_date_parsed_once(self, strategy):
+        """TESTE 36: Cada data distinta é convertida uma vez por lado"""
+        processor = ReconciliationProcessor(strategy=strategy)
+        bank = [
+            {'id': i, 'date': f'2024-11-0{1 + i % 3}', 'value': 100.0 + i, 'description': 'Pag'}
+            for i in range(30)
+        ]
+        internal = [dict(t) for t in bank]
+        
+        with patch.object(processor, '_parse_date', wraps=processor._parse_date) as mock_parse:
+            result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matched_count'] == 30
+        assert mock_parse.call_count == 6
+    
+    def test_dates_match_invalid_date_still_false(self, processor):
+        """TESTE 37: Datas inválidas continuam não casando"""
+        assert processor._dates_match('2024-11-01', 'invalid') is False
+        assert processor._dates_match(None, '2024-11-01') is False
+
+
+# ============================================================================
+# PASSADA EXATA (HASH JOIN)
+# ============================================================================
+
+class TestExactPass:
+    """Testes da primeira passada por (data, valor em centavos)"""
+    
+    def test_unique_key_matched_in_exact_pass(self, processor):
+        """TESTE 38: Chave única dos dois lados concilia na passada exata"""
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pagamento A'},
+            {'id': 1, 'date': '2024-11-02', 'value': 200.00, 'description': 'Pagamento B'}
+        ]
+        internal = [
+            {'id': 0, 'date': '2024-11-02', 'value': 201.00, 'description': 'Pagamento B'},
+            {'id': 1, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pagamento A'}
+        ]
+        
+        result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matched_count'] == 2
+        assert result['summary']['matches_by_pass'] == {'exact': 1, 'fuzzy': 1, 'aggregate': 0}
+        # Matches continuam na ordem do arquivo bancário
+        assert [m['bank_transaction']['id'] for m in result['matched']] == [0, 1]
+    
+    def test_duplicate_keys_go_to_fuzzy_pass(self, processor):
+        """TESTE 39: Chaves repetidas ficam para a busca com tolerância"""
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag A'},
+            {'id': 1, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag B'}
+        ]
+        internal = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag B'},
+            {'id': 1, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag A'}
+        ]
+        
+        result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass'] == {'exact': 0, 'fuzzy': 2, 'aggregate': 0}
+        pairs = {(m['bank_transaction']['id'], m['internal_transaction']['id']) for m in result['matched']}
+        assert pairs == {(0, 1), (1, 0)}
+    
+    def test_exact_pass_respects_threshold(self):
+        """TESTE 40: Par exato abaixo do threshold não é aceito"""
+        processor = ReconciliationProcessor(similarity_threshold=0.9)
+        bank = [{'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Aluguel'}]
+        internal = [{'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Energia'}]
+        
+        result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matched_count'] == 0
+        assert result['summary']['matches_by_pass'] == {'exact': 0, 'fuzzy': 0, 'aggregate': 0}
+    
+    def test_exact_first_disabled(self):
+        """TESTE 41: Sem passada exata tudo passa pela busca com tolerância"""
+        processor = ReconciliationProcessor(exact_first=False)
+        bank = [{'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag A'}]
+        internal = [{'id': 0, 'date': '2024-11-01', 'value': 100.00, 'description': 'Pag A'}]
+        
+        result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass'] == {'exact': 0, 'fuzzy': 1, 'aggregate': 0}
+    
+    def test_exact_pass_ignores_zero_and_invalid_dates(self, processor):
+        """TESTE 42: Valores zero e datas inválidas não entram no hash join"""
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 0.0, 'description': 'Zero'},
+            {'id': 1, 'date': 'invalid', 'value': 50.0, 'description': 'Data ruim'}
+        ]
+        internal = [
+            {'id': 0, 'date': '2024-11-01', 'value': 0.0, 'description': 'Zero'},
+            {'id': 1, 'date': 'invalid', 'value': 50.0, 'description': 'Data ruim'}
+        ]
+        
+        result = processor.reconcile(bank, internal)
+        
+        assert result['summary']['matched_count'] == 0
+
+
+# ============================================================================
+# ATRIBUIÇÃO ÓTIMA
+# ============================================================================
+
+class TestOptimalAssignment:
+    """Testes da atribuição ótima (máxima soma de confiança)"""
+    
+    def test_optimal_recovers_match_lost_by_greedy(self):
+        """TESTE 43: Escolha gulosa ruim no início não bloqueia outro banco"""
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'alpha beta'},
+            {'id': 1, 'date': '2024-11-01', 'value': 98.5, 'description': 'alpha beta'}
+        ]
+        internal = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'alpha beta'},
+            {'id': 1, 'date': '2024-11-01', 'value': 101.0, 'description': 'alpha beta'}
+        ]
+        
+        greedy = ReconciliationProcessor(exact_first=False).reconcile(bank, internal)
+        optimal = ReconciliationProcessor(
+            exact_first=False, assignment='optimal'
+        ).reconcile(bank, internal)
+        
+        assert greedy['summary']['matched_count'] == 1
+        assert optimal['summary']['matched_count'] == 2
+        pairs = {(m['bank_transaction']['id'], m['internal_transaction']['id']) for m in optimal['matched']}
+        assert pairs == {(0, 1), (1, 0)}
+    
+    @pytest.mark.parametrize('seed', range(3))
+    def test_optimal_is_one_to_one_and_not_worse(self, seed):
+        """TESTE 44: Atribuição ótima é um para um e soma pelo menos o guloso"""
+        bank = _random_transactions(seed, 150)
+        internal = _random_transactions(seed + 50, 150)
+        
+        greedy = ReconciliationProcessor(
+            similarity_threshold=0.5, aggregate_max_group=0
+        ).reconcile(bank, internal)
+        optimal = ReconciliationProcessor(
+            similarity_threshold=0.5, assignment='optimal', aggregate_max_group=0
+        ).reconcile(bank, internal)
+        
+        internal_ids = [m['internal_transaction']['id'] for m in optimal['matched']]
+        assert len(internal_ids) == len(set(internal_ids))
+        assert all(m['confidence'] >= 0.5 for m in optimal['matched'])
+        assert (
+            sum(m['confidence'] for m in optimal['matched']) >=
+            sum(m['confidence'] for m in greedy['matched']) - 1e-9
+        )
+        summary = optimal['summary']
+        assert summary['matched_count'] + summary['bank_only_count'] == 150
+        assert summary['matched_count'] + summary['internal_only_count'] == 150
+    
+    def test_optimal_requires_indexed_strategy(self):
+        """TESTE 45: Atribuição ótima não existe no laço aninhado"""
+        with pytest.raises(ValueError):
+            ReconciliationProcessor(strategy='loop', assignment='optimal')
+    
+    def test_invalid_assignment_raises(self):
+        """TESTE 46: Atribuição desconhecida deve gerar erro"""
+        with pytest.raises(ValueError):
+            ReconciliationProcessor(assignment='random')
+
+
+class TestParallelShards:
+    """Testes da conciliação dividida em faixas de datas entre processos"""
+    
+    @pytest.mark.parametrize('seed', range(2))
+    @pytest.mark.parametrize('assignment', ['greedy', 'optimal'])
+    def test_parallel_matches_serial(self, seed, assignment):
+        """TESTE 47: Resultado com processos é idêntico ao serial"""
+        bank = _random_transactions(seed, 300)
+        internal = _random_transactions(seed + 100, 300)
+        params = {'similarity_threshold': 0.5, 'date_tolerance': 2, 'assignment': assignment}
+        
+        serial = ReconciliationProcessor(workers=1, **params).reconcile(bank, internal)
+        parallel = ReconciliationProcessor(
+            workers=2, parallel_min_rows=0, **params
+        ).reconcile(bank, internal)
+        
+        assert parallel == serial
+    
+    def test_shards_cover_each_bank_once(self):
+        """TESTE 48: Cada banco cai em uma faixa, com internas da sobreposição"""
+        processor = ReconciliationProcessor(workers=3, date_tolerance=1)
+        bank = _random_transactions(7, 200)
+        internal = _random_transactions(8, 200)
+        bank_ordinals = processor._prepare_ordinals(bank)
+        internal_ordinals = processor._prepare_ordinals(internal)
+        
+        shards = processor._date_shards(bank_ordinals, internal_ordinals)
+        
+        assert 1 < len(shards) <= 6
+        covered = np.concatenate([bank_positions for bank_positions, _ in shards])
+        valid = [pos for pos, ordinal in enumerate(bank_ordinals) if ordinal is not None]
+        assert sorted(covered.tolist()) == valid
+        
+        for bank_positions, internal_positions in shards:
+            first = min(bank_ordinals[pos] for pos in bank_positions)
+            last = max(bank_ordinals[pos] for pos in bank_positions)
+            expected = [
+                pos for pos, ordinal in enumerate(internal_ordinals)
+                if ordinal is not None and first - 1 <= ordinal <= last + 1
+            ]
+            assert internal_positions.tolist() == expected
+    
+    def test_small_input_stays_serial(self):
+        """TESTE 49: Abaixo do mínimo de linhas não abre processos"""
+        bank = _random_transactions(1, 20)
+        internal = _random_transactions(2, 20)
+        processor = ReconciliationProcessor(workers=4, parallel_min_rows=1000)
+        
+        with patch('app.core.reconciliation_processor.ProcessPoolExecutor') as executor:
+            processor.reconcile(bank, internal)
+        
+        executor.assert_not_called()
+    
+    def test_pool_uses_spawn(self):
+        """TESTE 72: O pool de processos não usa fork (o servidor tem threads)"""
+        from concurrent.futures import ProcessPoolExecutor
+        
+        bank = _random_transactions(1, 60)
+        internal = _random_transactions(2, 60)
+        processor = ReconciliationProcessor(workers=2, parallel_min_rows=0)
+        
+        with patch(
+            'app.core.reconciliation_processor.ProcessPoolExecutor', wraps=ProcessPoolExecutor
+        ) as executor:
+            processor.reconcile(bank, internal)
+        
+        assert executor.call_args.kwargs['mp_context'].get_start_method() == 'spawn'
+
+
+class TestStreamingReconciliation:
+    """Testes da conciliação em fluxo (merge join por data)"""
+    
+    @staticmethod
+    def _sorted(transactions):
+        """Ordena por data, descartando as datas inválidas"""
+        return sorted(
+            (trans for trans in transactions
+             if ReconciliationProcessor()._date_ordinal(trans['date']) is not None),
+            key=lambda trans: trans['date']
+        )
+    
+    @staticmethod
+    def _collect(events):
+        result = {'matched': [], 'bank_only': [], 'internal_only': [], 'summary': None}
+        for event in events:
+            if event['type'] == 'summary':
+                result['summary'] = event['summary']
+            elif event['type'] == 'matched':
+                result['matched'].append((
+                    event['bank_transaction']['id'],
+                    event['internal_transaction']['id'],
+                    event['confidence']
+                ))
+            else:
+                result[event['type']].append(event['transaction']['id'])
+        return result
+    
+    @pytest.mark.parametrize('seed', range(3))
+    @pytest.mark.parametrize('date_tolerance', [0, 1, 3])
+    def test_stream_matches_batch(self, seed, date_tolerance):
+        """TESTE 50: Fluxo ordenado concilia igual ao lote sem passada exata"""
+        bank = self._sorted(_random_transactions(seed, 250))
+        internal = self._sorted(_random_transactions(seed + 100, 250))
+        processor = ReconciliationProcessor(
+            date_tolerance=date_tolerance, similarity_threshold=0.5, exact_first=False,
+            aggregate_max_group=0
+        )
+        
+        batch = processor.reconcile(bank, internal)
+        stream = self._collect(processor.reconcile_stream(iter(bank), iter(internal)))
+        
+        assert sorted(stream['matched']) == sorted(
+            (m['bank_transaction']['id'], m['internal_transaction']['id'], m['confidence'])
+            for m in batch['matched']
+        )
+        assert sorted(stream['bank_only']) == sorted(t['id'] for t in batch['bank_only'])
+        assert sorted(stream['internal_only']) == sorted(t['id'] for t in batch['internal_only'])
+        summary = dict(batch['summary'], matches_by_pass={'exact': 0, 'fuzzy': batch['summary']['matched_count'], 'aggregate': 0})
+        assert stream['summary'] == summary
+    
+    def test_stream_invalid_dates_are_unmatched(self, processor):
+        """TESTE 51: Datas inválidas saem como não conciliadas sem quebrar a ordem"""
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix'},
+            {'id': 1, 'date': '31/11/2024', 'value': 100.0, 'description': 'pix'},
+            {'id': 2, 'date': '2024-11-02', 'value': 50.0, 'description': 'ted'}
+        ]
+        internal = [
+            {'id': 0, 'date': None, 'value': 100.0, 'description': 'pix'},
+            {'id': 1, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix'}
+        ]
+        
+        result = self._collect(processor.reconcile_stream(bank, internal))
+        
+        assert result['matched'] == [(0, 1, 1.0)]
+        assert sorted(result['bank_only']) == [1, 2]
+        assert result['internal_only'] == [0]
+    
+    @pytest.mark.parametrize('side', ['bank', 'internal'])
+    def test_stream_out_of_order_raises(self, processor, side):
+        """TESTE 52: Entrada fora de ordem de data gera erro"""
+        ordered = [{'id': 0, 'date': '2024-11-01', 'value': 10.0, 'description': 'a'}]
+        unordered = [
+            {'id': 0, 'date': '2024-11-05', 'value': 10.0, 'description': 'a'},
+            {'id': 1, 'date': '2024-11-01', 'value': 10.0, 'description': 'a'}
+        ]
+        bank, internal = (unordered, ordered) if side == 'bank' else (ordered, unordered)
+        
+        with pytest.raises(ValueError):
+            list(processor.reconcile_stream(bank, internal))
+    
+    def test_stream_window_is_bounded(self):
+        """TESTE 53: Só as internas da janela de datas ficam em memória"""
+        processor = ReconciliationProcessor(date_tolerance=1)
+        start = datetime(2024, 1, 1)
+        days = 60
+        internal = [
+            {'id': day * 5 + n, 'date': (start + timedelta(days=day)).strftime('%Y-%m-%d'),
+             'value': 10.0 + n, 'description': 'x'}
+            for day in range(days) for n in range(5)
+        ]
+        bank = [
+            {'id': day, 'date': (start + timedelta(days=day)).strftime('%Y-%m-%d'),
+             'value': 999.0, 'description': 'y'}
+            for day in range(days)
+        ]
+        window_sizes = []
+        original = processor._match_indexed
+        
+        def spy(bank_data, internal_data, *args):
+            window_sizes.append(len(internal_data))
+            return original(bank_data, internal_data, *args)
+        
+        with patch.object(processor, '_match_indexed', side_effect=spy):
+            events = list(processor.reconcile_stream(iter(bank), iter(internal)))
+        
+        assert max(window_sizes) <= 3 * 5
+        assert sum(1 for e in events if e['type'] == 'internal_only') == days * 5
+
+
+class TestIncrementalReconciliation:
+    """Testes da conciliação incremental (novas contra novas e pendentes)"""
+    
+    def test_new_rows_match_pending_and_new(self, processor):
+        """TESTE 54: Novas conciliam com pendentes e entre si"""
+        new_bank = [
+            {'id': 10, 'date': '2024-11-05', 'value': 300.0, 'description': 'aluguel sala'},
+            {'id': 11, 'date': '2024-11-06', 'value': 80.0, 'description': 'tarifa banco'}
+        ]
+        new_internal = [
+            {'id': 20, 'date': '2024-11-06', 'value': 80.0, 'description': 'tarifa banco'},
+            {'id': 21, 'date': '2024-11-04', 'value': 150.0, 'description': 'energia eletrica'}
+        ]
+        pending_bank = [
+            {'id': 1, 'date': '2024-11-04', 'value': 150.0, 'description': 'energia eletrica'}
+        ]
+        pending_internal = [
+            {'id': 2, 'date': '2024-11-05', 'value': 300.0, 'description': 'aluguel sala'}
+        ]
+        
+        result = processor.reconcile_incremental(new_bank, new_internal, pending_bank, pending_internal)
+        
+        pairs = {(m['bank_transaction']['id'], m['internal_transaction']['id']) for m in result['matched']}
+        assert pairs == {(10, 2), (11, 20), (1, 21)}
+        assert result['bank_only'] == []
+        assert result['internal_only'] == []
+        assert result['summary']['matched_pending_bank'] == 1
+        assert result['summary']['matched_pending_internal'] == 1
+    
+    def test_pending_rows_not_matched_with_each_other(self, processor):
+        """TESTE 55: Pendentes não são comparadas entre si"""
+        pending_bank = [
+            {'id': 1, 'date': '2024-11-04', 'value': 150.0, 'description': 'energia eletrica'}
+        ]
+        pending_internal = [
+            {'id': 2, 'date': '2024-11-04', 'value': 150.0, 'description': 'energia eletrica'}
+        ]
+        new_bank = [
+            {'id': 10, 'date': '2024-11-20', 'value': 999.0, 'description': 'outra coisa'}
+        ]
+        
+        result = processor.reconcile_incremental(new_bank, [], pending_bank, pending_internal)
+        
+        assert result['matched'] == []
+        assert [t['id'] for t in result['bank_only']] == [10]
+        assert result['internal_only'] == []
+        assert result['summary']['matched_count'] == 0
+
+
+class TestAggregateMatching:
+    """Testes da passada agregada (um banco = soma de várias internas)"""
+    
+    @pytest.fixture
+    def aggregate(self):
+        """Fixture: Processador com a passada agregada ligada (grupos até 3)"""
+        return ReconciliationProcessor(aggregate_max_group=3)
+    
+    @staticmethod
+    def _batch(values, date='2024-11-05', first_id=0, description='pix cliente'):
+        return [
+            {'id': first_id + idx, 'date': date, 'value': value, 'description': f'{description} {idx}'}
+            for idx, value in enumerate(values)
+        ]
+    
+    def test_bank_matches_sum_of_internals(self, aggregate):
+        """TESTE 56: Lote no banco concilia com a soma das internas"""
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 350.0, 'description': 'pix cliente'}]
+        internal = self._batch([100.0, 200.0, 50.0, 999.0])
+        
+        result = aggregate.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass'] == {'exact': 0, 'fuzzy': 0, 'aggregate': 1}
+        match = result['matched'][0]
+        assert [m['id'] for m in match['internal_transaction']['members']] == [0, 1, 2]
+        assert match['internal_transaction']['value'] == 350.0
+        assert 0.7 <= match['confidence'] < 1.0  # soma exata não vale o peso cheio
+        assert [t['id'] for t in result['internal_only']] == [3]
+        assert result['summary']['match_rate'] == round(4 / 5 * 100, 2)
+    
+    def test_group_size_limit(self):
+        """TESTE 57: Grupos maiores que aggregate_max_group não são buscados"""
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 100.0, 'description': 'pix cliente'}]
+        internal = self._batch([25.0, 25.0, 25.0, 25.0])
+        
+        small = ReconciliationProcessor(aggregate_max_group=3).reconcile(bank, internal)
+        large = ReconciliationProcessor(aggregate_max_group=4).reconcile(bank, internal)
+        
+        assert small['summary']['matched_count'] == 0
+        assert large['summary']['matches_by_pass']['aggregate'] == 1
+    
+    def test_respects_date_window_and_sign(self, aggregate):
+        """TESTE 58: Só internas de mesmo sinal dentro da janela de datas"""
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 300.0, 'description': 'pix cliente'}]
+        internal = (
+            self._batch([100.0], date='2024-11-10') +
+            self._batch([100.0, -200.0], first_id=1) +
+            self._batch([200.0], date='2024-11-04', first_id=3)
+        )
+        
+        result = aggregate.reconcile(bank, internal)
+        
+        members = result['matched'][0]['internal_transaction']['members']
+        assert sorted(m['id'] for m in members) == [1, 3]
+        assert result['matched'][0]['confidence'] < 0.9  # datas diferentes
+    
+    def test_disabled_below_two_and_by_default(self):
+        """TESTE 59: aggregate_max_group < 2 desativa a passada, e esse é o padrão"""
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 300.0, 'description': 'pix cliente'}]
+        internal = self._batch([100.0, 200.0])
+        
+        for processor in (ReconciliationProcessor(aggregate_max_group=0), ReconciliationProcessor()):
+            result = processor.reconcile(bank, internal)
+            
+            assert result['summary']['matched_count'] == 0
+            assert result['summary']['matches_by_pass']['aggregate'] == 0
+    
+    def test_subset_sum_exact_and_unique(self, aggregate):
+        """TESTE 60: Só somas exatas em centavos, e só quando um único grupo fecha a soma"""
+        candidates = sorted((cents, pos) for pos, cents in enumerate([1000, 2000, 4000, 8000, 8001]))
+        
+        assert aggregate._subset_sum(candidates, 3000) == (0, 1)
+        assert aggregate._subset_sum(candidates, 12000) == (2, 3)
+        assert aggregate._subset_sum(candidates, 13001) == (0, 2, 4)
+        assert aggregate._subset_sum(candidates, 2990) is None  # na tolerância, mas não exato
+        assert aggregate._subset_sum(candidates, 99999) is None
+        
+        ambiguous = sorted((cents, pos) for pos, cents in enumerate([1000, 2000, 3000, 4000]))
+        assert aggregate._subset_sum(ambiguous, 5000) is None  # 1000+4000 e 2000+3000
+        repeated = sorted((cents, pos) for pos, cents in enumerate([2500, 2500, 7500]))
+        assert aggregate._subset_sum(repeated, 10000) is None  # qual dos 2500?
+    
+    def test_search_is_bounded_on_many_leftovers(self, aggregate):
+        """TESTE 61: Milhares de sobras no mesmo dia não explodem a busca"""
+        rng = random.Random(3)
+        internal = self._batch([round(rng.uniform(1, 100), 2) for _ in range(3000)])
+        bank = [
+            {'id': idx, 'date': '2024-11-05', 'value': 100000.0 + idx, 'description': 'lote'}
+            for idx in range(50)
+        ]
+        
+        with patch('app.core.reconciliation_processor._AGGREGATE_MAX_NODES', 1000):
+            result = aggregate.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass']['aggregate'] == 0
+    
+    def test_batch_description_only_weighs(self, aggregate):
+        """TESTE 69: Lote com descrição diferente das internas concilia no mesmo dia; com datas diferentes, não"""
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 300.0, 'description': 'PIX LOTE 0412'}]
+        internal = (
+            self._batch([100.0], description='recebimento maria souza') +
+            self._batch([200.0], first_id=1, description='mensalidade joao lima')
+        )
+        
+        result = aggregate.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass']['aggregate'] == 1
+        assert 0.7 <= result['matched'][0]['confidence'] < 0.8
+        
+        internal[1]['date'] = '2024-11-06'
+        result = aggregate.reconcile(bank, internal)
+        
+        assert result['summary']['matches_by_pass']['aggregate'] == 0
+        assert aggregate._aggregate_confidence(bank[0], internal) < 0.7
+    
+    def test_unrelated_leftovers_only_pass_the_guards(self, aggregate):
+        """
+        TESTE 70: Em sobras aleatórias sem relação, os grupos aceitos fecham a
+        soma exata na janela de datas e são mais raros que os falsos matches um
+        para um nos mesmos dados
+        """
+        rng = random.Random(7)
+        words = ['pix', 'ted', 'boleto', 'tarifa', 'cliente', 'fornecedor', 'energia',
+                 'aluguel', 'salario', 'compra', 'venda', 'cartao', 'deposito', 'saque']
+        
+        def side(count):
+            return [
+                {'id': idx, 'date': f'2024-11-{rng.randint(1, 28):02d}',
+                 'value': round(rng.uniform(1, 500), 2),
+                 'description': f"{' '.join(rng.sample(words, 2))} {rng.randint(1, 999)}"}
+                for idx in range(count)
+            ]
+        
+        result = aggregate.reconcile(side(1000), side(1000))
+        
+        by_pass = result['summary']['matches_by_pass']
+        assert by_pass['aggregate'] < by_pass['exact'] + by_pass['fuzzy']
+        for match in result['matched']:
+            members = match['internal_transaction'].get('members')
+            if not members:
+                continue
+            bank_day = int(match['bank_transaction']['date'][-2:])
+            assert round(sum(m['value'] for m in members) * 100) == round(match['bank_transaction']['value'] * 100)
+            assert all(abs(int(m['date'][-2:]) - bank_day) <= aggregate.date_tolerance for m in members)
+
+
+# ============================================================================
+# TESTES DE PROGRESSO
+# ============================================================================
+
+class TestProgressReporting:
+    """Testes do callback de progresso do reconcile"""
+    
+    def test_stages_in_order_and_final_summary(self):
+        """TESTE 62: Etapas avisadas em ordem e 'done' com o total de matches"""
+        bank = _random_transactions(5, 300)
+        internal = _random_transactions(6, 300)
+        events = []
+        
+        result = ReconciliationProcessor().reconcile(bank, internal, progress_callback=events.append)
+        
+        stages = [event['stage'] for event in events]
+        assert stages[0] == 'exact'
+        assert stages.index('candidates') < stages.index('scoring') < stages.index('assignment')
+        assert stages[-1] == 'done'
+        assert events[-1]['processed'] == events[-1]['total'] == 300
+        assert events[-1]['matched'] == result['summary']['matched_count']
+        assert all(event['matched'] <= result['summary']['matched_count'] for event in events)
+    
+    def test_row_updates_are_throttled(self):
+        """TESTE 63: Dentro do intervalo só as trocas de etapa são avisadas"""
+        bank = _random_transactions(7, 2000)
+        internal = _random_transactions(8, 2000)
+        events = []
+        
+        with patch('app.core.reconciliation_processor.settings.RECONCILIATION_PROGRESS_INTERVAL', 3600):
+            ReconciliationProcessor(aggregate_max_group=0).reconcile(
+                bank, internal, progress_callback=events.append
+            )
+        
+        assert all(event['processed'] == 0 for event in events[:-1])
+        assert len(events) == len({event['stage'] for event in events})
+    
+    def test_callback_does_not_change_result(self):
+        """TESTE 64: Mesmo resultado com e sem callback; o callback não fica no processador"""
+        bank = _random_transactions(9, 500)
+        internal = _random_transactions(10, 500)
+        processor = ReconciliationProcessor(assignment='optimal')
+        
+        with_progress = processor.reconcile(bank, internal, progress_callback=lambda event: None)
+        without_progress = processor.reconcile(bank, internal)
+        
+        assert with_progress == without_progress
+        assert processor._progress.callback is None
+
+
+# ============================================================================
+# TESTES DE CANCELAMENTO E ORÇAMENTO DE TEMPO
+# ============================================================================
+
+class TestCancellationAndBudget:
+    """Testes do cancel_token e do time_budget do reconcile"""
+    
+    def test_cancelled_token_interrupts(self):
+        """TESTE 65: Token cancelado interrompe com OperationCancelled"""
+        token = CancellationToken()
+        token.cancel()
+        
+        with pytest.raises(OperationCancelled):
+            ReconciliationProcessor().reconcile(
+                _random_transactions(11, 200), _random_transactions(12, 200), cancel_token=token
+            )
+    
+    def test_cancel_during_run(self):
+        """TESTE 66: Cancelar no meio de uma etapa para no próximo ponto de verificação"""
+        token = CancellationToken()
+        
+        def cancel_on_assignment(event):
+            if event['stage'] == 'assignment':
+                token.cancel()
+        
+        with pytest.raises(OperationCancelled):
+            ReconciliationProcessor(aggregate_max_group=0).reconcile(
+                _random_transactions(13, 2000), _random_transactions(14, 2000),
+                progress_callback=cancel_on_assignment, cancel_token=token
+            )
+    
+    @pytest.mark.parametrize("budget_ticks", [1, 4, 60, 400])
+    def test_budget_returns_partial_subset(self, budget_ticks):
+        """TESTE 67: Orçamento esgotado devolve só matches do resultado completo, marcado como incompleto"""
+        bank = _random_transactions(15, 2000)
+        internal = _random_transactions(16, 2000)
+        processor = ReconciliationProcessor(aggregate_max_group=0)
+        full = processor.reconcile(bank, internal)
+        
+        # Relógio que avança 1s a cada consulta
+        ticks = iter(range(10 ** 6))
+        with patch('app.core.progress.time.monotonic', side_effect=lambda: next(ticks)):
+            partial = processor.reconcile(bank, internal, time_budget=budget_ticks)
+        
+        def pairs(result):
+            return {
+                (match['bank_transaction']['id'], match['internal_transaction']['id'])
+                for match in result['matched']
+            }
+        
+        summary = partial['summary']
+        assert summary['complete'] is False
+        assert pairs(partial) <= pairs(full)
+        assert summary['matched_count'] + summary['bank_only_count'] == len(bank)
+        assert summary['matched_count'] + summary['internal_only_count'] == len(internal)
+    
+    def test_complete_without_budget(self, processor, sample_bank_data, sample_internal_data):
+        """TESTE 68: Sem orçamento (ou com folga) o resultado é completo"""
+        result = processor.reconcile(sample_bank_data, sample_internal_data, time_budget=3600)
+        
+        assert result['summary']['complete'] is True
+    
+    @pytest.mark.parametrize("workers,budget", [(1, 30), (2, 2)])
+    def test_budget_during_candidates_keeps_collected(self, workers, budget):
+        """
+        TESTE 71: Orçamento esgotado na busca de candidatos (serial ou em
+        processos) ainda pontua e atribui os candidatos já coletados
+        """
+        bank = _random_transactions(17, 2000)
+        internal = _random_transactions(18, 2000)
+        processor = ReconciliationProcessor(
+            aggregate_max_group=0, workers=workers, parallel_min_rows=0
+        )
+        full = processor.reconcile(bank, internal)
+        
+        # Relógio parado até a busca de candidatos; depois avança 1s por
+        # consulta (em processos, uma consulta por fatia concluída)
+        clock = {'stage': None, 'now': 0}
+        
+        def monotonic():
+            if clock['stage'] == 'candidates':
+                clock['now'] += 1
+            return clock['now']
+        
+        def on_progress(event):
+            clock['stage'] = event['stage']
+        
+        with patch('app.core.progress.time.monotonic', side_effect=monotonic):
+            partial = processor.reconcile(
+                bank, internal, progress_callback=on_progress, time_budget=budget
+            )
+        
+        def pairs(result):
+            return {
+                (match['bank_transaction']['id'], match['internal_transaction']['id'])
+                for match in result['matched']
+            }
+        
+        assert partial['summary']['complete'] is False
+        assert partial['summary']['matches_by_pass']['fuzzy'] > 0
+        assert pairs(partial) < pairs(full)
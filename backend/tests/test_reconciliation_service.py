@@ -803,4 +803,372 @@ class TestReconciliationServiceMissingLines:
         # Assert
         assert 'last_reconciliation_date' in stats
         # ✅ CORRIGIDO: Comparar com string ISO em vez de datetime object
-        assert stats['last_reconciliation_date'] == '2025-01-20T00:00:00'
\ No newline at end of file
+        assert stats['last_reconciliation_date'] == '2025-01-20T00:00:00'
+
+# ============================================================================
+# SUITE: CONCILIAÇÃO INCREMENTAL (append_to_reconciliation)
+# ============================================================================
+
+@pytest.fixture
+def sqlite_session():
+    """Fixture: Sessão SQLite em memória com todas as tabelas"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    import app.models  # noqa: F401 - registra os models
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestAppendToReconciliation:
+    """Suite de testes da conciliação incremental"""
+    
+    @staticmethod
+    def _initial(db, processor, bank, internal):
+        """Executa e salva a conciliação inicial como a rota /reconcile"""
+        from app.services.reconciliation_service import ReconciliationService
+        from app.models.reconciliation import ReconciliationMatch
+        
+        results = processor.reconcile(bank, internal)
+        reconciliation = ReconciliationService.save_reconciliation_to_db(
+            db, 1, "bank.csv", "internal.csv", results
+        )
+        records = db.query(ReconciliationMatch).order_by(ReconciliationMatch.id).all()
+        ReconciliationService.save_transactions(
+            db, reconciliation.id, bank, internal, list(zip(records, results['matched']))
+        )
+        db.commit()
+        return reconciliation
+    
+    def test_append_matches_pending_and_updates_counters(self, sqlite_session):
+        """
+        TESTE 1: Novas transações conciliam com pendentes salvas e
+        atualizam contadores no lugar
+        """
+        from app.services.reconciliation_service import ReconciliationService
+        from app.models.reconciliation import ReconciliationMatch, ReconciliationTransaction
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        processor = ReconciliationProcessor()
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix cliente'},
+            {'id': 1, 'date': '2024-11-02', 'value': 250.0, 'description': 'boleto fornecedor'}
+        ]
+        internal = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix cliente'},
+            {'id': 1, 'date': '2024-11-20', 'value': 75.0, 'description': 'tarifa'}
+        ]
+        reconciliation = self._initial(sqlite_session, processor, bank, internal)
+        assert reconciliation.matched_count == 1
+        
+        new_bank = [
+            {'id': 0, 'date': '2024-11-20', 'value': 75.0, 'description': 'tarifa'}
+        ]
+        new_internal = [
+            {'id': 0, 'date': '2024-11-03', 'value': 250.0, 'description': 'boleto fornecedor'},
+            {'id': 1, 'date': '2024-12-30', 'value': 10.0, 'description': 'outro'}
+        ]
+        
+        results = ReconciliationService.append_to_reconciliation(
+            sqlite_session, reconciliation, new_bank, new_internal, processor
+        )
+        
+        assert results['summary']['matched_count'] == 2
+        assert results['summary']['matched_pending_bank'] == 1
+        assert results['summary']['matched_pending_internal'] == 1
+        assert [t['id'] for t in results['internal_only']] == [3]
+        
+        sqlite_session.refresh(reconciliation)
+        assert reconciliation.total_bank_transactions == 3
+        assert reconciliation.total_internal_transactions == 4
+        assert reconciliation.matched_count == 3
+        assert reconciliation.bank_only_count == 0
+        assert reconciliation.internal_only_count == 1
+        assert reconciliation.match_rate == round(6 / 7 * 100, 2)
+        assert sqlite_session.query(ReconciliationMatch).count() == 3
+        
+        pending = sqlite_session.query(ReconciliationTransaction).filter(
+            ReconciliationTransaction.match_id.is_(None)
+        ).all()
+        assert [(row.side, row.transaction_id) for row in pending] == [('internal', 3)]
+        
+        ids = sorted(
+            (row.side, row.transaction_id)
+            for row in sqlite_session.query(ReconciliationTransaction).all()
+        )
+        assert ids == [('bank', 0), ('bank', 1), ('bank', 2),
+                       ('internal', 0), ('internal', 1), ('internal', 2), ('internal', 3)]
+    
+    def test_append_only_loads_pending_in_date_window(self, sqlite_session):
+        """TESTE 2: Pendentes fora da janela de datas das novas não são carregadas"""
+        from app.services.reconciliation_service import ReconciliationService
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        processor = ReconciliationProcessor(date_tolerance=1)
+        internal = [
+            {'id': idx, 'date': f'2024-11-{day:02d}', 'value': 10.0 + idx, 'description': 'x'}
+            for idx, day in enumerate(range(1, 29))
+        ]
+        reconciliation = self._initial(sqlite_session, processor, [], internal)
+        
+        with patch.object(
+            ReconciliationService, 'load_pending_transactions',
+            wraps=ReconciliationService.load_pending_transactions
+        ) as spy:
+            ReconciliationService.append_to_reconciliation(
+                sqlite_session, reconciliation,
+                [{'id': 0, 'date': '2024-11-10', 'value': 1.0, 'description': 'y'}], [],
+                processor
+            )
+        
+        loaded = {call.args[2]: call.args[3] for call in spy.call_args_list}
+        assert loaded['internal'] == ('2024-11-09', '2024-11-11')
+        assert loaded['bank'] is None
+        assert len(ReconciliationService.load_pending_transactions(
+            sqlite_session, reconciliation.id, 'internal', loaded['internal']
+        )) == 3
+    
+    def test_aggregate_members_linked_to_match(self, sqlite_session):
+        """TESTE 3: Todas as internas de um match agregado apontam para ele"""
+        from app.models.reconciliation import ReconciliationTransaction
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 300.0, 'description': 'pix cliente'}]
+        internal = [
+            {'id': 0, 'date': '2024-11-05', 'value': 100.0, 'description': 'pix cliente a'},
+            {'id': 1, 'date': '2024-11-05', 'value': 200.0, 'description': 'pix cliente b'},
+            {'id': 2, 'date': '2024-11-05', 'value': 999.0, 'description': 'outro'}
+        ]
+        processor = ReconciliationProcessor(aggregate_max_group=3)
+        
+        reconciliation = self._initial(sqlite_session, processor, bank, internal)
+        
+        rows = sqlite_session.query(ReconciliationTransaction).filter(
+            ReconciliationTransaction.reconciliation_id == reconciliation.id
+        ).all()
+        links = {(row.side, row.transaction_id): row.match_id for row in rows}
+        assert links[('bank', 0)] is not None
+        assert links[('internal', 0)] == links[('internal', 1)] == links[('bank', 0)]
+        assert links[('internal', 2)] is None
+    
+    def test_blank_cells_and_raw_dates_are_saved(self, sqlite_session):
+        """
+        TESTE 4: Células vazias (NaN) vão como null para as colunas JSON e
+        datas não normalizadas são salvas inteiras
+        """
+        from app.services.reconciliation_service import json_safe
+        from app.models.reconciliation import ReconciliationMatch, ReconciliationTransaction
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        nan = float('nan')
+        bank = [{'id': 0, 'date': '2024-11-05', 'value': 50.0, 'description': 'pix',
+                 'original': {'Data': '05/11/2024', 'Obs': nan}}]
+        internal = [
+            {'id': 0, 'date': '2024-11-05', 'value': 50.0, 'description': 'pix',
+             'original': {'Data': '05/11/2024', 'Obs': nan}},
+            {'id': 1, 'date': '2024-11-05 10:30:00', 'value': 9.0, 'description': 'x',
+             'original': {'Data': '2024-11-05 10:30:00', 'Obs': nan}}
+        ]
+        
+        reconciliation = self._initial(sqlite_session, ReconciliationProcessor(), bank, internal)
+        
+        rows = {
+            (row.side, row.transaction_id): row
+            for row in sqlite_session.query(ReconciliationTransaction).filter(
+                ReconciliationTransaction.reconciliation_id == reconciliation.id
+            )
+        }
+        assert rows[('bank', 0)].original == {'Data': '05/11/2024', 'Obs': None}
+        assert rows[('internal', 1)].date == '2024-11-05 10:30:00'
+        
+        match = sqlite_session.query(ReconciliationMatch).one()
+        assert match.bank_transaction_data['original']['Obs'] is None
+        assert json_safe([nan, float('inf'), 1.5, 'a']) == [None, None, 1.5, 'a']
+
+
+# ============================================================================
+# SUITE: PENDÊNCIAS SALVAS (get_pending_transactions / link_manual_match)
+# ============================================================================
+
+class TestSavedPendingTransactions:
+    """Suite de testes das pendências servidas pela tabela de transações"""
+    
+    def test_pending_from_table_with_custom_columns(self, sqlite_session):
+        """
+        TESTE 1: Pendências saem da tabela com o 'original' de colunas
+        personalizadas, sem reler arquivos
+        """
+        from app.services.reconciliation_service import ReconciliationService
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        bank = [
+            {'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix cliente',
+             'original': {'Dt Lanc': '01/11/2024', 'Montante': '100,00'}},
+            {'id': 1, 'date': '2024-11-03', 'value': 75.5, 'description': 'tarifa',
+             'original': {'Dt Lanc': '03/11/2024', 'Montante': '75,50'}}
+        ]
+        internal = [{'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'pix cliente'}]
+        reconciliation = TestAppendToReconciliation._initial(
+            sqlite_session, ReconciliationProcessor(), bank, internal
+        )
+        
+        with patch('app.services.parsed_cache.ParsedFileCache.load_transactions') as mock_load:
+            pending = ReconciliationService.get_pending_transactions(sqlite_session, reconciliation.id)
+        
+        mock_load.assert_not_called()
+        assert pending['internal'] == []
+        assert pending['bank'] == [{
+            'id': 1, 'date': '2024-11-03', 'value': 75.5, 'description': 'tarifa',
+            'original': {'Dt Lanc': '03/11/2024', 'Montante': '75,50'}
+        }]
+    
+    def test_manual_match_leaves_pending(self, sqlite_session):
+        """TESTE 2: Match manual liga as duas transações e as tira das pendências"""
+        from app.services.reconciliation_service import ReconciliationService
+        from app.core.reconciliation_processor import ReconciliationProcessor
+        
+        bank = [{'id': 0, 'date': '2024-11-01', 'value': 100.0, 'description': 'deposito'}]
+        internal = [{'id': 0, 'date': '2024-12-20', 'value': 98.0, 'description': 'venda'}]
+        reconciliation = TestAppendToReconciliation._initial(
+            sqlite_session, ReconciliationProcessor(), bank, internal
+        )
+        
+        record = ReconciliationService.link_manual_match(sqlite_session, reconciliation.id, 0, 0)
+        sqlite_session.commit()
+        
+        assert record.is_manual is True
+        assert record.bank_transaction_data['description'] == 'deposito'
+        assert ReconciliationService.get_pending_transactions(sqlite_session, reconciliation.id) == {
+            'bank': [], 'internal': []
+        }
+        assert ReconciliationService.link_manual_match(sqlite_session, reconciliation.id, 0, 0) is None
+    
+    @staticmethod
+    def _pending_rows(db, count=23):
+        """Conciliação com `count` bancárias pendentes, com datas/valores repetidos e nulos"""
+        from app.services.reconciliation_service import ReconciliationService
+        from app.models.reconciliation import Reconciliation
+        
+        reconciliation = Reconciliation(user_id=1, bank_file_name='b.csv', internal_file_name='i.csv')
+        db.add(reconciliation)
+        db.flush()
+        bank = [
+            {
+                'id': idx,
+                'date': None if idx % 7 == 3 else f'2024-11-{idx % 5 + 1:02d}',
+                'value': None if idx % 6 == 2 else float((idx * 37) % 11 - 5),
+                'description': f'pix {idx}'
+            }
+            for idx in range(count)
+        ]
+        ReconciliationService.save_transactions(db, reconciliation.id, bank, [], [])
+        db.commit()
+        return reconciliation, bank
+    
+    def test_pending_keyset_pages(self, sqlite_session):
+        """TESTE 3: Páginas por cursor cobrem todas as pendentes, sem repetir, em cada ordenação"""
+        from app.services.reconciliation_service import ReconciliationService
+        
+        reconciliation, bank = self._pending_rows(sqlite_session)
+        
+        for sort in ('date', 'value'):
+            for descending in (False, True):
+                keyed = sorted(
+                    (t for t in bank if t[sort] is not None),
+                    key=lambda t: (t[sort], -t['id'] if descending else t['id']),
+                    reverse=descending
+                )
+                expected = [t['id'] for t in keyed] + [t['id'] for t in bank if t[sort] is None]
+                
+                seen, cursor = [], None
+                while True:
+                    token = ReconciliationService.encode_cursor(cursor) if cursor else None
+                    page = ReconciliationService.get_pending_page(
+                        sqlite_session, reconciliation.id, 'bank', 4, sort=sort,
+                        descending=descending,
+                        cursor=ReconciliationService.decode_cursor(token, sort) if token else None
+                    )
+                    assert page['total'] == len(bank)
+                    seen += [item['id'] for item in page['items']]
+                    cursor = page['next_cursor']
+                    if cursor is None:
+                        break
+                
+                assert seen == expected, (sort, descending)
+    
+    def test_pending_filters_and_invalid_cursor(self, sqlite_session):
+        """TESTE 4: Filtros de data e valor; cursor inválido é rejeitado"""
+        from app.services.reconciliation_service import ReconciliationService
+        
+        reconciliation, bank = self._pending_rows(sqlite_session)
+        
+        page = ReconciliationService.get_pending_page(
+            sqlite_session, reconciliation.id, 'bank', 100, sort='value',
+            date_from='2024-11-02', date_to='2024-11-03', min_value=-1.0, max_value=3.0
+        )
+        
+        expected = {
+            t['id'] for t in bank
+            if t['date'] and '2024-11-02' <= t['date'] <= '2024-11-03'
+            and t['value'] is not None and -1.0 <= t['value'] <= 3.0
+        }
+        assert {item['id'] for item in page['items']} == expected
+        assert page['total'] == len(expected)
+        assert [item['value'] for item in page['items']] == sorted(
+            item['value'] for item in page['items']
+        )
+        
+        for token in ('xx', ReconciliationService.encode_cursor(('2024-11-01', 3))):
+            with pytest.raises(ValueError):
+                ReconciliationService.decode_cursor(token, 'value')
+    
+    def test_backfill_from_uploads_for_old_reconciliation(self, sqlite_session, tmp_path):
+        """
+        TESTE 5: Conciliação anterior à tabela de transações tem as transações
+        salvas a partir dos uploads, com matches automáticos e manuais ligados
+        """
+        from app.services.reconciliation_service import ReconciliationService
+        from app.models.reconciliation import Reconciliation, ReconciliationMatch, ManualMatch
+        
+        (tmp_path / "bank_1_old.csv").write_text(
+            "Data,Valor,Descricao\n2024-11-01,100.00,pix a\n2024-11-02,50.00,pix b\n2024-11-03,30.00,pix c\n"
+        )
+        (tmp_path / "internal_1_old.csv").write_text(
+            "Data,Valor,Descricao\n2024-11-01,100.00,pix a\n2024-11-09,70.00,venda\n2024-11-02,50.00,pix b\n"
+        )
+        reconciliation = Reconciliation(
+            user_id=1, bank_file_name="bank_1_old.csv", internal_file_name="internal_1_old.csv",
+            total_bank_transactions=3, total_internal_transactions=3, matched_count=2,
+            bank_only_count=1, internal_only_count=1
+        )
+        sqlite_session.add(reconciliation)
+        sqlite_session.flush()
+        sqlite_session.add(ReconciliationMatch(
+            reconciliation_id=reconciliation.id, bank_transaction_data={'id': 0},
+            internal_transaction_data={'id': 0}, confidence=0.9, is_manual=False
+        ))
+        sqlite_session.add(ManualMatch(
+            reconciliation_id=reconciliation.id, bank_transaction_id=1, internal_transaction_id=2
+        ))
+        sqlite_session.commit()
+        
+        missing = Reconciliation(user_id=1, bank_file_name="gone.csv", internal_file_name="gone.csv")
+        sqlite_session.add(missing)
+        sqlite_session.commit()
+        
+        assert ReconciliationService.backfill_transactions(sqlite_session, reconciliation, str(tmp_path))
+        sqlite_session.commit()
+        
+        pending = ReconciliationService.get_pending_transactions(sqlite_session, reconciliation.id)
+        assert [t['description'] for t in pending['bank']] == ['pix c']
+        assert [t['description'] for t in pending['internal']] == ['venda']
+        manual = sqlite_session.query(ReconciliationMatch).filter(ReconciliationMatch.is_manual).one()
+        assert manual.bank_transaction_data['description'] == 'pix b'
+        
+        assert not ReconciliationService.backfill_transactions(sqlite_session, reconciliation, str(tmp_path))
+        assert not ReconciliationService.backfill_transactions(sqlite_session, missing, str(tmp_path))
@@ -0,0 +1,209 @@
+"""
+Testes da limpeza de uploads (TTL, cota, referências e lotes)
+"""
+import os
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+
+from app.models.reconciliation import Reconciliation
+from app.models.upload import Upload
+from app.services.parsed_cache import ParsedFileCache
+from app.services.upload_retention import RetentionWorker, UploadRetention
+from app.services.upload_store import UploadStore
+
+
+DAY = 24 * 3600
+NOW = datetime(2025, 3, 1, tzinfo=timezone.utc).timestamp()
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def sqlite_session():
+    """Sessão SQLite em memória com todas as tabelas"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    import app.models  # noqa: F401 - registra os models
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    path = tmp_path / 'uploads'
+    path.mkdir()
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParsedFileCache(str(tmp_path / 'cache'), max_bytes=10 * 1024 * 1024)
+
+
+def add_upload(db, upload_dir, filename, content, days_ago):
+    """Grava o upload pelo UploadStore e registra no índice com a idade dada"""
+    info = UploadStore(upload_dir).store(BytesIO(content), filename, max_size=1024 * 1024)
+    db.add(Upload(
+        user_id=int(filename.split('_')[1]), filename=filename, kind=filename.split('_')[0],
+        content_hash=info['sha256'], size_bytes=info['size'], row_count=info['rows'],
+        created_at=datetime.fromtimestamp(NOW - days_ago * DAY, timezone.utc)
+    ))
+    db.commit()
+
+
+def csv(label):
+    return f"Data,Valor,Descricao\n01/01/2025,10.00,{label}\n".encode()
+
+
+# ============================================================================
+# TESTES DA RETENÇÃO
+# ============================================================================
+
+class TestUploadRetention:
+    """Testes das regras de remoção e das métricas"""
+    
+    def test_ttl_keeps_referenced_and_recently_read(self, sqlite_session, upload_dir, cache):
+        """TESTE 1: TTL remove o que ninguém usa; conciliação e leitura recente seguram o arquivo"""
+        db = sqlite_session
+        add_upload(db, upload_dir, 'bank_1_20250101_100000.csv', csv('velho'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250102_100000.csv', csv('conciliado'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250103_100000.csv', csv('lido'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250225_100000.csv', csv('novo'), days_ago=4)
+        db.add(Reconciliation(
+            user_id=1, bank_file_name='bank_1_20250102_100000.csv', internal_file_name='x.csv'
+        ))
+        db.commit()
+        read_path = os.path.join(upload_dir, 'bank_1_20250103_100000.csv')
+        cache.load_frame(read_path)
+        for entry in cache._entries():
+            os.utime(entry.path, (NOW - DAY, NOW - DAY))
+        
+        retention = UploadRetention(upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=0)
+        run = retention.run_once(db, now=NOW)
+        
+        assert run['files_removed'] == 1
+        assert run['contents_removed'] == 1
+        assert run['bytes_reclaimed'] == len(csv('velho'))
+        assert sorted(u.filename for u in db.query(Upload)) == [
+            'bank_1_20250102_100000.csv', 'bank_1_20250103_100000.csv', 'bank_1_20250225_100000.csv'
+        ]
+        assert not os.path.exists(os.path.join(upload_dir, 'bank_1_20250101_100000.csv'))
+        assert retention.metrics.to_dict()['files_removed'] == 1
+    
+    def test_quota_removes_least_used_in_batches(self, sqlite_session, upload_dir, cache):
+        """TESTE 2: Acima da cota saem os menos usados, em lotes com pausa; conteúdo compartilhado fica"""
+        db = sqlite_session
+        shared = csv('compartilhado')
+        add_upload(db, upload_dir, 'bank_1_20250101_100000.csv', shared, days_ago=5)
+        add_upload(db, upload_dir, 'bank_1_20250102_100000.csv', csv('a'), days_ago=4)
+        add_upload(db, upload_dir, 'bank_1_20250103_100000.csv', csv('b'), days_ago=3)
+        add_upload(db, upload_dir, 'bank_1_20250104_100000.csv', csv('c'), days_ago=2)
+        add_upload(db, upload_dir, 'bank_2_20250101_100000.csv', shared, days_ago=5)
+        size = len(csv('a'))
+        
+        retention = UploadRetention(
+            upload_dir, cache, ttl_seconds=0, user_quota_bytes=2 * size,
+            batch_size=1, batch_pause=0.5
+        )
+        with patch('app.services.upload_retention.time.sleep') as mock_sleep:
+            run = retention.run_once(db, now=NOW)
+        
+        assert mock_sleep.call_count == 1
+        assert run['files_removed'] == 2
+        assert run['contents_removed'] == 1  # O compartilhado continua com o usuário 2
+        assert sorted(u.filename for u in db.query(Upload)) == [
+            'bank_1_20250103_100000.csv', 'bank_1_20250104_100000.csv', 'bank_2_20250101_100000.csv'
+        ]
+        assert len(os.listdir(os.path.join(upload_dir, '.objects'))) == 3
+    
+    def test_sweep_unindexed_files(self, sqlite_session, upload_dir, cache):
+        """TESTE 3: Remove uploads antigos fora do índice, objetos órfãos e temporários"""
+        db = sqlite_session
+        old = NOW - 40 * DAY
+        legacy = os.path.join(upload_dir, 'internal_1_20240101_100000.csv')
+        kept = os.path.join(upload_dir, 'internal_1_20240102_100000.csv')
+        objects_dir = os.path.join(upload_dir, '.objects')
+        os.makedirs(objects_dir)
+        orphan = os.path.join(objects_dir, 'a' * 64 + '.csv')
+        tmp = os.path.join(objects_dir, 'b' * 32 + '.tmp')
+        for path in (legacy, kept, orphan, tmp):
+            with open(path, 'wb') as f:
+                f.write(b'Data,Valor\n01/01/2024,1\n')
+            os.utime(path, (old, old))
+        db.add(Reconciliation(
+            user_id=1, bank_file_name='x.csv', internal_file_name='internal_1_20240102_100000.csv'
+        ))
+        db.commit()
+        
+        retention = UploadRetention(upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=0)
+        run = retention.run_once(db, now=NOW)
+        
+        assert sorted(os.listdir(upload_dir)) == ['.objects', os.path.basename(kept)]
+        assert os.listdir(objects_dir) == []
+        assert run == {'files_removed': 1, 'contents_removed': 2, 'bytes_reclaimed': 3 * 24}
+    
+    def test_worker_records_errors(self, sqlite_session, upload_dir, cache):
+        """TESTE 4: Rodada com erro faz rollback e fica em last_error; intervalo 0 não inicia a thread"""
+        retention = UploadRetention(upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=0)
+        worker = RetentionWorker(retention, lambda: sqlite_session, interval=0)
+        
+        with patch.object(retention, 'run_once', side_effect=RuntimeError('disco indisponível')):
+            assert worker.run() is None
+        worker.start()
+        
+        assert retention.metrics.to_dict()['last_error'] == 'disco indisponível'
+        assert worker._thread is None
+        assert worker.run() == {'files_removed': 0, 'contents_removed': 0, 'bytes_reclaimed': 0}
+        assert retention.metrics.to_dict()['last_error'] is None
+    
+    def test_cached_and_job_inputs_are_kept(self, sqlite_session, upload_dir, cache):
+        """
+        TESTE 5: Uploads com leituras em cache (mesmo antigas) ou lidos por um
+        job na fila não saem pelo TTL nem pela cota
+        """
+        db = sqlite_session
+        add_upload(db, upload_dir, 'bank_1_20250101_100000.csv', csv('em cache'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250102_100000.csv', csv('no job'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250103_100000.csv', csv('livre'), days_ago=40)
+        add_upload(db, upload_dir, 'bank_1_20250228_100000.csv', csv('novo job'), days_ago=0)
+        cache.load_frame(os.path.join(upload_dir, 'bank_1_20250101_100000.csv'))
+        for entry in cache._entries():
+            os.utime(entry.path, (NOW - 40 * DAY, NOW - 40 * DAY))
+        
+        retention = UploadRetention(
+            upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=len(csv('novo job'))
+        )
+        retention.add_reference_source(
+            lambda: {'bank_1_20250102_100000.csv', 'bank_1_20250228_100000.csv'}
+        )
+        run = retention.run_once(db, now=NOW)
+        
+        assert run['files_removed'] == 1
+        assert sorted(u.filename for u in db.query(Upload)) == [
+            'bank_1_20250101_100000.csv', 'bank_1_20250102_100000.csv', 'bank_1_20250228_100000.csv'
+        ]
+    
+    def test_one_round_at_a_time_across_processes(self, sqlite_session, upload_dir, cache):
+        """TESTE 6: Com o lock do diretório em uso (outro processo), a rodada é pulada"""
+        retention = UploadRetention(upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=0)
+        worker = RetentionWorker(retention, lambda: sqlite_session, interval=0)
+        other_process = UploadRetention(upload_dir, cache, ttl_seconds=30 * DAY, user_quota_bytes=0)
+        
+        with other_process.exclusive() as acquired, \
+             patch.object(retention, 'run_once') as mock_run:
+            assert acquired is True
+            assert worker.run() is None
+        
+        mock_run.assert_not_called()
+        assert worker.run() == {'files_removed': 0, 'contents_removed': 0, 'bytes_reclaimed': 0}
@@ -4,10 +4,11 @@ Cobertura: Validações, Upload, Listagem e Segurança
 
 """
 import pytest
+import hashlib
 import os
 import tempfile
 from io import BytesIO
-from unittest.mock import Mock, patch, MagicMock, mock_open
+from unittest.mock import Mock, patch, MagicMock
 from fastapi.testclient import TestClient
 from datetime import datetime
 
@@ -58,6 +59,56 @@ def override_get_db(mock_db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def sqlite_db():
+    """Banco SQLite em memória no lugar do get_db"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.core.database import Base
+    from app import models  # noqa: F401 - registra os models
+    
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    
+    def _get_db_override():
+        yield session
+    
+    app.dependency_overrides[get_db] = _get_db_override
+    yield session
+    app.dependency_overrides.clear()
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    """Diretório de uploads vazio, ainda não conferido pelo backfill"""
+    from app.services import upload_index
+    
+    upload_index._backfilled.clear()
+    with patch("app.api.routes.upload.UPLOAD_DIR", str(tmp_path)):
+        yield tmp_path
+    upload_index._backfilled.clear()
+
+
+def add_upload(db, filename, created_at=None):
+    """Registra um upload no índice (dono tirado do nome do arquivo)"""
+    from app.models.upload import Upload
+    
+    kind, user_id = filename.split("_")[:2]
+    db.add(Upload(
+        user_id=int(user_id), filename=filename, kind=kind,
+        content_hash="0" * 64, size_bytes=10, row_count=1,
+        columns=["Data", "Valor", "Descricao"],
+        created_at=created_at or datetime(2025, 1, 15, 14, 30)
+    ))
+    db.commit()
+
+
 @pytest.fixture
 def valid_csv_file():
     """Arquivo CSV válido"""
@@ -73,10 +124,12 @@ def valid_pdf_file():
 
 
 @pytest.fixture
-def mock_upload_dir():
-    """Mock do diretório de upload"""
-    with patch("app.api.routes.upload.UPLOAD_DIR", "/tmp/test-uploads"):
-        yield "/tmp/test-uploads"
+def mock_upload_dir(tmp_path):
+    """Diretório de upload temporário"""
+    upload_dir = str(tmp_path / "uploads")
+    os.makedirs(upload_dir)
+    with patch("app.api.routes.upload.UPLOAD_DIR", upload_dir):
+        yield upload_dir
 
 
 # ============================================================================
@@ -98,27 +151,23 @@ class TestUploadValidation:
         csv_file_1 = valid_csv_file
         csv_file_2 = ("internal.csv", BytesIO(b"date,value\n2024-01-15,100"), "text/csv")
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": csv_file_1,
-                    "internal_file": csv_file_2
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert "message" in result
-            assert "bank_file" in result
-            assert "internal_file" in result
-            assert result["bank_file"].endswith(".csv")
-            assert result["internal_file"].endswith(".csv")
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": csv_file_1,
+                "internal_file": csv_file_2
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert "message" in result
+        assert "bank_file" in result
+        assert "internal_file" in result
+        assert result["bank_file"].endswith(".csv")
+        assert result["internal_file"].endswith(".csv")
     
     def test_upload_pdf_files_success(
         self, override_get_current_user, override_get_db,
@@ -132,24 +181,20 @@ class TestUploadValidation:
         pdf_file_1 = valid_pdf_file
         pdf_file_2 = ("internal.pdf", BytesIO(b"%PDF-1.4\ncontent"), "application/pdf")
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": pdf_file_1,
-                    "internal_file": pdf_file_2
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["bank_file"].endswith(".pdf")
-            assert result["internal_file"].endswith(".pdf")
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": pdf_file_1,
+                "internal_file": pdf_file_2
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["bank_file"].endswith(".pdf")
+        assert result["internal_file"].endswith(".pdf")
     
     def test_upload_mixed_formats_success(
         self, override_get_current_user, override_get_db,
@@ -159,25 +204,20 @@ class TestUploadValidation:
         TESTE 3: Deve aceitar upload de CSV + PDF
         Requisito: RF01 - Suportar múltiplos formatos
         """
-        # Arrange
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": valid_csv_file,
-                    "internal_file": valid_pdf_file
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["bank_file"].endswith(".csv")
-            assert result["internal_file"].endswith(".pdf")
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": valid_csv_file,
+                "internal_file": valid_pdf_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["bank_file"].endswith(".csv")
+        assert result["internal_file"].endswith(".pdf")
     
     def test_upload_reject_invalid_extension(
         self, override_get_current_user, override_get_db
@@ -237,21 +277,17 @@ class TestUploadValidation:
         csv_uppercase = ("file.CSV", BytesIO(b"data"), "text/csv")
         pdf_uppercase = ("file.PDF", BytesIO(b"%PDF"), "application/pdf")
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": csv_uppercase,
-                    "internal_file": pdf_uppercase
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": csv_uppercase,
+                "internal_file": pdf_uppercase
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
 
 
 # ============================================================================
@@ -318,10 +354,7 @@ class TestUploadStorage:
         # Arrange
         mock_current_user.id = 42
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"), \
-             patch("app.api.routes.upload.datetime") as mock_datetime:
+        with patch("app.api.routes.upload.datetime") as mock_datetime:
             
             mock_datetime.now.return_value.strftime.return_value = "20250115_143000"
             
@@ -348,25 +381,20 @@ class TestUploadStorage:
         TESTE 10: Deve salvar arquivos no diretório correto
         Requisito: RNF04 - Organização de arquivos
         """
-        # Arrange
-        with patch("app.api.routes.upload.os.makedirs") as mock_makedirs, \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": valid_csv_file,
-                    "internal_file": valid_csv_file
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert mock_upload_dir in result["bank_path"]
-            assert mock_upload_dir in result["internal_path"]
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": valid_csv_file,
+                "internal_file": valid_csv_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert mock_upload_dir in result["bank_path"]
+        assert mock_upload_dir in result["internal_path"]
     
     def test_upload_directory_path_included_in_response(
         self, override_get_current_user, override_get_db,
@@ -376,27 +404,22 @@ class TestUploadStorage:
         TESTE 11: Deve incluir paths completos na resposta
         Requisito: RNF04 - Completude da API
         """
-        # Arrange
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": valid_csv_file,
-                    "internal_file": valid_csv_file
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert "bank_path" in result
-            assert "internal_path" in result
-            assert os.path.isabs(result["bank_path"])  # Path absoluto
-            assert os.path.isabs(result["internal_path"])
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": valid_csv_file,
+                "internal_file": valid_csv_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert "bank_path" in result
+        assert "internal_path" in result
+        assert os.path.isabs(result["bank_path"])  # Path absoluto
+        assert os.path.isabs(result["internal_path"])
 
 
 # ============================================================================
@@ -407,7 +430,7 @@ class TestListUploads:
     """Testes do endpoint GET /uploads"""
     
     def test_list_uploads_returns_user_files_only(
-        self, override_get_current_user, override_get_db, mock_current_user
+        self, override_get_current_user, sqlite_db, upload_dir, mock_current_user
     ):
         """
         TESTE 12: Deve listar apenas arquivos do usuário autenticado
@@ -416,40 +439,40 @@ class TestListUploads:
         # Arrange
         mock_current_user.id = 1
         
-        mock_files = [
+        for filename in [
             "bank_1_20250115_143000.csv",
             "internal_1_20250115_143000.csv",
             "bank_2_20250115_143000.csv",  # Outro usuário
             "internal_2_20250115_143000.csv"  # Outro usuário
-        ]
+        ]:
+            add_upload(sqlite_db, filename)
         
-        with patch("app.api.routes.upload.os.listdir", return_value=mock_files):
-            # Act
-            response = client.get("/api/uploads")
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["count"] == 2
-            assert all("_1_" in f for f in result["files"])
+        # Act
+        response = client.get("/api/uploads")
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["count"] == 2
+        assert result["total"] == 2
+        assert all("_1_" in name for name in result["files"])
     
     def test_list_uploads_empty_directory(
-        self, override_get_current_user, override_get_db
+        self, override_get_current_user, sqlite_db, upload_dir
     ):
         """
         TESTE 13: Deve retornar lista vazia quando não há arquivos
         Requisito: RNF06 - Casos extremos
         """
-        # Arrange
-        with patch("app.api.routes.upload.os.listdir", return_value=[]):
-            # Act
-            response = client.get("/api/uploads")
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["count"] == 0
-            assert result["files"] == []
+        # Act
+        response = client.get("/api/uploads")
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["count"] == 0
+        assert result["files"] == []
+        assert result["uploads"] == []
     
     def test_list_uploads_requires_authentication(self):
         """
@@ -463,7 +486,7 @@ class TestListUploads:
         assert response.status_code == 401
     
     def test_list_uploads_filters_by_user_id(
-        self, override_get_current_user, override_get_db, mock_current_user
+        self, override_get_current_user, sqlite_db, upload_dir, mock_current_user
     ):
         """
         TESTE 15: Deve filtrar arquivos pelo user_id
@@ -472,22 +495,78 @@ class TestListUploads:
         # Arrange
         mock_current_user.id = 42
         
-        mock_files = [
+        for filename in [
             "bank_42_20250115_143000.csv",
             "internal_42_20250115_143000.pdf",
-            "bank_1_20250115_143000.csv",
-            "random_file.txt"
-        ]
+            "bank_1_20250115_143000.csv"
+        ]:
+            add_upload(sqlite_db, filename)
         
-        with patch("app.api.routes.upload.os.listdir", return_value=mock_files):
-            # Act
-            response = client.get("/api/uploads")
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["count"] == 2
-            assert all("_42_" in f for f in result["files"])
+        # Act
+        response = client.get("/api/uploads")
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["count"] == 2
+        assert all("_42_" in name for name in result["files"])
+    
+    def test_list_uploads_paginated_with_metadata(
+        self, override_get_current_user, sqlite_db, upload_dir, mock_current_user
+    ):
+        """
+        TESTE 27: Páginas em ordem do mais recente, com os metadados e sem
+        abrir arquivos (o diretório só é varrido na primeira listagem)
+        """
+        mock_current_user.id = 1
+        for minute in range(5):
+            add_upload(
+                sqlite_db, f"bank_1_20250115_14{minute:02d}00.csv",
+                created_at=datetime(2025, 1, 15, 14, minute)
+            )
+        client.get("/api/uploads")
+        
+        with patch("app.api.routes.upload.os.listdir") as mock_listdir, \
+             patch("builtins.open") as mock_file:
+            first = client.get("/api/uploads", params={"limit": 2}).json()
+            last = client.get("/api/uploads", params={"limit": 2, "offset": 4}).json()
+        
+        mock_listdir.assert_not_called()
+        mock_file.assert_not_called()
+        assert first["files"] == ["bank_1_20250115_140400.csv", "bank_1_20250115_140300.csv"]
+        assert [f["filename"] for f in first["uploads"]] == first["files"]
+        assert last["files"] == ["bank_1_20250115_140000.csv"]
+        assert first["total"] == last["total"] == 5
+        assert first["uploads"][0]["rows"] == 1
+        assert first["uploads"][0]["columns"] == ["Data", "Valor", "Descricao"]
+        assert client.get("/api/uploads", params={"limit": 0}).status_code == 422
+    
+    def test_list_uploads_backfills_files_from_before_index(
+        self, override_get_current_user, sqlite_db, upload_dir, mock_current_user
+    ):
+        """TESTE 30: Uploads gravados antes do índice são registrados na primeira listagem"""
+        mock_current_user.id = 7
+        (upload_dir / "bank_7_20240101_100000.csv").write_bytes(
+            b"Data,Valor,Descricao\n2024-01-01,10.00,pix\n2024-01-02,20.00,ted\n"
+        )
+        (upload_dir / "internal_7_20240101_100000.pdf").write_bytes(b"%PDF-1.4\n")
+        (upload_dir / "bank_8_20240101_100000.csv").write_bytes(b"Data\n")  # Outro usuário
+        add_upload(sqlite_db, "internal_7_20250115_143000.csv")
+        
+        result = client.get("/api/uploads").json()
+        again = client.get("/api/uploads").json()
+        
+        assert result["total"] == again["total"] == 3
+        assert sorted(result["files"]) == [
+            "bank_7_20240101_100000.csv",
+            "internal_7_20240101_100000.pdf",
+            "internal_7_20250115_143000.csv"
+        ]
+        legacy = {f["filename"]: f for f in result["uploads"]}
+        assert legacy["bank_7_20240101_100000.csv"]["kind"] == "bank"
+        assert legacy["bank_7_20240101_100000.csv"]["rows"] == 2
+        assert legacy["bank_7_20240101_100000.csv"]["columns"] == ["Data", "Valor", "Descricao"]
+        assert legacy["internal_7_20240101_100000.pdf"]["rows"] is None
 
 
 # ============================================================================
@@ -551,21 +630,17 @@ class TestUploadEdgeCases:
         # Arrange
         special_file = ("relatório_2024.csv", BytesIO(b"data"), "text/csv")
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": special_file,
-                    "internal_file": special_file
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": special_file,
+                "internal_file": special_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
     
     def test_upload_returns_complete_response(
         self, override_get_current_user, override_get_db,
@@ -575,35 +650,30 @@ class TestUploadEdgeCases:
         TESTE 19: Deve retornar resposta completa com todos os campos
         Requisito: RNF04 - Completude da API
         """
-        # Arrange
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
-            response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": valid_csv_file,
-                    "internal_file": valid_csv_file
-                }
-            )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            
-            # Verificar todos os campos esperados
-            assert "message" in result
-            assert "bank_file" in result
-            assert "internal_file" in result
-            assert "bank_path" in result
-            assert "internal_path" in result
-            
-            # Verificar tipos
-            assert isinstance(result["message"], str)
-            assert isinstance(result["bank_file"], str)
-            assert isinstance(result["internal_file"], str)
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": valid_csv_file,
+                "internal_file": valid_csv_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        
+        # Verificar todos os campos esperados
+        assert "message" in result
+        assert "bank_file" in result
+        assert "internal_file" in result
+        assert "bank_path" in result
+        assert "internal_path" in result
+        
+        # Verificar tipos
+        assert isinstance(result["message"], str)
+        assert isinstance(result["bank_file"], str)
+        assert isinstance(result["internal_file"], str)
     
     def test_upload_preserves_file_extension(
         self, override_get_current_user, override_get_db, mock_upload_dir
@@ -616,21 +686,277 @@ class TestUploadEdgeCases:
         csv_file = ("data.csv", BytesIO(b"data"), "text/csv")
         pdf_file = ("report.pdf", BytesIO(b"%PDF"), "application/pdf")
         
-        with patch("app.api.routes.upload.os.makedirs"), \
-             patch("builtins.open", mock_open()), \
-             patch("app.api.routes.upload.shutil.copyfileobj"):
-            
-            # Act
+        # Act
+        response = client.post(
+            "/api/upload",
+            files={
+                "bank_file": csv_file,
+                "internal_file": pdf_file
+            }
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        result = response.json()
+        assert result["bank_file"].endswith(".csv")
+        assert result["internal_file"].endswith(".pdf")
+
+# ============================================================================
+# SUITE 7: REMOÇÃO DE UPLOADS
+# ============================================================================
+
+class TestDeleteUpload:
+    """Testes de remoção de uploads"""
+    
+    def test_delete_upload_invalidates_cache(
+        self, override_get_current_user, sqlite_db, tmp_path
+    ):
+        """TESTE 21: Remove o arquivo e as leituras dele em cache"""
+        content = b"Data,Valor,Descricao\n2024-01-15,100.00,PIX\n"
+        file_path = tmp_path / "bank_1_20250115_143000.csv"
+        file_path.write_bytes(content)
+        
+        with patch("app.api.routes.upload.UPLOAD_DIR", str(tmp_path)), \
+             patch("app.services.upload_store.parsed_cache.invalidate") as mock_invalidate:
+            response = client.delete("/api/uploads/bank_1_20250115_143000.csv")
+        
+        assert response.status_code == 200
+        assert not file_path.exists()
+        # Fora do índice, o hash vem do próprio arquivo
+        mock_invalidate.assert_called_once_with(str(file_path), hashlib.sha256(content).hexdigest())
+    
+    def test_delete_upload_of_other_user(
+        self, override_get_current_user, override_get_db, tmp_path
+    ):
+        """TESTE 22: Arquivo de outro usuário retorna 403; inexistente, 404"""
+        with patch("app.api.routes.upload.UPLOAD_DIR", str(tmp_path)):
+            forbidden = client.delete("/api/uploads/bank_2_20250115_143000.csv")
+            missing = client.delete("/api/uploads/bank_1_20250115_143000.csv")
+        
+        assert forbidden.status_code == 403
+        assert missing.status_code == 404
+
+
+# ============================================================================
+# SUITE 8: GRAVAÇÃO EM BLOCOS
+# ============================================================================
+
+class TestStreamedUpload:
+    """Testes da gravação em blocos com limite, hash e contagens"""
+    
+    def test_upload_returns_hash_size_and_rows(
+        self, override_get_current_user, override_get_db, tmp_path
+    ):
+        """TESTE 23: Resposta traz SHA-256, tamanho e linhas; o hash fica lembrado no cache"""
+        import hashlib
+        
+        bank_content = b"Data,Valor,Descricao\n2024-01-15,100.00,PIX\n2024-01-16,50.00,TED"
+        internal_content = b"%PDF-1.4 conteudo"
+        files = {
+            "bank_file": ("bank.csv", BytesIO(bank_content), "text/csv"),
+            "internal_file": ("internal.pdf", BytesIO(internal_content), "application/pdf")
+        }
+        
+        with patch("app.api.routes.upload.UPLOAD_DIR", str(tmp_path)), \
+             patch("app.services.upload_store.CHUNK_SIZE", 16), \
+             patch("app.services.upload_store.parsed_cache.remember_hash") as mock_remember:
+            response = client.post("/api/upload", files=files)
+        
+        assert response.status_code == 200
+        result = response.json()
+        assert result["bank_info"] == {
+            "sha256": hashlib.sha256(bank_content).hexdigest(),
+            "size": len(bank_content),
+            "rows": 2,
+            "deduplicated": False
+        }
+        assert result["internal_info"] == {
+            "sha256": hashlib.sha256(internal_content).hexdigest(),
+            "size": len(internal_content),
+            "rows": None,
+            "deduplicated": False
+        }
+        with open(result["bank_path"], "rb") as f:
+            assert f.read() == bank_content
+        mock_remember.assert_any_call(result["bank_path"], result["bank_info"]["sha256"])
+    
+    def test_upload_over_limit_is_rejected(
+        self, override_get_current_user, override_get_db, tmp_path
+    ):
+        """TESTE 24: Arquivo acima do limite retorna 413 e nada fica gravado"""
+        files = {
+            "bank_file": ("bank.csv", BytesIO(b"Data,Valor\n2024-01-15,100.00\n"), "text/csv"),
+            "internal_file": ("internal.csv", BytesIO(b"x" * 200), "text/csv")
+        }
+        
+        with patch("app.api.routes.upload.UPLOAD_DIR", str(tmp_path)), \
+             patch("app.services.upload_store.CHUNK_SIZE", 16), \
+             patch("app.api.routes.upload.settings.MAX_UPLOAD_SIZE", 100):
+            response = client.post("/api/upload", files=files)
+        
+        assert response.status_code == 413
+        assert os.listdir(tmp_path) == [".objects"]
+        assert os.listdir(tmp_path / ".objects") == []
+    
+    def test_oversized_request_rejected_before_body_is_read(
+        self, override_get_current_user, override_get_db
+    ):
+        """TESTE 31: Content-Length acima do limite dá 413 antes de a rota rodar"""
+        with patch("app.api.routes.upload.settings.MAX_UPLOAD_SIZE", 100), \
+             patch("app.api.routes.upload.MULTIPART_OVERHEAD", 1024), \
+             patch("app.api.routes.upload.UploadStore") as MockStore:
             response = client.post(
-                "/api/upload",
-                files={
-                    "bank_file": csv_file,
-                    "internal_file": pdf_file
-                }
+                "/api/upload", content=b"x" * 4096,
+                headers={"Content-Type": "multipart/form-data; boundary=abc"}
             )
-            
-            # Assert
-            assert response.status_code == 200
-            result = response.json()
-            assert result["bank_file"].endswith(".csv")
-            assert result["internal_file"].endswith(".pdf")
\ No newline at end of file
+        
+        assert response.status_code == 413
+        MockStore.assert_not_called()
+    
+    def test_chunked_body_stops_at_limit(self):
+        """TESTE 32: Envio chunked para de ser lido ao passar do limite"""
+        import asyncio
+        from app.core.body_limit import BodySizeLimitMiddleware
+        
+        pulled = []
+        sent = []
+        
+        async def receive():
+            pulled.append(1)
+            return {"type": "http.request", "body": b"x" * 1024, "more_body": len(pulled) < 100}
+        
+        async def send(message):
+            sent.append(message)
+        
+        async def app_reading_body(scope, receive, send):
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            raise RuntimeError("cliente desconectou")
+        
+        middleware = BodySizeLimitMiddleware(app_reading_body, ["/api/upload"], lambda: 4096)
+        scope = {"type": "http", "method": "POST", "path": "/api/upload", "headers": []}
+        asyncio.run(middleware(scope, receive, send))
+        
+        assert len(pulled) == 5
+        assert sent[0]["type"] == "http.response.start" and sent[0]["status"] == 413
+
+
+
+# ============================================================================
+# SUITE 9: DEDUPLICAÇÃO POR CONTEÚDO
+# ============================================================================
+
+class TestDeduplicatedUpload:
+    """Testes do armazenamento por conteúdo com referências por usuário"""
+    
+    def _upload(self, bank_content, internal_content, timestamp):
+        files = {
+            "bank_file": ("bank.csv", BytesIO(bank_content), "text/csv"),
+            "internal_file": ("internal.csv", BytesIO(internal_content), "text/csv")
+        }
+        with patch("app.api.routes.upload.datetime") as mock_datetime:
+            mock_datetime.now.return_value.strftime.return_value = timestamp
+            response = client.post("/api/upload", files=files)
+        assert response.status_code == 200
+        return response.json()
+    
+    def test_reupload_shares_content_and_cache(
+        self, override_get_current_user, override_get_db, mock_upload_dir
+    ):
+        """TESTE 25: Reenvio aponta para o mesmo objeto e reaproveita a leitura em cache"""
+        from app.core.csv_processor import CSVProcessor
+        from app.services.parsed_cache import ParsedFileCache
+        
+        bank_content = b"Data,Valor,Descricao\n15/01/2024,100.00,PIX\n"
+        first = self._upload(bank_content, b"Data,Valor\n15/01/2024,1\n", "20250115_143000")
+        second = self._upload(bank_content, b"Data,Valor\n16/01/2024,2\n", "20250115_143500")
+        
+        assert first["bank_info"]["deduplicated"] is False
+        assert second["bank_info"]["deduplicated"] is True
+        assert second["internal_info"]["deduplicated"] is False
+        assert os.path.samefile(first["bank_path"], second["bank_path"])
+        assert len(os.listdir(os.path.join(mock_upload_dir, ".objects"))) == 3
+        
+        cache = ParsedFileCache(os.path.join(mock_upload_dir, "cache"), 10 * 1024 * 1024)
+        cache.load_transactions(first["bank_path"], "Data", "Valor", "Descricao")
+        with patch.object(CSVProcessor, "read_csv") as mock_read:
+            result = cache.load_transactions(second["bank_path"], "Data", "Valor", "Descricao")
+        mock_read.assert_not_called()
+        assert result[0]["value"] == 100.0
+    
+    def test_content_removed_with_last_reference(
+        self, override_get_current_user, sqlite_db, mock_upload_dir
+    ):
+        """
+        TESTE 26: O conteúdo só sai quando a última referência é removida, e
+        a remoção usa o hash do índice sem reler o arquivo
+        """
+        from app.core.csv_processor import CSVProcessor
+        
+        content = b"Data,Valor\n15/01/2024,100.00\n"
+        first = self._upload(content, content, "20250115_143000")
+        second = self._upload(content, content, "20250115_143500")
+        objects_dir = os.path.join(mock_upload_dir, ".objects")
+        
+        with patch.object(CSVProcessor, "file_hash") as mock_hash:
+            removed = [
+                client.delete(f"/api/uploads/{result[key]}").json()["content_removed"]
+                for result in (first, second)
+                for key in ("bank_file", "internal_file")
+            ]
+        
+        mock_hash.assert_not_called()
+        
+        assert removed == [False, False, False, True]
+        assert os.listdir(objects_dir) == []
+        assert sorted(os.listdir(mock_upload_dir)) == [".objects"]
+    
+    def test_reupload_is_not_copied(
+        self, override_get_current_user, override_get_db, mock_upload_dir
+    ):
+        """TESTE 33: Conteúdo já gravado só é lido para o hash; nada é copiado"""
+        content = b"Data,Valor\n15/01/2024,100.00\n"
+        self._upload(content, b"Data,Valor\n15/01/2024,1\n", "20250115_143000")
+        
+        with patch("app.services.upload_store.shutil.copyfileobj") as mock_copy:
+            second = self._upload(content, b"Data,Valor\n15/01/2024,1\n", "20250115_143500")
+        
+        mock_copy.assert_not_called()
+        assert second["bank_info"]["deduplicated"] is True
+        assert second["bank_info"]["rows"] == 1
+        assert len(os.listdir(os.path.join(mock_upload_dir, ".objects"))) == 2
+    
+    def test_upload_recorded_in_index(
+        self, override_get_current_user, sqlite_db, mock_upload_dir
+    ):
+        """TESTE 28: Upload registra hash, tamanho, linhas e colunas; remoção apaga o registro"""
+        content = b"Data;Valor;Descricao\n15/01/2024;100,00;PIX\n16/01/2024;50,00;TED\n"
+        result = self._upload(content, content, "20250115_143000")
+        
+        uploads = client.get("/api/uploads").json()["uploads"]
+        bank = next(f for f in uploads if f["kind"] == "bank")
+        assert bank["filename"] == result["bank_file"]
+        assert bank["original_name"] == "bank.csv"
+        assert bank["sha256"] == result["bank_info"]["sha256"]
+        assert (bank["size_bytes"], bank["rows"]) == (len(content), 2)
+        assert bank["columns"] == ["Data", "Valor", "Descricao"]
+        
+        client.delete(f"/api/uploads/{result['bank_file']}")
+        assert [f["kind"] for f in client.get("/api/uploads").json()["uploads"]] == ["internal"]
+    
+    def test_retention_reports_usage_and_metrics(
+        self, override_get_current_user, sqlite_db, mock_current_user
+    ):
+        """TESTE 29: Retenção informa TTL, cota, espaço usado pelo usuário e métricas"""
+        mock_current_user.id = 1
+        add_upload(sqlite_db, "bank_1_20250115_143000.csv")
+        add_upload(sqlite_db, "internal_1_20250115_143000.csv")
+        add_upload(sqlite_db, "bank_2_20250115_143000.csv")
+        
+        response = client.get("/api/uploads/retention")
+        
+        assert response.status_code == 200
+        result = response.json()
+        assert result["used_bytes"] == 20
+        assert {"ttl_days", "quota_bytes"} <= set(result)
+        assert {"runs", "files_removed", "bytes_reclaimed"} <= set(result["metrics"])
@@ -8,6 +8,18 @@ import { getPendingTransactions, createManualMatch } from '../services/api';
 import { ArrowRight, CheckCircle, AlertCircle, Loader } from 'lucide-react';
 import Navbar from '../components/Navbar';
 
+// Transações por página em cada lado
+const PAGE_SIZE = 100;
+
+const EMPTY_FILTERS = {
+  sort: 'date',
+  order: 'asc',
+  date_from: '',
+  date_to: '',
+  min_value: '',
+  max_value: '',
+};
+
 export default function ManualReconciliation() {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -16,19 +28,38 @@ export default function ManualReconciliation() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [matching, setMatching] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(null);
+  
+  // Filtros editados no formulário e os aplicados na consulta
+  const [filterForm, setFilterForm] = useState(EMPTY_FILTERS);
+  const [filters, setFilters] = useState(EMPTY_FILTERS);
   
   const [selectedBank, setSelectedBank] = useState(null);
   const [selectedInternal, setSelectedInternal] = useState(null);
 
   useEffect(() => {
     loadPending();
-  }, [id]);
+  }, [id, filters]);
+
+  // Parâmetros da consulta, sem os filtros em branco
+  const buildParams = (extra = {}) => {
+    const params = { limit: PAGE_SIZE, ...extra };
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== '') params[key] = value;
+    });
+    return params;
+  };
 
+  const hasFilters = ['date_from', 'date_to', 'min_value', 'max_value'].some(
+    (key) => filters[key] !== ''
+  );
+
+  // Carrega a primeira página dos dois lados
   const loadPending = async () => {
     try {
       setLoading(true);
       setError('');
-      const pendingData = await getPendingTransactions(id);
+      const pendingData = await getPendingTransactions(id, buildParams());
       setData(pendingData);
     } catch (err) {
       setError('Erro ao carregar transações pendentes: ' + err.message);
@@ -37,6 +68,46 @@ export default function ManualReconciliation() {
     }
   };
 
+  // Carrega a próxima página de um lado ('bank' ou 'internal') e junta à lista
+  const loadMore = async (side) => {
+    try {
+      setLoadingMore(side);
+      setError('');
+      const page = await getPendingTransactions(
+        id,
+        buildParams({ side, [`${side}_cursor`]: data[`${side}_next_cursor`] })
+      );
+      setData((current) => ({
+        ...current,
+        [`${side}_pending`]: [...current[`${side}_pending`], ...page[`${side}_pending`]],
+        [`${side}_next_cursor`]: page[`${side}_next_cursor`],
+        [`${side}_total`]: page[`${side}_total`],
+      }));
+    } catch (err) {
+      setError('Erro ao carregar mais transações: ' + (err.response?.data?.detail || err.message));
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
+  const handleFilterChange = (e) => {
+    setFilterForm({ ...filterForm, [e.target.name]: e.target.value });
+  };
+
+  const handleApplyFilters = (e) => {
+    e.preventDefault();
+    setSelectedBank(null);
+    setSelectedInternal(null);
+    setFilters(filterForm);
+  };
+
+  const handleClearFilters = () => {
+    setSelectedBank(null);
+    setSelectedInternal(null);
+    setFilterForm(EMPTY_FILTERS);
+    setFilters(EMPTY_FILTERS);
+  };
+
   const handleMatch = async () => {
     if (!selectedBank || !selectedInternal) {
       setError('Selecione uma transação de cada lado');
@@ -110,7 +181,25 @@ export default function ManualReconciliation() {
     );
   }
 
-  const noPending = data.bank_pending.length === 0 && data.internal_pending.length === 0;
+  const noPending = !hasFilters && data.bank_pending.length === 0 && data.internal_pending.length === 0;
+
+  const renderLoadMore = (side) =>
+    data[`${side}_next_cursor`] && (
+      <button
+        onClick={() => loadMore(side)}
+        disabled={loadingMore !== null}
+        className="mt-4 w-full py-2 px-4 border border-gray-300 rounded-lg text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50 flex items-center justify-center"
+      >
+        {loadingMore === side ? (
+          <>
+            <Loader className="w-4 h-4 mr-2 animate-spin" />
+            Carregando...
+          </>
+        ) : (
+          `Carregar mais (${data[`${side}_pending`].length} de ${data[`${side}_total`]})`
+        )}
+      </button>
+    );
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -153,18 +242,104 @@ export default function ManualReconciliation() {
             <div className="grid grid-cols-2 gap-6 mb-6">
               <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-4 text-center">
                 <p className="text-3xl font-bold text-yellow-600">
-                  {data.bank_pending.length}
+                  {data.bank_total ?? data.bank_pending.length}
                 </p>
                 <p className="text-sm text-gray-600 mt-1">Pendentes (Banco)</p>
               </div>
               <div className="bg-orange-50 border border-orange-200 rounded-lg p-4 text-center">
                 <p className="text-3xl font-bold text-orange-600">
-                  {data.internal_pending.length}
+                  {data.internal_total ?? data.internal_pending.length}
                 </p>
                 <p className="text-sm text-gray-600 mt-1">Pendentes (Sistema)</p>
               </div>
             </div>
 
+            {/* Ordenação e Filtros */}
+            <form
+              onSubmit={handleApplyFilters}
+              className="bg-white rounded-lg shadow-md p-4 mb-6 grid grid-cols-2 md:grid-cols-4 lg:grid-cols-8 gap-3 items-end"
+            >
+              <label className="text-sm text-gray-600">
+                Ordenar por
+                <select
+                  name="sort"
+                  value={filterForm.sort}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                >
+                  <option value="date">Data</option>
+                  <option value="value">Valor</option>
+                </select>
+              </label>
+              <label className="text-sm text-gray-600">
+                Ordem
+                <select
+                  name="order"
+                  value={filterForm.order}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                >
+                  <option value="asc">Crescente</option>
+                  <option value="desc">Decrescente</option>
+                </select>
+              </label>
+              <label className="text-sm text-gray-600">
+                Data inicial
+                <input
+                  type="date"
+                  name="date_from"
+                  value={filterForm.date_from}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                />
+              </label>
+              <label className="text-sm text-gray-600">
+                Data final
+                <input
+                  type="date"
+                  name="date_to"
+                  value={filterForm.date_to}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                />
+              </label>
+              <label className="text-sm text-gray-600">
+                Valor mínimo
+                <input
+                  type="number"
+                  step="0.01"
+                  name="min_value"
+                  value={filterForm.min_value}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                />
+              </label>
+              <label className="text-sm text-gray-600">
+                Valor máximo
+                <input
+                  type="number"
+                  step="0.01"
+                  name="max_value"
+                  value={filterForm.max_value}
+                  onChange={handleFilterChange}
+                  className="mt-1 w-full border border-gray-300 rounded-lg px-2 py-1"
+                />
+              </label>
+              <button
+                type="submit"
+                className="py-2 px-4 bg-blue-600 text-white rounded-lg hover:bg-blue-700 text-sm"
+              >
+                Aplicar
+              </button>
+              <button
+                type="button"
+                onClick={handleClearFilters}
+                className="py-2 px-4 border border-gray-300 rounded-lg text-gray-700 hover:bg-gray-50 text-sm"
+              >
+                Limpar
+              </button>
+            </form>
+
             {/* Listas de Transações */}
             <div className="grid md:grid-cols-2 gap-6 mb-6">
               {/* Banco */}
@@ -173,6 +348,9 @@ export default function ManualReconciliation() {
                   📊 Transações do Banco
                 </h3>
                 <div className="space-y-3 max-h-96 overflow-y-auto">
+                  {data.bank_pending.length === 0 && (
+                    <p className="text-sm text-gray-500">Nenhuma transação pendente com esses filtros</p>
+                  )}
                   {data.bank_pending.map((transaction) => (
                     <div
                       key={transaction.id}
@@ -203,6 +381,7 @@ export default function ManualReconciliation() {
                     </div>
                   ))}
                 </div>
+                {renderLoadMore('bank')}
               </div>
 
               {/* Sistema Interno */}
@@ -211,6 +390,9 @@ export default function ManualReconciliation() {
                   💻 Transações do Sistema
                 </h3>
                 <div className="space-y-3 max-h-96 overflow-y-auto">
+                  {data.internal_pending.length === 0 && (
+                    <p className="text-sm text-gray-500">Nenhuma transação pendente com esses filtros</p>
+                  )}
                   {data.internal_pending.map((transaction) => (
                     <div
                       key={transaction.id}
@@ -241,6 +423,7 @@ export default function ManualReconciliation() {
                     </div>
                   ))}
                 </div>
+                {renderLoadMore('internal')}
               </div>
             </div>
 
@@ -8,6 +8,16 @@ import { processCSVLocal, uploadFiles, reconcileTransactions, getSettings } from
 import { ArrowRight, Settings, Loader, Table } from 'lucide-react';
 import Navbar from '../components/Navbar';
 
+// Etapas do motor de conciliação (campo stage do progresso do job)
+const STAGE_LABELS = {
+  exact: 'pares exatos',
+  candidates: 'buscando candidatos',
+  scoring: 'comparando descrições',
+  assignment: 'escolhendo pares',
+  aggregate: 'somas agrupadas',
+  done: 'salvando',
+};
+
 function MappingPage() {
   const location = useLocation();
   const navigate = useNavigate();
@@ -17,6 +27,7 @@ function MappingPage() {
   const [internalData, setInternalData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [processing, setProcessing] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [error, setError] = useState('');
 
   const [mapping, setMapping] = useState({
@@ -122,7 +133,7 @@ function MappingPage() {
         similarity_threshold: config.similarity_threshold,
       };
 
-      const result = await reconcileTransactions(reconcileData);
+      const result = await reconcileTransactions(reconcileData, setProgress);
 
       navigate('/results', { state: { results: result } });
     } catch (err) {
@@ -130,6 +141,7 @@ function MappingPage() {
       console.error('Erro completo:', err);
     } finally {
       setProcessing(false);
+      setProgress(null);
     }
   };
 
@@ -417,7 +429,9 @@ function MappingPage() {
           {processing ? (
             <>
               <Loader className="w-5 h-5 mr-2 animate-spin" />
-              Processando...
+              {progress
+                ? `Processando... ${STAGE_LABELS[progress.stage] || progress.stage} ${progress.processed}/${progress.total} (${progress.matched} conciliadas)`
+                : 'Processando...'}
             </>
           ) : (
             <>
@@ -52,8 +52,15 @@ export const uploadFiles = async (bankFile, internalFile) => {
   return response.data;
 };
 
+// Colunas da tabela extraída dos extratos em PDF (lidos no servidor)
+const PDF_COLUMNS = ['Data', 'Descricao', 'Valor', 'Tipo'];
+
 // Processar CSV localmente para preview
 export const processCSVLocal = async (file) => {
+  if (file.name.toLowerCase().endsWith('.pdf')) {
+    return { columns: PDF_COLUMNS, rows: 0, preview: [] };
+  }
+
   return new Promise((resolve, reject) => {
     const reader = new FileReader();
     
@@ -111,15 +118,94 @@ export const reconcileFiles = async (bankFile, internalFile, config) => {
   return response.data;
 };
 
+// Estado de um job de conciliação
+export const getReconciliationJob = async (jobId) => {
+  const response = await api.get(`/api/reconcile/jobs/${jobId}`);
+  return response.data;
+};
+
+// Cancelar um job de conciliação em andamento
+export const cancelReconciliationJob = async (jobId) => {
+  const response = await api.delete(`/api/reconcile/jobs/${jobId}`);
+  return response.data;
+};
+
+// Token de curta duração para abrir o stream de progresso de um job
+export const getReconciliationEventsToken = async (jobId) => {
+  const response = await api.post(`/api/reconcile/jobs/${jobId}/events-token`);
+  return response.data.token;
+};
+
+// Resultado de um job no estado final (ou erro)
+const jobOutcome = (job) => {
+  if (job.status === 'completed') {
+    return job.result;
+  }
+  if (job.status === 'failed') {
+    throw new Error(job.error || 'Erro na conciliação');
+  }
+  throw new Error('Conciliação cancelada');
+};
+
+// Acompanha o job pelo stream SSE (o EventSource não envia o header
+// Authorization, então o stream é aberto com o token do job em ?token=).
+// Resolve com o estado final, ou com null se o stream cair antes dele.
+const watchJobEvents = async (jobId, onProgress) => {
+  const token = await getReconciliationEventsToken(jobId);
+  const url = `${API_URL}/api/reconcile/jobs/${jobId}/events?token=${encodeURIComponent(token)}`;
+
+  return new Promise((resolve) => {
+    const source = new EventSource(url);
+    const finish = (job) => {
+      source.close();
+      resolve(job);
+    };
+
+    source.addEventListener('progress', (event) => {
+      if (onProgress) {
+        onProgress(JSON.parse(event.data));
+      }
+    });
+    ['completed', 'failed', 'cancelled'].forEach((status) => {
+      source.addEventListener(status, (event) => finish(JSON.parse(event.data)));
+    });
+    // Sem reconexão automática: o token já pode ter expirado
+    source.onerror = () => finish(null);
+  });
+};
+
 // Reconciliar usando nomes de arquivos já enviados
-export const reconcileTransactions = async (data) => {
+// O backend enfileira a conciliação; acompanha o job pelo stream SSE (ou,
+// se ele não estiver disponível, consultando o job) e devolve o resultado
+// onProgress recebe { stage, processed, total, matched } a cada atualização
+export const reconcileTransactions = async (data, onProgress = null, pollInterval = 1000) => {
   const response = await api.post('/api/reconcile', data, {
     headers: {
       'Content-Type': 'application/json',
     },
   });
 
-  return response.data;
+  const { job_id: jobId } = response.data;
+
+  if (typeof EventSource !== 'undefined') {
+    const job = await watchJobEvents(jobId, onProgress).catch(() => null);
+    if (job) {
+      return jobOutcome(job);
+    }
+  }
+
+  for (;;) {
+    const job = await getReconciliationJob(jobId);
+
+    if (onProgress && job.progress) {
+      onProgress(job.progress);
+    }
+    if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+      return jobOutcome(job);
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, pollInterval));
+  }
 };
 
 // ========== HISTÓRICO ==========
@@ -150,8 +236,10 @@ export const updateSettings = async (settings) => {
 };
 
 // ========== CONCILIAÇÃO MANUAL ==========
-export const getPendingTransactions = async (reconciliationId) => {
-  const response = await api.get(`/api/reconciliation/${reconciliationId}/pending`);
+// params: limit, sort ('date' | 'value'), order, side, bank_cursor, internal_cursor,
+// date_from, date_to, min_value, max_value
+export const getPendingTransactions = async (reconciliationId, params = {}) => {
+  const response = await api.get(`/api/reconciliation/${reconciliationId}/pending`, { params });
   return response.data;
 };
 